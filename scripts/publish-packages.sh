@@ -5,6 +5,7 @@ python3 -m pip install build
 (cd src/deepview_tensorflow; rm -rf dist; python3 -m build;python3 -m twine upload --repository pypi dist/* )
 (cd src/deepview_data; rm -rf dist; python3 -m build;python3 -m twine upload --repository pypi dist/* )
 (cd src/deepview_torch; rm -rf dist; python3 -m build;python3 -m twine upload --repository pypi dist/* )
+(cd src/deepview_onnx; rm -rf dist; python3 -m build;python3 -m twine upload --repository pypi dist/* )
 
 cd src/deepview_canvas
 yarn
@@ -0,0 +1,89 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2020 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os
+
+import numpy as np
+try:
+    import cv2  # This is an optional deepview dependency
+except ImportError:
+    pass
+
+import deepview.typing._types as t
+
+
+def image_write_params(write_format: str, write_quality: t.Optional[int]) -> t.Tuple[str, t.List[int]]:
+    """
+    Get the file extension and the OpenCV ``imwrite`` parameters for an image export format.
+
+    Args:
+        write_format: ``"png"`` or ``"jpg"``
+        write_quality: PNG compression level (0-9, lower is faster) or JPEG quality (0-100).
+            If ``None``, OpenCV defaults are used.
+
+    Raises:
+        ValueError: if ``write_format`` is not supported
+    """
+    if write_format == "png":
+        return ".png", ([] if write_quality is None else [cv2.IMWRITE_PNG_COMPRESSION, write_quality])
+    if write_format in ("jpg", "jpeg"):
+        return ".jpg", ([] if write_quality is None else [cv2.IMWRITE_JPEG_QUALITY, write_quality])
+    raise ValueError(f"Unsupported write_format '{write_format}', expected 'png' or 'jpg'.")
+
+
+def write_image(filename: str, image: np.ndarray, params: t.Sequence[int]) -> None:
+    """
+    Write an RGB ``image`` to ``filename`` with OpenCV.
+
+    Args:
+        filename: destination path, its extension selects the encoder
+        image: RGB image array
+        params: OpenCV ``imwrite`` parameters, see :func:`image_write_params`
+    """
+    # Write to disk after converting to BGR format, used by opencv
+    cv2.imwrite(filename, cv2.cvtColor(image, cv2.COLOR_RGB2BGR), list(params))
+
+
+def file_signature(filename: str) -> t.Optional[t.Tuple[int, int]]:
+    """
+    Get the ``(size, mtime_ns)`` of ``filename`` (without following symlinks), or ``None`` if it does not exist.
+
+    Used to tell whether an exported file is still the one that was written.
+    """
+    try:
+        stat = os.lstat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
@@ -41,6 +41,7 @@ from ._model import Model
 from ._multi_introspect import multi_introspect
 from ._pipeline import PipelineStage, pipeline
 from ._producer import Producer, peek_first_batch
+from ._response_cache import ResponseCache
 from ._response_info import ResponseInfo
 from ._traintest_producer import TrainTestSplitProducer
 
@@ -56,6 +57,7 @@ __all__ = [
     PipelineStage.__name__,
     pipeline.__name__,
     Producer.__name__,
+    ResponseCache.__name__,
     ResponseInfo.__name__,
     peek_first_batch.__name__,
     TrainTestSplitProducer.__name__,
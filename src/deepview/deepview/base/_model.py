@@ -39,6 +39,8 @@ import numpy as np
 from ._batch._batch import Batch
 from ._response_info import ResponseInfo
 from ._pipeline import PipelineStage
+from ._producer import Producer, _resize_batches
+from ._response_cache import ResponseCache
 import deepview.typing as dt
 import deepview.typing._types as t
 from deepview.exceptions import DeepViewException
@@ -97,6 +99,74 @@ class _ModelDetails(t.Protocol):
 class _ModelPipelineStage(PipelineStage):
     _details: _ModelDetails
     _requested_responses: t.AbstractSet[str]
+    _inference_batch_size: t.Optional[int] = None
+    _response_cache: t.Optional[ResponseCache] = None
+
+    def _pipeline(self, producer: Producer) -> Producer:
+        if self._inference_batch_size is None:
+            return super()._pipeline(producer)
+
+        inference_batch_size = self._inference_batch_size
+        batch_processor = self._get_batch_processor()
+
+        def new_producer(batch_size: int) -> t.Iterable[Batch]:
+            # Pull batches of the inference batch size, and regroup responses into the requested size
+            responses = (batch_processor(batch) for batch in producer(inference_batch_size))
+            yield from _resize_batches(responses)(batch_size)
+        return new_producer
+
+    def _run_inference(self, infer_fields: t.Mapping[str, np.ndarray]) -> t.Mapping[str, np.ndarray]:
+        batch_size = len(next(iter(infer_fields.values())))
+        if self._inference_batch_size is None or batch_size <= self._inference_batch_size:
+            return self._details.run_inference(infer_fields, self._requested_responses)
+
+        # Split batches larger than the inference batch size, and concatenate the responses
+        results = [
+            self._details.run_inference(
+                {name: value[start:start + self._inference_batch_size] for name, value in infer_fields.items()},
+                self._requested_responses
+            )
+            for start in range(0, batch_size, self._inference_batch_size)
+        ]
+        return {
+            name: np.concatenate([result[name] for result in results])
+            for name in results[0]
+        }
+
+    def _run_cached_inference(self, infer_fields: t.Mapping[str, np.ndarray]) -> t.Mapping[str, np.ndarray]:
+        cache = self._response_cache
+        assert cache is not None
+        keys = cache._hash_elements(infer_fields)
+        if not keys:
+            # Nothing to look up for an empty batch
+            return self._run_inference(infer_fields)
+
+        # Responses of each distinct element, from the cache when possible
+        responses_by_key: t.Dict[str, t.Dict[str, np.ndarray]] = {}
+        miss_indices: t.Dict[str, int] = {}
+        for index, key in enumerate(keys):
+            if key in responses_by_key or key in miss_indices:
+                continue
+            cached = cache._get(key, self._requested_responses)
+            if cached is None:
+                miss_indices[key] = index
+            else:
+                responses_by_key[key] = cached
+
+        # Only run inference on the elements that are not cached (once per distinct element)
+        if miss_indices:
+            indices = list(miss_indices.values())
+            results = self._run_inference({name: value[indices] for name, value in infer_fields.items()})
+            for position, key in enumerate(miss_indices):
+                # copy so the cache does not hold on to the whole batch of responses
+                responses = {name: np.array(value[position]) for name, value in results.items()}
+                cache._put(key, responses)
+                responses_by_key[key] = responses
+
+        return {
+            name: np.stack([responses_by_key[key][name] for key in keys])
+            for name in responses_by_key[keys[0]]
+        }
 
     def _get_batch_processor(self) -> t.Callable[[Batch], Batch]:
 
@@ -129,7 +199,10 @@ class _ModelPipelineStage(PipelineStage):
                     f"FieldRenamer in the pipeline. To import the FieldRenamer class, do "
                     f"'from deepview.processors import FieldRenamer')")
 
-            inference_result = self._details.run_inference(infer_fields, self._requested_responses)
+            if self._response_cache is not None:
+                inference_result = self._run_cached_inference(infer_fields)
+            else:
+                inference_result = self._run_inference(infer_fields)
             # Prepare output
             builder = Batch.Builder(base=batch)
             # set the output data
@@ -235,7 +308,43 @@ class Model:
         """
         return self._input_layers
 
-    def __call__(self, requested_responses: dt.OneManyOrNone[str] = None) -> PipelineStage:
+    def responses_up_to(self, response_name: str, *, include_inputs: bool = False) -> t.List[str]:
+        """
+        Get the names of the responses up to (and including) ``response_name``, in the order of
+        :attr:`response_infos` (i.e. the order of the layers in the model).
+
+        Use this to request the layers of the first stages of a model only, instead of requesting
+        every response with ``requested_responses=None``. Inference then only runs the part of
+        the model needed to compute these responses.
+
+        Example:
+            .. code-block:: python
+
+                response_producer = pipeline(data_producer, model(model.responses_up_to("conv2d_3")))
+
+        Args:
+            response_name: name of the last response to return
+            include_inputs: **[optional]** also return the :attr:`input_layers` of the model
+
+        Returns:
+            the names of the responses, ending with ``response_name``
+
+        Raises:
+            ValueError: if ``response_name`` is not a response of the model
+        """
+        if response_name not in self._response_infos:
+            raise ValueError(f'"{response_name}" is not a response of the model.')
+        names = list(self._response_infos.keys())
+        return [
+            name
+            for name in names[:names.index(response_name) + 1]
+            if include_inputs or name not in self._input_layers
+        ]
+
+    def __call__(self,
+                 requested_responses: dt.OneManyOrNone[str] = None,
+                 inference_batch_size: t.Optional[int] = None,
+                 response_cache: t.Optional[ResponseCache] = None) -> PipelineStage:
         """
         Used to obtain a :class:`PipelineStage`, which is necessary to run inference
         on input :class:`Batch`.
@@ -247,13 +356,27 @@ class Model:
                 responses or ``None`` (the default).
                 If ``None`` is used, all possible responses in the model will be selected (which may
                 be expensive to compute!).
+            inference_batch_size: **[optional]** If set, inference always runs on batches of (at most)
+                this size, regardless of the batch size requested from the pipeline: input batches
+                are pulled at this size and responses are split or regrouped to the requested size.
+                This bounds the memory used by inference when introspectors request large batches,
+                and avoids running inference on tiny batches. If ``None`` (the default),
+                inference runs on the batches as requested.
+            response_cache: **[optional]** If set, responses are memoized in this
+                :class:`ResponseCache <deepview.base.ResponseCache>` by content of the input elements,
+                and inference only runs on elements whose responses are not cached yet.
 
         Returns:
             a :class:`PipelineStage` that can be used with :func:`pipeline()` to run inference with
             the loaded ``Model``.
+
+        Raises:
+            ValueError: if ``inference_batch_size`` is smaller than 1
         """
+        if inference_batch_size is not None and inference_batch_size < 1:
+            raise ValueError("inference_batch_size must be at least 1")
         requested_responses = (
             dt.resolve_one_many_or_none(requested_responses, str)
             or frozenset(self._response_infos.keys())
         )
-        return _ModelPipelineStage(self._details, requested_responses)
+        return _ModelPipelineStage(self._details, requested_responses, inference_batch_size, response_cache)
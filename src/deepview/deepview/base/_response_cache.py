@@ -0,0 +1,143 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2020 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import os
+import pathlib
+import pickle
+
+import numpy as np
+
+import deepview.typing as dt
+import deepview.typing._types as t
+
+
+_Responses = t.Dict[str, np.ndarray]
+
+
+@t.final
+class ResponseCache:
+    """
+    Memoizes the responses of a :class:`Model <deepview.base.Model>`, by content of the input elements.
+
+    Pass a ``ResponseCache`` to a :class:`Model <deepview.base.Model>` when calling it in a
+    :func:`pipeline() <deepview.base.pipeline>`. Each input element is hashed (from the bytes, type
+    and shape of its fields, or the pickled objects of object fields), and responses already computed for the same content are reused,
+    so that inference only runs on elements that were never seen before. Duplicate elements
+    within a batch are only inferred once too. This is useful for datasets with many exact
+    duplicates, or when running the same model on overlapping subsets of a dataset.
+
+    Responses are kept in memory, or, if ``storage_path`` is set, pickled to that directory
+    (one file per distinct element), so they can be reused across processes.
+
+    Example:
+        .. code-block:: python
+
+            cache = ResponseCache()
+            responses = pipeline(producer, model(["conv2d_1"], response_cache=cache))
+
+    Warning:
+        The cache does not know which model computed the responses: only use a ``ResponseCache``
+        (or its ``storage_path``) with a single model, and clear it if the model changes.
+
+    Args:
+        storage_path: **[optional]** directory where responses are stored. If ``None`` (the default),
+            responses are kept in memory.
+    """
+
+    def __init__(self, storage_path: t.Optional[dt.PathOrStr] = None) -> None:
+        self._storage_path = None if storage_path is None else dt.resolve_path_or_str(storage_path)
+        self._memory: t.Dict[str, _Responses] = {}
+        if self._storage_path is not None:
+            self._storage_path.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        """Number of distinct input elements with cached responses."""
+        if self._storage_path is not None:
+            return len(list(self._storage_path.glob("*.pkl")))
+        return len(self._memory)
+
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        self._memory.clear()
+        if self._storage_path is not None:
+            for path in self._storage_path.glob("*.pkl"):
+                path.unlink()
+
+    @staticmethod
+    def _hash_elements(fields: t.Mapping[str, np.ndarray]) -> t.List[str]:
+        """Get a digest of the content of each element of a batch with ``fields``."""
+        names = sorted(fields)
+        batch_size = len(fields[names[0]])
+        digests = []
+        for index in range(batch_size):
+            digest = hashlib.blake2b(digest_size=16)
+            for name in names:
+                element = np.ascontiguousarray(fields[name][index])
+                digest.update(f"{name}:{element.dtype.str}:{element.shape}".encode())
+                if element.dtype.hasobject:
+                    # The buffer of object arrays holds pointers, so hash the objects by value
+                    digest.update(pickle.dumps(element.tolist(), protocol=pickle.HIGHEST_PROTOCOL))
+                else:
+                    digest.update(element.data)
+            digests.append(digest.hexdigest())
+        return digests
+
+    def _path(self, key: str) -> pathlib.Path:
+        assert self._storage_path is not None
+        return self._storage_path / f"{key}.pkl"
+
+    def _get(self, key: str, responses: t.AbstractSet[str]) -> t.Optional[_Responses]:
+        """Get the cached ``responses`` of an element, or ``None`` if any of them is missing."""
+        if self._storage_path is None:
+            cached = self._memory.get(key)
+        else:
+            path = self._path(key)
+            cached = pickle.loads(path.read_bytes()) if path.exists() else None
+        if cached is None or not responses <= cached.keys():
+            return None
+        return {name: cached[name] for name in responses}
+
+    def _put(self, key: str, responses: _Responses) -> None:
+        """Add the ``responses`` of an element to the cache (keeping responses cached previously)."""
+        if self._storage_path is None:
+            self._memory.setdefault(key, {}).update(responses)
+            return
+        path = self._path(key)
+        cached = pickle.loads(path.read_bytes()) if path.exists() else {}
+        cached.update(responses)
+        # Write to a temporary file first so concurrent readers never see a partial file
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_bytes(pickle.dumps(cached))
+        temp_path.replace(path)
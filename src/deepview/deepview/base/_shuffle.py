@@ -0,0 +1,141 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2020 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+
+from ._batch._batch import Batch
+from ._batch._storage import _concatenate_batches, _BatchStorage
+from ._pipeline import PipelineStage
+from ._producer import Producer
+from deepview.exceptions import DeepViewException
+import deepview.typing._types as t
+
+
+def _block_permutation(length: int, block_size: int, buffer_size: int) -> np.ndarray:
+    """
+    Locality-aware permutation of ``range(length)``.
+
+    Contiguous blocks of ``block_size`` rows are visited in random order, and rows are then shuffled
+    within consecutive windows of ``buffer_size`` rows. Any window of the permutation therefore only
+    touches a few contiguous ranges of the original rows, which keeps reads mostly sequential.
+
+    Args:
+        length: number of rows to permute
+        block_size: number of contiguous rows read together
+        buffer_size: number of rows shuffled together (normally a multiple of ``block_size``)
+
+    Raises:
+        ValueError: if ``block_size`` or ``buffer_size`` is smaller than 1
+    """
+    if block_size < 1 or buffer_size < 1:
+        raise ValueError("block_size and buffer_size must be at least 1")
+    block_starts = np.random.permutation(np.arange(0, length, block_size))
+    rows = np.concatenate([np.arange(0)] + [np.arange(start, min(start + block_size, length))
+                                            for start in block_starts])
+    for start in range(0, length, buffer_size):
+        # Shuffles the view of the window in place
+        np.random.shuffle(rows[start:start + buffer_size])
+    return rows
+
+
+class ShuffleBuffer(PipelineStage):
+    """
+    ``ShuffleBuffer`` is a :class:`PipelineStage <deepview.base.PipelineStage>` that shuffles the
+    elements of the batches produced by the previous :class:`Producer <deepview.base.Producer>`
+    in a pipeline, while holding at most about ``buffer_size`` elements in memory.
+
+    Batches are read from the previous stages in their original order (e.g., sequentially from a
+    :class:`CachedProducer <deepview.base.CachedProducer>` or an
+    :class:`ImageProducer <deepview.base.ImageProducer>`), so the mixing is only as good as the
+    buffer is large: an element can only be emitted together with elements read around the same time.
+    This is usually enough for fitting statistics such as familiarity models or PCA,
+    and much cheaper than reading a large dataset in a random order.
+
+    Example:
+        .. code-block:: python
+
+            producer = ... # create a valid deepview Producer
+            shuffled_producer = pipeline(producer, ShuffleBuffer(buffer_size=4096))
+
+    Args:
+        buffer_size: number of elements shuffled together. The buffer always holds at least
+            one batch of elements.
+        seed: **[optional]** seed for the random order. If set, every call to the pipelined
+            producer yields the same order, otherwise the order changes on every call.
+
+    Raises:
+        ValueError: if ``buffer_size`` is smaller than 1
+    """
+
+    def __init__(self, buffer_size: int, seed: t.Optional[int] = None) -> None:
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        self.buffer_size = buffer_size
+        self.seed = seed
+
+    def _get_batch_processor(self) -> t.Callable[[Batch], Batch]:
+        # No need to implement this one since this is overriding pipeline
+        raise DeepViewException('Should never call this function in ShuffleBuffer')
+
+    def _pipeline(self, producer: Producer) -> Producer:
+        # Local copies, so the pipelined producer does not depend on later changes to self
+        buffer_size = self.buffer_size
+        seed = self.seed
+
+        def new_producer(batch_size: int) -> t.Iterable[Batch]:
+            random_state = np.random.RandomState(seed)
+            capacity = max(buffer_size, batch_size)
+            pending: t.List[_BatchStorage] = []
+            pending_size = 0
+
+            for batch in producer(batch_size):
+                pending.append(batch._storage)
+                pending_size += batch.batch_size
+                if pending_size < capacity:
+                    continue
+                # Emit (in shuffled order) about half the buffer and keep the rest to mix with the next batches
+                buffer = Batch(_storage=_concatenate_batches(pending))
+                order = random_state.permutation(pending_size)
+                n_emit = max(batch_size, (pending_size // 2) // batch_size * batch_size)
+                for start in range(0, n_emit, batch_size):
+                    yield buffer.elements[order[start:start + batch_size].tolist()]
+                pending = [buffer.elements[order[n_emit:].tolist()]._storage] if n_emit < pending_size else []
+                pending_size -= n_emit
+
+            if pending_size > 0:
+                buffer = Batch(_storage=_concatenate_batches(pending))
+                order = random_state.permutation(pending_size)
+                for start in range(0, pending_size, batch_size):
+                    yield buffer.elements[order[start:start + batch_size].tolist()]
+
+        return new_producer
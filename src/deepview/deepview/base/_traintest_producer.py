@@ -33,25 +33,119 @@
 #
 
 import os
+import concurrent.futures
+import copy
 import dataclasses
+import itertools
 import shutil
 
 import numpy as np
-try:
-    import cv2  # This is an optional deepview dependency
-except ImportError:
-    pass
 
 import random
 import string
 from pathlib import Path
 from ._batch._batch import Batch
 from ._producer import Producer
+from ._shuffle import _block_permutation
+from deepview import _image_io
 from deepview.exceptions import DeepViewException
 import deepview.typing as dt
 import deepview.typing._types as t
 
 
+class _StackedArrays(np.lib.mixins.NDArrayOperatorsMixin):
+    """
+    Read-only view of one or more arrays stacked along the first axis, without concatenating them.
+
+    Rows are only gathered from the underlying arrays (which may be memory-mapped) when indexed.
+    A view can also be restricted to a subset of the stacked rows (see :meth:`select`), in which
+    case it only stores the index vector of the selected rows.
+
+    If ``squeeze`` is True, like :func:`np.squeeze` on the concatenated array, non-batch axes
+    of size 1 are dropped. Arithmetic and comparisons materialize the view as a NumPy array.
+    """
+
+    def __init__(self, *arrays: np.ndarray, rows: t.Optional[np.ndarray] = None, squeeze: bool = True) -> None:
+        assert arrays, "_StackedArrays needs at least one array"
+        self._arrays = arrays
+        self._offsets = np.cumsum([0] + [len(array) for array in arrays])
+        self._rows = rows
+        self._squeeze = squeeze
+        item_shape = arrays[0].shape[1:]
+        if squeeze:
+            item_shape = tuple(dim for dim in item_shape if dim != 1)
+        length = int(self._offsets[-1]) if rows is None else len(rows)
+        self.shape: t.Tuple[int, ...] = (length,) + item_shape
+        self.dtype: np.dtype = np.result_type(*(array.dtype for array in arrays))
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype: t.Optional[np.dtype] = None, copy: t.Optional[bool] = None) -> np.ndarray:
+        result = self[:]
+        return result if dtype is None else result.astype(dtype)
+
+    def __array_ufunc__(self, ufunc: np.ufunc, method: str, *inputs: t.Any, **kwargs: t.Any) -> t.Any:
+        inputs = tuple(np.asarray(x) if isinstance(x, _StackedArrays) else x for x in inputs)
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def select(self, rows: np.ndarray, squeeze: t.Optional[bool] = None) -> '_StackedArrays':
+        """
+        Get a view of some rows of this view, sharing the same underlying arrays.
+
+        Args:
+            rows: indices of the rows to keep, relative to this view
+            squeeze: **[optional]** whether to drop non-batch axes of size 1.
+                If ``None``, keeps the setting of this view.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        if self._rows is not None:
+            # Compose with this view's own selection, so views never nest
+            rows = self._rows[rows]
+        return _StackedArrays(*self._arrays, rows=rows, squeeze=self._squeeze if squeeze is None else squeeze)
+
+    def __getitem__(self, index: t.Union[int, slice, t.Sequence[int], np.ndarray]) -> np.ndarray:
+        if isinstance(index, (int, np.integer)):
+            if not -len(self) <= index < len(self):
+                raise IndexError(f"index {index} is out of bounds for size {len(self)}")
+            index = int(index) % len(self)
+            if self._rows is not None:
+                index = int(self._rows[index])
+            part = int(np.searchsorted(self._offsets, index, side="right")) - 1
+            row = np.asarray(self._arrays[part][index - self._offsets[part]])
+            return row.reshape(self.shape[1:])[()]
+        if isinstance(index, slice):
+            index = np.arange(*index.indices(len(self)))
+        index = np.asarray(index, dtype=np.intp)
+        return self._gather(index if self._rows is None else self._rows[index])
+
+    def _gather(self, index: np.ndarray) -> np.ndarray:
+        result = np.empty((len(index),) + self.shape[1:], dtype=self.dtype)
+        parts = np.searchsorted(self._offsets, index, side="right") - 1
+        for part, array in enumerate(self._arrays):
+            positions = np.flatnonzero(parts == part)
+            if len(positions) == 0:
+                continue
+            local = index[positions] - self._offsets[part]
+            # Read rows in increasing order, which is much faster for memory-mapped arrays
+            order = np.argsort(local, kind="stable")
+            local, positions = local[order], positions[order]
+            if local[-1] - local[0] + 1 == len(local):
+                rows = array[local[0]:local[-1] + 1]  # contiguous rows: a single sequential read
+            else:
+                rows = array[local]
+            result[positions] = np.reshape(rows, (len(local),) + self.shape[1:])
+        return result
+
+
 @dataclasses.dataclass
 class TrainTestSplitProducer(Producer):
     """
@@ -74,10 +168,18 @@ class TrainTestSplitProducer(Producer):
 
         ``TrainTestSplitProducer(tf.keras.datasets.cifar10.load_data())``
 
+    The train and test arrays are never concatenated: batches gather their rows directly from
+    the arrays in ``split_dataset``. These can therefore be memory-mapped arrays (see
+    :func:`from_npy_files`) for datasets that do not fit in memory.
+
     Args:
         split_dataset: see :attr:`split_dataset`
         attach_metadata: **[optional]** see :attr:`attach_metadata`
         max_samples: **[optional]** see :attr:`max_samples`
+        write_to_folder: **[optional]** see :attr:`write_to_folder`
+        write_format: **[optional]** see :attr:`write_format`
+        write_quality: **[optional]** see :attr:`write_quality`
+        num_workers: **[optional]** see :attr:`num_workers`
     """
 
     split_dataset: dt.TrainTestSplitType
@@ -98,12 +200,25 @@ class TrainTestSplitProducer(Producer):
     write_to_folder: bool = False
     """bool to write data to folder for visualization. If False, does not write anything."""
 
-    _samples: np.ndarray = dataclasses.field(init=False)
-    _labels: np.ndarray = dataclasses.field(init=False)
-    _dataset_ids: np.ndarray = dataclasses.field(init=False)
-    _dataset_labels: np.ndarray = dataclasses.field(init=False)
+    write_format: str = "png"
+    """Image format used when :attr:`write_to_folder` is True, either ``"png"`` or ``"jpg"`` (faster)."""
+
+    write_quality: t.Optional[int] = None
+    """PNG compression level (0-9, lower is faster) or JPEG quality (0-100). ``None`` uses OpenCV defaults."""
+
+    num_workers: t.Optional[int] = None
+    """Number of threads used to write images to folder. ``None`` lets the thread pool decide."""
+
+    _subset_rows: t.Optional[np.ndarray] = dataclasses.field(default=None, repr=False, compare=False)
+    """Rows of :attr:`split_dataset` (train rows first, then test rows) produced by a subset, or ``None`` for all."""
+
+    _samples: _StackedArrays = dataclasses.field(init=False)
+    _labels: _StackedArrays = dataclasses.field(init=False)
+    _dataset_ids: _StackedArrays = dataclasses.field(init=False)
+    _dataset_labels: _StackedArrays = dataclasses.field(init=False)
     _permutation: t.Optional[np.ndarray] = dataclasses.field(init=False)
     _temp_folder: t.Optional[str] = dataclasses.field(init=False)
+    _written_files: t.Dict[str, t.Tuple[int, int]] = dataclasses.field(init=False)
 
     def __post_init__(self) -> None:
         # Verify type of data matches expectation
@@ -131,41 +246,94 @@ class TrainTestSplitProducer(Producer):
             raise DeepViewException("x_test and y_test must be of the same length.")
         elif x_train.shape[0] != y_train.shape[0]:
             raise DeepViewException("x_train and y_train must be of the same length.")
-        elif x_test.size == 0:
-            self._samples = np.squeeze(x_train)
-            self._labels = np.squeeze(y_train)
-            self._dataset_ids = np.full(len(x_train), 0)
-            self._dataset_labels = np.full(len(x_train), "train")
-        elif x_train.size == 0:
-            self._samples = np.squeeze(x_test)
-            self._labels = np.squeeze(y_test)
-            self._dataset_ids = np.full(len(x_test), 1)
-            self._dataset_labels = np.full(len(x_test), "test")
         else:
-            self._samples = np.squeeze(np.concatenate((x_train, x_test)))
-            self._labels = np.squeeze(np.concatenate((y_train, y_test)))
-            self._dataset_ids = np.concatenate((np.full(len(x_train), 0),
-                                                np.full(len(x_test), 1)))
-            self._dataset_labels = np.concatenate((np.full(len(x_train), "train"),
-                                                   np.full(len(x_test), "test")))
+            self._init_views()
+
+        self._init_iteration_state()
 
+    def _init_views(self) -> None:
+        """Build the index-mapped views over :attr:`split_dataset`, restricted to the rows of a subset if any."""
+        (x_train, y_train), (x_test, y_test) = self.split_dataset
+        # Keep only non-empty parts, each with its dataset id and name
+        parts = [(x, y, dataset_id, name)
+                 for x, y, dataset_id, name in ((x_train, y_train, 0, "train"), (x_test, y_test, 1, "test"))
+                 if x.size > 0]
+        # Index-mapped views over the original arrays; no concatenated copy is ever made
+        self._samples = _StackedArrays(*(x for x, _, _, _ in parts))
+        self._labels = _StackedArrays(*(y for _, y, _, _ in parts))
+        self._dataset_ids = _StackedArrays(
+            *(np.broadcast_to(np.array(dataset_id), (len(x),)) for x, _, dataset_id, _ in parts))
+        self._dataset_labels = _StackedArrays(
+            *(np.broadcast_to(np.array(name), (len(x),)) for x, _, _, name in parts))
+        if self._subset_rows is not None:
+            self._samples = self._samples.select(self._subset_rows)
+            self._labels = self._labels.select(self._subset_rows)
+            self._dataset_ids = self._dataset_ids.select(self._subset_rows)
+            self._dataset_labels = self._dataset_labels.select(self._subset_rows)
+
+    def _init_iteration_state(self) -> None:
+        """Initialize what is specific to this instance (and not shared with subsets) once data is set."""
         if self.max_samples < 0 or self.max_samples > len(self._samples):
             # If max_samples is less than 0 or greater than the dataset, sample the whole dataset
             self.max_samples = len(self._samples)
 
+        self._written_files = {}
+        self._temp_folder = None
         if self.write_to_folder:
+            # Fail early on unsupported formats
+            _image_io.image_write_params(self.write_format, self.write_quality)
             random_string = ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(6))
             self._temp_folder = './deepview-dataset-' + random_string
             os.makedirs(self._temp_folder, exist_ok=True)
 
         self._permutation = None
 
-    def shuffle(self) -> None:
+    @classmethod
+    def from_npy_files(cls,
+                       x_train: t.Union[str, os.PathLike], y_train: t.Union[str, os.PathLike],
+                       x_test: t.Union[str, os.PathLike], y_test: t.Union[str, os.PathLike],
+                       **kwargs: t.Any) -> 'TrainTestSplitProducer':
+        """
+        Create a producer whose samples and labels are memory-mapped from ``.npy`` files,
+        so that only the rows of the requested batches are ever read into memory.
+
+        Args:
+            x_train: path to the ``.npy`` file with the train features
+            y_train: path to the ``.npy`` file with the train labels
+            x_test: path to the ``.npy`` file with the test features
+            y_test: path to the ``.npy`` file with the test labels
+            kwargs: **[optional]** any other argument of this class (e.g. ``max_samples``)
+
+        Returns:
+            a new producer backed by the memory-mapped arrays
+        """
+        def load(path: t.Union[str, os.PathLike]) -> np.ndarray:
+            return np.load(path, mmap_mode="r")
+
+        return cls(split_dataset=((load(x_train), load(y_train)), (load(x_test), load(y_test))), **kwargs)
+
+    def shuffle(self, block_size: t.Optional[int] = None, buffer_size: t.Optional[int] = None) -> None:
         """
         Shuffle the dataset, to produce randomized samples in batches.
         Note: this shuffling will not transfer to subsets.
+
+        By default, samples are fully permuted, so every batch gathers rows from anywhere in the
+        dataset. For memory-mapped data, set ``block_size`` to shuffle blocks of contiguous rows
+        instead, and then rows within a window of ``buffer_size`` rows. Batches then read from
+        only a few contiguous ranges, which is much faster on disk and still mixes the data well
+        enough to fit familiarity models or PCA.
+
+        Args:
+            block_size: **[optional]** number of contiguous rows shuffled as a block.
+                If ``None``, the whole dataset is permuted.
+            buffer_size: **[optional]** number of rows shuffled together when ``block_size`` is set
+                (default: 16 blocks)
         """
-        self._permutation = np.random.permutation(len(self._samples))
+        if block_size is None:
+            self._permutation = np.random.permutation(len(self._samples))
+        else:
+            self._permutation = _block_permutation(len(self._samples), block_size,
+                                                   16 * block_size if buffer_size is None else buffer_size)
 
     def subset(self, labels: dt.OneManyOrNone[t.Hashable] = None,
                datasets: dt.OneManyOrNone[str] = None,
@@ -183,6 +351,10 @@ class TrainTestSplitProducer(Producer):
             max_samples: **[optional]** how many data samples to include (-1 for all).
                          If not set, will use the existing instance's ``max_samples``.
 
+        The subset does not copy any data: its ``split_dataset`` holds the same arrays as this
+        producer, and it only stores the indices of the selected samples, whose rows are gathered
+        per batch. Subsets of subsets compose their indices.
+
         Returns:
             a new :class:`TrainTestSplitProducer` of the same class that
             produces only the filtered data
@@ -197,47 +369,59 @@ class TrainTestSplitProducer(Producer):
         if labels is not None and len(labels) == 0:
             raise ValueError("'labels' field is of length 0. Maybe it should be None?")
 
-        (x_train, y_train), (x_test, y_test) = self.split_dataset
-
+        # Select rows of this producer, then map them to rows of the shared split_dataset
+        keep = np.ones(len(self._samples), dtype=bool)
         if datasets is not None:
-            if "train" not in datasets:
-                x_train = np.empty((0,))
-                y_train = np.empty((0,))
-            if "test" not in datasets:
-                x_test = np.empty((0,))
-                y_test = np.empty((0,))
-
+            keep &= np.isin(np.asarray(self._dataset_labels), list(datasets))
         if labels is not None:
-            # Convert labels to numpy array for faster comparison
-            labels_array = np.array(list(labels))
-            # Create boolean masks using numpy's in1d
-            train_filter = np.in1d(np.squeeze(y_train), labels_array)
-            test_filter = np.in1d(np.squeeze(y_test), labels_array)
-            # Apply filters
-            x_train = x_train[train_filter]
-            y_train = y_train[train_filter]
-            x_test = x_test[test_filter]
-            y_test = y_test[test_filter]
-
-        # Return a copy of the same class type as self, with the filtered dataset fields
-        return dataclasses.replace(
-            self,
-            split_dataset=((x_train, y_train), (x_test, y_test)),
-            max_samples=(self.max_samples if max_samples is None else max_samples)
-        )
+            keep &= np.isin(np.asarray(self._labels), np.array(list(labels)))
+        rows = np.flatnonzero(keep)
+        if len(rows) == 0:
+            raise DeepViewException("Only one of x_train or x_test can be empty.")
+
+        # Return a shallow copy of the same class type as self, which shares the data of self
+        subset = copy.copy(self)
+        subset._subset_rows = rows if self._subset_rows is None else self._subset_rows[rows]
+        subset.max_samples = self.max_samples if max_samples is None else max_samples
+        subset._init_views()
+        subset._init_iteration_state()
+        return subset
 
     def _class_path(self, index: int) -> str:
         return f"{self._dataset_labels[index]}/{self._labels[index]}"
 
     def _write_images_to_disk(self, indices: t.Sequence[int], data_path: str) -> t.List[str]:
+        """
+        Write the samples at ``indices`` to ``data_path`` (in parallel) and return their file paths.
+
+        Files written by an earlier call of this producer are not encoded again, as long as their
+        size and modification time are unchanged. Files left on disk by other producers or
+        earlier runs are always overwritten.
+        """
+        extension, params = _image_io.image_write_params(self.write_format, self.write_quality)
         file_paths = []
+        to_write = []
         for idx in indices:
-            base_path = os.path.join(data_path, self._class_path(idx))
-            Path(base_path).mkdir(exist_ok=True, parents=True)
-            filename = os.path.join(base_path, f"image{idx}.png")
-            # Write to disk after converting to BGR format, used by opencv
-            cv2.imwrite(filename, cv2.cvtColor(self._samples[idx, ...], cv2.COLOR_RGB2BGR))
+            filename = os.path.join(data_path, self._class_path(idx), f"image{idx}{extension}")
             file_paths.append(filename)
+            signature = self._written_files.get(filename)
+            if signature is None or signature != _image_io.file_signature(filename):
+                to_write.append((idx, filename))
+
+        if to_write:
+            for base_path in {os.path.dirname(filename) for _, filename in to_write}:
+                Path(base_path).mkdir(exist_ok=True, parents=True)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers,
+                                                       thread_name_prefix="image_export_") as executor:
+                # list() to propagate any exception raised while writing
+                list(executor.map(_image_io.write_image,
+                                  [filename for _, filename in to_write],
+                                  [self._samples[idx] for idx, _ in to_write],
+                                  itertools.repeat(params)))
+            for _, filename in to_write:
+                signature = _image_io.file_signature(filename)
+                if signature is not None:
+                    self._written_files[filename] = signature
 
         return file_paths
 
@@ -267,9 +451,9 @@ class TrainTestSplitProducer(Producer):
             else:
                 indices = self._permutation[ii:jj].tolist()
 
-            # Create batch from data already in memory
+            # Create batch by gathering its rows from the train/test arrays
             builder = Batch.Builder(
-                fields={"samples": self._samples[indices, ...]}
+                fields={"samples": self._samples[indices]}
             )
 
             if self.attach_metadata:
@@ -282,9 +466,9 @@ class TrainTestSplitProducer(Producer):
                     builder.metadata[Batch.StdKeys.IDENTIFIER] = indices
 
                 # Add class and dataset labels
-                labels_dict = {
-                    "label": np.take(self._labels, indices),
-                    "dataset": np.take(self._dataset_labels, indices)
+                labels_dict: t.Mapping[str, t.Any] = {
+                    "label": self._labels[indices],
+                    "dataset": self._dataset_labels[indices]
                 }
                 builder.metadata[Batch.StdKeys.LABELS] = labels_dict
 
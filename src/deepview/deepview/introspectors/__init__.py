@@ -32,68 +32,127 @@
 # limitations under the License.
 #
 
-# DimReduction imports
-from ._dim_reduction._dimension_reduction import DimensionReduction, OneOrManyDimStrategies
-from ._dim_reduction._protocols import DimensionReductionStrategyType
+import importlib
 
-# Duplicates imports
-from ._duplicates import (
-    DuplicatesThresholdStrategyType,
-    DuplicatesStrategyType,
-    Duplicates,
-    DuplicatesConfig
-)
+import deepview.typing._types as t
 
-# Familiarity imports
-from ._familiarity._protocols import (
-    FamiliarityStrategyType,
-    FamiliarityResult,
-    FamiliarityDistribution
-)
-from ._familiarity._familiarity import Familiarity
-from ._familiarity._gmm_familiarity import GMMCovarianceType
+# Introspectors depend on heavy libraries (sklearn, scipy, annoy, autofaiss, matplotlib, pandas),
+#    so they are imported lazily (PEP 562), the first time one of their attributes is accessed.
+#    Importing deepview.introspectors is then cheap for code that only builds pipelines.
+_LAZY_ATTRIBUTES: t.Final[t.Mapping[str, str]] = {
+    # DimReduction
+    "DimensionReduction": "._dim_reduction._dimension_reduction",
+    "OneOrManyDimStrategies": "._dim_reduction._dimension_reduction",
+    "DimensionReductionStrategyType": "._dim_reduction._protocols",
 
-# IUA imports
-from ._iua._iua import IUA
+    # Duplicates
+    "DuplicatesThresholdStrategyType": "._duplicates",
+    "DuplicatesStrategyType": "._duplicates",
+    "DuplicatesStreamingStrategyType": "._duplicates",
+    "DuplicatesStreamingIndexType": "._duplicates",
+    "Duplicates": "._duplicates",
+    "DuplicatesConfig": "._duplicates",
+    "DuplicatesIndex": "._duplicates",
+    "DuplicatesLeakage": "._duplicates",
 
-# PFA imports
-from ._pfa._recommendation import (
-    PFAKLDiagnostics,
-    PFAEnergyDiagnostics,
-    PFARecipe,
-)
-from ._pfa._pfa_units import PFAUnitSelectionStrategyType
-from ._pfa._pfa_algorithms import PFAStrategyType
-from ._pfa._covariances_calculator import PFACovariancesResult
-from ._pfa._pfa import PFA
+    # Familiarity
+    "FamiliarityStrategyType": "._familiarity._protocols",
+    "FamiliarityResult": "._familiarity._protocols",
+    "FamiliarityDistribution": "._familiarity._protocols",
+    "Familiarity": "._familiarity._familiarity",
+    "GMMCovarianceType": "._familiarity._gmm_familiarity",
 
-# Dataset Report imports
-from ._report._dataset_report import DatasetReport
-from ._report._dataset_report_stages import ReportConfig
+    # IUA
+    "IUA": "._iua._iua",
+
+    # PFA
+    "PFAKLDiagnostics": "._pfa._recommendation",
+    "PFAEnergyDiagnostics": "._pfa._recommendation",
+    "PFARecipe": "._pfa._recommendation",
+    "PFAUnitSelectionStrategyType": "._pfa._pfa_units",
+    "PFAStrategyType": "._pfa._pfa_algorithms",
+    "PFACovariancesResult": "._pfa._covariances_calculator",
+    "PFA": "._pfa._pfa",
+
+    # Dataset Report
+    "DatasetReport": "._report._dataset_report",
+    "ReportConfig": "._report._dataset_report_stages",
+}
+
+if t.TYPE_CHECKING:
+    # Static type checkers and IDEs see the regular imports
+    from ._dim_reduction._dimension_reduction import DimensionReduction, OneOrManyDimStrategies
+    from ._dim_reduction._protocols import DimensionReductionStrategyType
+    from ._duplicates import (
+        DuplicatesThresholdStrategyType,
+        DuplicatesStrategyType,
+        DuplicatesStreamingStrategyType,
+        DuplicatesStreamingIndexType,
+        Duplicates,
+        DuplicatesConfig,
+        DuplicatesIndex,
+        DuplicatesLeakage,
+    )
+    from ._familiarity._protocols import (
+        FamiliarityStrategyType,
+        FamiliarityResult,
+        FamiliarityDistribution
+    )
+    from ._familiarity._familiarity import Familiarity
+    from ._familiarity._gmm_familiarity import GMMCovarianceType
+    from ._iua._iua import IUA
+    from ._pfa._recommendation import (
+        PFAKLDiagnostics,
+        PFAEnergyDiagnostics,
+        PFARecipe,
+    )
+    from ._pfa._pfa_units import PFAUnitSelectionStrategyType
+    from ._pfa._pfa_algorithms import PFAStrategyType
+    from ._pfa._covariances_calculator import PFACovariancesResult
+    from ._pfa._pfa import PFA
+    from ._report._dataset_report import DatasetReport
+    from ._report._dataset_report_stages import ReportConfig
+
+
+def __getattr__(name: str) -> t.Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    # Cache the attribute in the module, so __getattr__ is only called once per attribute
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> t.List[str]:
+    return sorted(list(globals()) + __all__)
 
 
 # Public element lists
 __all__ = [
-    DimensionReduction.__name__,
-    DimensionReductionStrategyType.__name__,
-    'OneOrManyDimStrategies',
-    Duplicates.__name__,
-    DuplicatesThresholdStrategyType.__name__,
-    DuplicatesStrategyType.__name__,
-    DuplicatesConfig.__name__,
-    IUA.__name__,
-    FamiliarityDistribution.__name__,
-    FamiliarityStrategyType.__name__,
-    FamiliarityResult.__name__,
-    Familiarity.__name__,
-    GMMCovarianceType.__name__,
-    PFA.__name__,
-    PFAKLDiagnostics.__name__,
-    PFAEnergyDiagnostics.__name__,
-    PFARecipe.__name__,
-    PFAUnitSelectionStrategyType.__name__,
-    PFAStrategyType.__name__,
-    PFACovariancesResult.__name__,
-    DatasetReport.__name__,
-    ReportConfig.__name__,
+    "DimensionReduction",
+    "DimensionReductionStrategyType",
+    "OneOrManyDimStrategies",
+    "Duplicates",
+    "DuplicatesThresholdStrategyType",
+    "DuplicatesStrategyType",
+    "DuplicatesStreamingStrategyType",
+    "DuplicatesStreamingIndexType",
+    "DuplicatesConfig",
+    "DuplicatesIndex",
+    "DuplicatesLeakage",
+    "IUA",
+    "FamiliarityDistribution",
+    "FamiliarityStrategyType",
+    "FamiliarityResult",
+    "Familiarity",
+    "GMMCovarianceType",
+    "PFA",
+    "PFAKLDiagnostics",
+    "PFAEnergyDiagnostics",
+    "PFARecipe",
+    "PFAUnitSelectionStrategyType",
+    "PFAStrategyType",
+    "PFACovariancesResult",
+    "DatasetReport",
+    "ReportConfig",
 ]
@@ -38,9 +38,6 @@ import contextlib
 from dataclasses import dataclass, field, replace
 
 import numpy as np
-from sklearn.decomposition import IncrementalPCA
-from sklearn.decomposition import PCA as SKPCA
-from sklearn.manifold import TSNE as SKTSNE
 
 from ._protocols import DimensionReductionStrategyType
 from deepview.exceptions import DeepViewException
@@ -71,9 +68,12 @@ class PCA(DimensionReductionStrategyType):
     target_dimensions: int = 2
     """Target dimensionality of the data."""
 
-    _pca: IncrementalPCA = field(init=False)
+    _pca: t.Any = field(init=False)
 
     def __post_init__(self) -> None:
+        # Import sklearn when the strategy is instantiated, to keep importing deepview cheap
+        from sklearn.decomposition import IncrementalPCA
+
         # This allows setting an attribute within a frozen dataclass
         object.__setattr__(self, '_pca', IncrementalPCA(n_components=self.target_dimensions))
 
@@ -157,9 +157,12 @@ class StandardPCA(_Accumulator, DimensionReductionStrategyType):
     target_dimensions: int = 2
     """Target dimensionality of the data."""
 
-    _pca: SKPCA = field(init=False)
+    _pca: t.Any = field(init=False)
 
     def __post_init__(self) -> None:
+        # Import sklearn when the strategy is instantiated, to keep importing deepview cheap
+        from sklearn.decomposition import PCA as SKPCA
+
         # This allows setting an attribute within a frozen dataclass
         object.__setattr__(self, '_pca', SKPCA(n_components=self.target_dimensions))
 
@@ -202,10 +205,13 @@ class TSNE(_Accumulator, DimensionReductionStrategyType):
     _parameters: t.Optional[t.Mapping[str, t.Any]] = None
     """Optional parameters for the TSNE algorithm -- pass as kwargs"""
 
-    _tsne: SKTSNE = field(init=False)
+    _tsne: t.Any = field(init=False)
 
     def __init__(self, target_dimensions: int = 2, *,
                  _parameters: t.Optional[t.Mapping[str, t.Any]] = None, **kwargs: t.Any) -> None:
+        # Import sklearn when the strategy is instantiated, to keep importing deepview cheap
+        from sklearn.manifold import TSNE as SKTSNE
+
         super().__init__()
         object.__setattr__(self, 'target_dimensions', target_dimensions)
         object.__setattr__(self, '_parameters', _parameters or kwargs)
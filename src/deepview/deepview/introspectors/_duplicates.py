@@ -33,25 +33,38 @@
 #
 
 import numpy as np
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import functools
 import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
 from tqdm import tqdm
 
-import annoy
-from autofaiss import build_index
-
-from sklearn.decomposition import PCA as SKLearnPCA
-
 from deepview.base import (
     Batch,
     Producer,
     Introspector,
+    PipelineStage,
 )
+from deepview.exceptions import DeepViewException
+from deepview.base._batch._storage import _concatenate_batches
 from deepview.base._producer import _accumulate_batches
+from deepview.base._response_cache import ResponseCache
 import deepview.typing._types as t
 
 _logger = logging.getLogger("deepview.introspectors.duplicates")
 
+# side of the thumbnail compared by the perceptual hash, giving 64 bit hashes
+_PERCEPTUAL_HASH_SIZE = 8
+
+# files of a saved DuplicatesIndex
+_INDEX_FILE = "index.ann"
+_METADATA_FILE = "metadata.pkl"
+
 
 class DuplicatesThresholdStrategyType(t.Protocol):
     """
@@ -88,24 +101,198 @@ class DuplicatesStrategyType(t.Protocol):
         ...
 
 
+class DuplicatesStreamingIndexType(t.Protocol):
+    """
+    Protocol for a nearest neighbor index that is filled one batch of vectors at a time,
+    see :class:`DuplicatesStreamingStrategyType`.
+    """
+
+    def add(self, vectors: np.ndarray) -> None:
+        """
+        Add vectors to the index, numbered after the vectors that were already added.
+
+        Args:
+            vectors: n-dimensional vectors
+        """
+        ...
+
+    def clusters(self, threshold: DuplicatesThresholdStrategyType) -> t.Sequence[t.Sequence[int]]:
+        """
+        Build the index and compute the list of duplicates for each point.
+
+        Args:
+            threshold: strategy for computing the threshold
+        """
+        ...
+
+    def close(self) -> None:
+        """Release the index and its backing storage."""
+        ...
+
+
+@t.runtime_checkable
+class DuplicatesStreamingStrategyType(t.Protocol):
+    """
+    Protocol for strategies that can build their index without holding all vectors in memory,
+    used by :func:`Duplicates.introspect <Duplicates.introspect>` with ``streaming=True``.
+    """
+
+    def streaming_index(self, dimension: int, path: str) -> DuplicatesStreamingIndexType:
+        """
+        Create an empty index for vectors of the given dimension.
+
+        Args:
+            dimension: number of dimensions of the vectors
+            path: file backing the index
+        """
+        ...
+
+
+def _run_in_chunks(function: t.Callable[[range], None], count: int, num_workers: int) -> None:
+    # split range(count) in a few chunks per thread and run ``function`` on each of them
+    chunk_size = max(1, -(-count // (num_workers * 4)))
+    chunks = [range(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+    if num_workers == 1 or len(chunks) == 1:
+        for chunk in chunks:
+            function(chunk)
+    else:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            # consume the results to raise any exception from the threads
+            list(executor.map(function, chunks))
+
+
+def _threshold_distance(distances: np.ndarray, threshold: DuplicatesThresholdStrategyType) -> float:
+    # find the distance threshold
+    all_values = np.trim_zeros(np.sort(distances.reshape((distances.size, ))))
+    if len(all_values) == 0:
+        # no distances, or only exact duplicates: only the exact duplicates are close
+        distance = 0.0
+    else:
+        distance = threshold(all_values)
+    del all_values
+    _logger.debug("Computed distance threshold: %f", distance)
+    return distance
+
+
+def _clusters_within_threshold(distances: np.ndarray, indexes: np.ndarray,
+                               threshold: DuplicatesThresholdStrategyType) -> t.Sequence[t.Sequence[int]]:
+    distance = _threshold_distance(distances, threshold)
+
+    # build the clusters of length up to n
+    clusters = []
+    for i, count in enumerate(np.count_nonzero(distances <= distance, axis=1)):
+        if count > 1:
+            clusters.append(indexes[i][distances[i] <= distance])
+
+    _logger.info("Found %d duplicate clusters", len(clusters))
+    return clusters
+
+
+def _principal_components(samples: np.ndarray, n_components: int) -> np.ndarray:
+    """
+    Project each set of samples (the last two axes) on its first ``n_components`` principal
+    components, with one batched SVD for all the sets.
+    """
+    centered = samples - samples.mean(axis=-2, keepdims=True)
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    vt = vt[..., :n_components, :]
+
+    # deterministic signs: the largest coefficient of each component is positive, like sklearn
+    largest = np.take_along_axis(vt, np.abs(vt).argmax(axis=-1)[..., np.newaxis], axis=-1)
+    vt = vt * np.where(largest < 0, -1, 1)
+
+    return centered @ vt.swapaxes(-1, -2)
+
+
 @t.final
 @dataclass(frozen=True)
-class KNNAnnoy(DuplicatesStrategyType):
+class KNNAnnoy(DuplicatesStrategyType, DuplicatesStreamingStrategyType):
     """
     Strategy for computing duplicates using the Annoy library.
+
+    Nearest neighbor queries run in a thread pool (Annoy releases the GIL while querying),
+    and the build and query times are logged.  This strategy supports streaming, in which
+    case the index is built on disk.
+
+    Args:
+        n_trees: **[optional]** see :attr:`n_trees`
+        n: **[optional]** see :attr:`n`
+        num_workers: **[optional]** see :attr:`num_workers`
+    """
+
+    n_trees: int = 30
+    """
+    Number of trees to build -- the higher the number, the better the precision when querying
+    (at the cost of time and memory).
+    """
+
+    n: int = 10
+    """
+    Number of nearest neighbors to find for each sample. n can be anything >= 2.  Larger values will
+    produce larger initial clusters and a value of 10 gives similar distance
+    threshold results as the previous kCDTree implementation.  performance
+    does not vary much for different n (2, 5, 10).
     """
 
+    num_workers: t.Optional[int] = None
+    """Number of threads used to build the index and query it (the number of CPUs if ``None``)."""
+
+    def __post_init__(self) -> None:
+        if self.n_trees < 1:
+            raise ValueError("`n_trees` must be >= 1")
+        if self.n < 2:
+            raise ValueError("`n` must be >= 2")
+
+    @property
+    def _num_workers(self) -> int:
+        return self.num_workers or os.cpu_count() or 1
+
+    @staticmethod
+    def _new_index(dimension: int) -> t.Any:
+        # Import annoy when it is needed, to keep importing deepview cheap
+        import annoy
+
+        index = annoy.AnnoyIndex(dimension, "euclidean")
+        index.set_seed(0)
+        _logger.debug("Creating Annoy index with dimension %d ", dimension)
+        return index
+
+    def _build(self, index: t.Any) -> None:
+        start_time = time.perf_counter()
+        index.build(self.n_trees, n_jobs=self._num_workers)
+        _logger.info("Built Annoy index with %d trees in %.2fs", self.n_trees, time.perf_counter() - start_time)
+
+    def _query(self, index: t.Any) -> t.Tuple[np.ndarray, np.ndarray]:
+        count = index.get_n_items()
+        num_workers = self._num_workers
+
+        # n-closest distance matrix
+        n = min(self.n, count)
+        distances = np.zeros((count, n))
+        indexes = np.zeros((count, n), "i")
+        _logger.debug("Finding %d nearest neighbors for each sample", n)
+
+        def query(rows: range) -> None:
+            # each thread writes its own rows of the preallocated matrices
+            for i in rows:
+                indexes[i], distances[i] = index.get_nns_by_item(i, n, include_distances=True)
+
+        # build the n-closest distance matrix
+        start_time = time.perf_counter()
+        _run_in_chunks(query, count, num_workers)
+        _logger.info("Queried %d nearest neighbors of %d samples with %d threads in %.2fs",
+                     n, count, num_workers, time.perf_counter() - start_time)
+
+        return distances, indexes
+
     def __call__(self, responses: np.ndarray,
                  threshold: DuplicatesThresholdStrategyType) -> t.Sequence[t.Sequence[int]]:
         assert len(responses.shape) == 2, "Requires 1d vector per element"
-        count = len(responses)
-
-        _logger.info("Building duplicate clusters with %d samples", count)
+        _logger.info("Building duplicate clusters with %d samples", len(responses))
 
         # build the index
-        index = annoy.AnnoyIndex(responses.shape[1], "euclidean")
-        index.set_seed(0)
-        _logger.debug("Creating Annoy index with dimension %d ", responses.shape[1])
+        start_time = time.perf_counter()
+        index = self._new_index(responses.shape[1])
 
         # Add items to index with progress bar if in debug mode
         if _logger.isEnabledFor(logging.DEBUG):
@@ -116,40 +303,45 @@ class KNNAnnoy(DuplicatesStrategyType):
             for i, v in enumerate(responses):  # type: ignore
                 index.add_item(i, v)
 
-        _logger.debug("Completed adding items to Annoy index %d ", index.get_n_items())
+        _logger.debug("Completed adding items to Annoy index %d in %.2fs",
+                      index.get_n_items(), time.perf_counter() - start_time)
 
-        # the 30 is the number of trees to build -- the higher the number,
-        # the better the precision when querying (at the cost of time and memory).
-        index.build(30)
-        _logger.debug("Built Annoy index with 30 trees")
+        self._build(index)
+        distances, indexes = self._query(index)
+        return _clusters_within_threshold(distances, indexes, threshold)
 
-        # n-closest distance matrix.  n can be anything > 2.  larger values will
-        # produce larger initial clusters and a value of 10 gives similar distance
-        # threshold results as the previous kCDTree implementation.  performance
-        # does not vary much for different n (2, 5, 10).
-        n = 10
-        distances = np.zeros((count, n))
-        indexes = np.zeros((count, n), "i")
-        _logger.debug("Finding %d nearest neighbors for each sample", n)
+    def streaming_index(self, dimension: int, path: str) -> DuplicatesStreamingIndexType:
+        """
+        Create an empty Annoy index that is built in the file at ``path`` rather than in memory.
 
-        # build the n-closest distance matrix
-        for i in range(count):
-            indexes[i], distances[i] = index.get_nns_by_item(i, n, include_distances=True)
+        Args:
+            dimension: number of dimensions of the vectors
+            path: file backing the index
+        """
+        index = self._new_index(dimension)
+        index.on_disk_build(path)
+        return _AnnoyStreamingIndex(self, index)
 
-        # find the distance threshold
-        all_values = np.trim_zeros(np.sort(distances.reshape((count * n, ))))
-        distance = threshold(all_values)
-        del all_values
-        _logger.debug("Computed distance threshold: %f", distance)
 
-        # build the clusters of length up to n
-        clusters = []
-        for i, count in enumerate(np.count_nonzero(distances <= distance, axis=1)):
-            if count > 1:
-                clusters.append(indexes[i][distances[i] <= distance])
+@dataclass
+class _AnnoyStreamingIndex(DuplicatesStreamingIndexType):
+    strategy: KNNAnnoy
+    index: t.Any
+    count: int = 0
+
+    def add(self, vectors: np.ndarray) -> None:
+        for v in vectors:
+            self.index.add_item(self.count, v)
+            self.count += 1
+
+    def clusters(self, threshold: DuplicatesThresholdStrategyType) -> t.Sequence[t.Sequence[int]]:
+        _logger.info("Building duplicate clusters with %d samples", self.count)
+        self.strategy._build(self.index)
+        distances, indexes = self.strategy._query(self.index)
+        return _clusters_within_threshold(distances, indexes, threshold)
 
-        _logger.info("Found %d duplicate clusters", len(clusters))
-        return clusters
+    def close(self) -> None:
+        self.index.unload()
 
 
 @t.final
@@ -169,11 +361,14 @@ class KNNFaiss(DuplicatesStrategyType):
 
         current_level = _logger.getEffectiveLevel()
 
+        # Import autofaiss when it is needed, to keep importing deepview cheap
+        from autofaiss import build_index
+
         # build the index
         index, index_infos = build_index(embeddings=responses, metric_type="l2", verbose=current_level,
                                          max_index_memory_usage="4G", current_memory_available="8G", save_on_disk=False)
 
-        # n-closest distance matrix.  n can be anything > 2.  larger values will
+        # n-closest distance matrix.  n can be anything >= 2.  Larger values will
         # produce larger initial clusters
         n = 10
         _logger.debug("Finding %d nearest neighbors for each sample using batch search", n)
@@ -182,20 +377,85 @@ class KNNFaiss(DuplicatesStrategyType):
         # This is much more efficient than searching one vector at a time
         distances, indexes = index.search(responses, n)
 
-        # find the distance threshold
-        all_values = np.trim_zeros(np.sort(distances.reshape((count * n, ))))
-        distance = threshold(all_values)
-        del all_values
-        _logger.debug("Computed distance threshold: %f", distance)
+        return _clusters_within_threshold(distances, indexes, threshold)
 
-        # build the clusters of length up to n
-        clusters = []
-        for i, count in enumerate(np.count_nonzero(distances <= distance, axis=1)):
-            if count > 1:
-                clusters.append(indexes[i][distances[i] <= distance])
 
-        _logger.info("Found %d duplicate clusters", len(clusters))
-        return clusters
+@t.final
+@dataclass(frozen=True)
+class BruteForce(DuplicatesStrategyType):
+    """
+    Strategy for computing duplicates with an exact nearest neighbor search.
+
+    Distances are computed block by block with matrix products (which use the multi-threaded
+    BLAS numpy is linked against) and the nearest neighbors of each block are selected with
+    ``argpartition``, so memory stays bounded by ``block_size * len(vectors)`` distances.
+    For up to a few hundred thousand reduced vectors this is often faster than building an
+    approximate index, and it never misses a neighbor.
+
+    Args:
+        block_size: **[optional]** see :attr:`block_size`
+        n: **[optional]** see :attr:`n`
+    """
+
+    block_size: int = 1024
+    """Number of rows of the distance matrix computed at a time."""
+
+    n: int = 10
+    """Number of nearest neighbors to find for each sample (>= 2)."""
+
+    def __post_init__(self) -> None:
+        if self.block_size < 1:
+            raise ValueError("`block_size` must be >= 1")
+        if self.n < 2:
+            raise ValueError("`n` must be >= 2")
+
+    def _nearest_neighbors(self, responses: np.ndarray) -> t.Tuple[np.ndarray, np.ndarray]:
+        count = len(responses)
+        n = min(self.n, count)
+        squared_norms = np.einsum("ij,ij->i", responses, responses)
+
+        distances = np.zeros((count, n))
+        indexes = np.zeros((count, n), "i")
+        for start in range(0, count, self.block_size):
+            end = min(start + self.block_size, count)
+            rows = np.arange(end - start)
+
+            # squared euclidean distances of the block to every vector
+            block = responses[start:end] @ responses.T
+            block *= -2
+            block += squared_norms[start:end, np.newaxis]
+            block += squared_norms[np.newaxis, :]
+            np.maximum(block, 0, out=block)
+            # remove the rounding error on the distance of each vector to itself
+            block[rows, rows + start] = 0
+
+            # select the n closest (unordered), then order them by distance
+            if n < count:
+                nearest = np.argpartition(block, n - 1, axis=1)[:, :n]
+            else:
+                nearest = np.broadcast_to(np.arange(count), (end - start, count))
+            nearest_distances = np.take_along_axis(block, nearest, axis=1)
+            order = np.argsort(nearest_distances, axis=1, kind="stable")
+
+            indexes[start:end] = np.take_along_axis(nearest, order, axis=1)
+            distances[start:end] = np.sqrt(np.take_along_axis(nearest_distances, order, axis=1))
+
+        return distances, indexes
+
+    def __call__(self, responses: np.ndarray,
+                 threshold: DuplicatesThresholdStrategyType) -> t.Sequence[t.Sequence[int]]:
+        assert len(responses.shape) == 2, "Requires 1d vector per element"
+        count = len(responses)
+
+        _logger.info("Building duplicate clusters with %d samples using brute force", count)
+
+        start_time = time.perf_counter()
+        distances, indexes = self._nearest_neighbors(responses)
+        n = distances.shape[1]
+        _logger.info("Computed %d exact nearest neighbors of %d samples in %.2fs",
+                     n, count, time.perf_counter() - start_time)
+
+        return _clusters_within_threshold(distances, indexes, threshold)
 
 
 @t.final
@@ -329,7 +589,8 @@ class Duplicates(Introspector):
     Introspector for finding duplicate data in a :class:`Producer <deepview.base.Producer>`. This
     uses an approximate nearest neighbor algorithm to build clusters of nearby samples,
     :class:`Duplicates.DuplicateSetCandidate`. Specifically, it uses the
-    `ANNOY - Approximate Nearest Neighbor Oh My! <https://github.com/spotify/annoy>`_ algorithm.
+    `ANNOY - Approximate Nearest Neighbor Oh My! <https://github.com/spotify/annoy>`_ algorithm
+    by default -- see :class:`Duplicates.KNNStrategy` for the FAISS and exact brute force alternatives.
 
     Like other :class:`introspectors <deepview.base.Introspector>`, use
     :func:`Duplicates.introspect <introspect>` to instantiate.
@@ -339,6 +600,8 @@ class Duplicates(Introspector):
             :func:`Duplicates.introspect <introspect>`
         count: do not instantiate ``Duplicates`` directly, use
             :func:`Duplicates.introspect <introspect>`
+        hash_results: do not instantiate ``Duplicates`` directly, use
+            :func:`Duplicates.introspect <introspect>`
     """
 
     @t.final
@@ -354,16 +617,20 @@ class Duplicates(Introspector):
 
         KNNFaiss: t.Final = KNNFaiss
         KNNAnnoy: t.Final = KNNAnnoy
+        BruteForce: t.Final = BruteForce
 
     @dataclass
     class DuplicateSetCandidate:
         """
+        The :attr:`batch` and :attr:`projection` are computed when they are first accessed.
+
         Args:
             std: see :attr:`std`
             mean: see :attr:`mean`
-            projection: see :attr:`projection`
             indices: see :attr:`indices`
-            batch: see :attr:`batch`
+            source: batch containing the elements of the cluster
+            positions: **[optional]** positions of the elements in ``source``, ``indices`` if ``None``
+            samples: **[optional]** normalized responses of the elements, used for the ``projection``
         """
 
         std: float
@@ -372,24 +639,75 @@ class Duplicates(Introspector):
         mean: float
         """Mean of the distance to the centroid from each of the points in the cluster."""
 
-        projection: t.Optional[np.ndarray]
-        """
-        Optional 2-d projection of the data -- this can be displayed to show the
-        relationship between the samples.  The order corresponds to the order in the batch.
-        """
-
         indices: t.Sequence[int]
         """
         Indices of the elements in the cluster from the original producer.
         """
 
-        batch: Batch
-        """Set of data in :class:`Batch` form, which are duplicate candidates."""
+        source: Batch = field(repr=False)
+        positions: t.Optional[t.Sequence[int]] = field(default=None, repr=False)
+        samples: t.Optional[np.ndarray] = field(default=None, repr=False)
+
+        @functools.cached_property
+        def projection(self) -> t.Optional[np.ndarray]:
+            """
+            Optional 2-d projection of the data -- this can be displayed to show the
+            relationship between the samples.  The order corresponds to the order in the batch.
+            Only computed for clusters of more than 5 samples.
+            """
+            if self.samples is None or len(self.samples) <= 5:
+                return None
+            return _principal_components(self.samples, 2)
+
+        @functools.cached_property
+        def batch(self) -> Batch:
+            """Set of data in :class:`Batch` form, which are duplicate candidates."""
+            positions = self.indices if self.positions is None else self.positions
+            return self.source.elements[list(positions)]
 
         @property
         def size(self) -> int:
             """Size of the cluster."""
-            return self.batch.batch_size
+            return len(self.indices)
+
+    @t.final
+    @dataclass(frozen=True)
+    class ContentHasher(PipelineStage):
+        """
+        A :class:`PipelineStage <deepview.base.PipelineStage>` that attaches the content hash of
+        each element of a field (e.g. the input images) as :attr:`META_KEY` metadata, which is kept
+        by the following stages.  Place it before the :class:`Model <deepview.base.Model>` stage so
+        :func:`Duplicates.introspect <introspect>` can group duplicates by the hashes of the model
+        inputs.  With a :class:`ResponseCache <deepview.base.ResponseCache>` on the model, exact
+        duplicates are also only inferred once.
+
+        .. code-block:: python
+
+            producer = pipeline(images, Duplicates.ContentHasher("images"),
+                                model(["conv2d_1"], response_cache=ResponseCache()))
+            duplicates = Duplicates.introspect(producer)
+
+        Args:
+            hash_field: see :attr:`hash_field`
+            perceptual_hash: **[optional]** see :attr:`perceptual_hash`
+        """
+
+        META_KEY: t.ClassVar[Batch.MetaKey[str]] = Batch.MetaKey[str]("DUPLICATES_CONTENT_HASH")
+        """Metadata key of the content hashes."""
+
+        hash_field: str
+        """Field whose content is hashed."""
+
+        perceptual_hash: bool = False
+        """Use a perceptual hash of the ``hash_field`` images instead of an exact hash of their bytes."""
+
+        def _get_batch_processor(self) -> t.Callable[[Batch], Batch]:
+            def batch_processor(batch: Batch) -> Batch:
+                builder = Batch.Builder(base=batch)
+                builder.metadata[self.META_KEY] = Duplicates._content_hashes(
+                    Duplicates._hashed_field(batch, self.hash_field), self.perceptual_hash)
+                return builder.make_batch()
+            return batch_processor
 
     results: t.Mapping[str, t.Sequence[DuplicateSetCandidate]]
     """Mapping from response name to a list of candidate duplicates."""
@@ -397,6 +715,90 @@ class Duplicates(Introspector):
     count: int
     """Number of elements in the producer."""
 
+    hash_results: t.Sequence[DuplicateSetCandidate] = field(default_factory=list)
+    """
+    Groups of samples with the same content hash, found when ``hash_field`` is passed to
+    :func:`Duplicates.introspect <introspect>` or the batches carry the hashes of a
+    :class:`ContentHasher` stage.  The mean and std. deviation are measured on the hashed field
+    (and are 0 for hashes of a :class:`ContentHasher`).  Only the first sample of each group is
+    part of :attr:`results`.
+    """
+
+    @staticmethod
+    def _hashed_field(batch: Batch, hash_field: str) -> np.ndarray:
+        if hash_field not in batch.fields:
+            raise DeepViewException(
+                f"hash_field '{hash_field}' is not a field of the batches (fields: {sorted(batch.fields)}). "
+                f"To hash the inputs of a model, add a Duplicates.ContentHasher('{hash_field}') stage "
+                f"before the model in the pipeline, and do not pass a hash_field.")
+        return batch.fields[hash_field]
+
+    @staticmethod
+    def _batch_hashes(batch: Batch, hash_field: t.Optional[str], perceptual: bool) -> t.Optional[t.Sequence[str]]:
+        """Content hashes of the elements of ``batch``, from ``hash_field`` or a :class:`ContentHasher`, if any."""
+        if hash_field is not None:
+            return Duplicates._content_hashes(Duplicates._hashed_field(batch, hash_field), perceptual)
+        if Duplicates.ContentHasher.META_KEY in batch.metadata:
+            return batch.metadata[Duplicates.ContentHasher.META_KEY]
+        return None
+
+    @staticmethod
+    def _perceptual_hash(element: np.ndarray) -> str:
+        """Difference hash of an image -- compares the brightness of neighboring cells of a thumbnail."""
+        image = np.asarray(element, dtype=np.float64)
+        if image.ndim == 3:
+            # average the channels, which are either first or last
+            image = image.mean(axis=-1 if image.shape[-1] <= 4 else 0)
+        if image.ndim != 2:
+            raise ValueError(f"Perceptual hashing requires images, got shape {element.shape}")
+
+        size = _PERCEPTUAL_HASH_SIZE
+        if image.shape[0] < size or image.shape[1] < size + 1:
+            raise ValueError(f"Perceptual hashing requires images of at least {size}x{size + 1} pixels")
+
+        # area average into a size x (size + 1) thumbnail
+        rows = np.linspace(0, image.shape[0], size + 1).astype(int)
+        columns = np.linspace(0, image.shape[1], size + 2).astype(int)
+        thumbnail = np.add.reduceat(np.add.reduceat(image, rows[:-1], axis=0), columns[:-1], axis=1)
+        thumbnail /= np.outer(np.diff(rows), np.diff(columns))
+
+        return np.packbits(thumbnail[:, 1:] > thumbnail[:, :-1]).tobytes().hex()
+
+    @staticmethod
+    def _content_hashes(data: np.ndarray, perceptual: bool) -> t.List[str]:
+        """Hash of each element of ``data``, exact or perceptual."""
+        if perceptual:
+            return [Duplicates._perceptual_hash(element) for element in data]
+        return ResponseCache._hash_elements({"": data})
+
+    @staticmethod
+    def _group_hashes(hashes: t.Iterable[str], groups: t.Dict[str, t.List[int]], offset: int = 0) -> np.ndarray:
+        """
+        Add the elements numbered from ``offset`` to the ``groups`` of their hash and return a mask
+        of the elements that are the first of their group, the representatives.
+        """
+        representatives = []
+        for index, digest in enumerate(hashes, start=offset):
+            group = groups.setdefault(digest, [])
+            representatives.append(len(group) == 0)
+            group.append(index)
+        return np.array(representatives, dtype=bool)
+
+    @staticmethod
+    def _build_hash_result(batch: Batch, data: t.Optional[np.ndarray], positions: t.Sequence[int],
+                           indices: t.Optional[t.Sequence[int]] = None) -> "Duplicates.DuplicateSetCandidate":
+        if data is None:
+            # the hashed data is not part of the batch
+            distances = np.zeros(len(positions))
+        else:
+            samples = data[positions].reshape((len(positions), -1)).astype(np.float64)
+            distances = np.linalg.norm(samples - samples.mean(axis=0), axis=1)
+
+        return Duplicates.DuplicateSetCandidate(
+            std=float(np.std(distances)), mean=float(np.mean(distances)),
+            indices=list(positions) if indices is None else indices,
+            source=batch, positions=positions)
+
     @staticmethod
     def _combine_clusters(list_of_duplicates: t.Sequence[t.Sequence[int]]
                           ) -> t.Sequence[t.Sequence[int]]:
@@ -416,101 +818,192 @@ class Duplicates(Introspector):
             returns ``[[10, 11], [12, 13, 14], [5, 6, 9]]``
         """
 
-        # index -> cluster_number
-        inverse_mapping: t.Dict[int, int] = {}
-
-        # cluster_number -> [indexes]
-        cluster_mapping: t.Dict[int, t.Set[int]] = {}
+        list_of_duplicates = [duplicates for duplicates in list_of_duplicates if len(duplicates) > 0]
+        if len(list_of_duplicates) == 0:
+            return []
 
-        # tracks the number of the next cluster
-        current_cluster_number = 0
+        # Import scipy when it is needed, to keep importing deepview cheap
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
 
-        for dup_set_index, batch_list in enumerate(list_of_duplicates):
+        # join the first index of each list to every index of the list -- the clusters
+        # are the connected components of that graph
+        lengths = np.array([len(duplicates) for duplicates in list_of_duplicates])
+        indexes = np.concatenate([np.asarray(duplicates, dtype=np.int64) for duplicates in list_of_duplicates])
+        sources = np.repeat(indexes[np.cumsum(lengths) - lengths], lengths)
 
-            # see if the new cluster overlaps existing clusters
-            overlap = {
-                inverse_mapping[index]
-                for index in batch_list
-                if index in inverse_mapping
-            }
+        # renumber the indexes so the graph only has as many nodes as distinct indexes
+        nodes, edges = np.unique(np.concatenate((sources, indexes)), return_inverse=True)
+        sources, targets = np.split(edges, 2)
+        graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)),
+                           shape=(len(nodes), len(nodes)))
+        _, labels = connected_components(graph, directed=False)
 
-            cluster_mapping[current_cluster_number] = set(batch_list)
-
-            if len(overlap) == 0:
-                # set up the new cluster
-                for index in batch_list:
-                    inverse_mapping[index] = current_cluster_number
-
-                current_cluster_number += 1
-
-            else:
-                # overlapping clusters -- merge them
-                overlap.add(current_cluster_number)
+        # group the nodes by component
+        order = np.argsort(labels, kind="stable")
+        boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+        return [cluster.tolist() for cluster in np.split(nodes[order], boundaries)]
 
-                # found overlap, combine into the lowest numbered cluster
-                merged_cluster_number = min(overlap)
-
-                # update the indexes
-                new_cluster = {
-                    index
-                    for other_cluster_index in overlap
-                    for index in cluster_mapping[other_cluster_index]
-                }
-
-                already_in_cluster = cluster_mapping[merged_cluster_number]
-                cluster_mapping[merged_cluster_number] = new_cluster
-
-                # remap the existing clusters
-                for index in new_cluster:
-                    if index not in already_in_cluster:
-                        inverse_mapping[index] = merged_cluster_number
+    @staticmethod
+    def _build_results(batch: Batch,
+                       responses: np.ndarray,
+                       clusters: t.Sequence[t.Sequence[int]],
+                       indices: t.Optional[np.ndarray] = None) -> t.List["Duplicates.DuplicateSetCandidate"]:
+        """
+        Build the results of the ``clusters`` of positions in the ``batch`` and ``responses``, which
+        are reported as the ``indices`` at these positions (the positions themselves if ``None``).
+        """
+        results: t.List[t.Optional[Duplicates.DuplicateSetCandidate]] = [None] * len(clusters)
+
+        # clusters of the same size are processed together, with batched linear algebra
+        sizes = np.array([len(cluster) for cluster in clusters])
+        for size in np.unique(sizes):
+            members = np.flatnonzero(sizes == size)
+            positions = np.array([clusters[i] for i in members.tolist()], dtype=np.int64)
+            samples = responses[positions]
+
+            centroids = samples.mean(axis=1, keepdims=True)
+            distances = np.linalg.norm(samples - centroids, axis=2)
+
+            # order the batch results by a 1d projection -- this will group similar
+            # samples together in the results
+            if size > 2:
+                order = np.argsort(_principal_components(samples, 1)[..., 0], axis=1)
+                positions = np.take_along_axis(positions, order, axis=1)
+                samples = np.take_along_axis(samples, order[..., np.newaxis], axis=1)
+
+            for i, member in enumerate(members):
+                results[member] = Duplicates.DuplicateSetCandidate(
+                    std=np.std(distances[i]), mean=np.mean(distances[i]),
+                    indices=list(positions[i] if indices is None else indices[positions[i]]),
+                    source=batch, positions=list(positions[i]),
+                    samples=samples[i] if size > 5 else None)
+
+        return t.cast(t.List[Duplicates.DuplicateSetCandidate], results)
 
-                # and update the index
-                for other_cluster_index in overlap:
-                    if other_cluster_index != merged_cluster_number:
-                        del cluster_mapping[other_cluster_index]
+    @staticmethod
+    def _column_norms(producer: Producer, batch_size: int,
+                      exclude: t.AbstractSet[str] = frozenset(),
+                      include: t.Optional[t.AbstractSet[str]] = None) -> t.Mapping[str, np.ndarray]:
+        squared_norms: t.Dict[str, np.ndarray] = {}
+        for batch in producer(batch_size):
+            for response_name, responses in batch.fields.items():
+                if response_name in exclude or (include is not None and response_name not in include):
+                    continue
+                squares = np.square(responses, dtype=np.float64).sum(axis=0)
+                if response_name in squared_norms:
+                    squared_norms[response_name] += squares
+                else:
+                    squared_norms[response_name] = squares
+        return {response_name: np.sqrt(squares) for response_name, squares in squared_norms.items()}
 
-        return [list(v) for v in cluster_mapping.values()]
+    @staticmethod
+    def _gather_elements(producer: Producer, batch_size: int, indices: np.ndarray) -> t.Optional[Batch]:
+        # collect the elements at the sorted ``indices`` of the producer into a single batch
+        selected = []
+        offset = 0
+        for batch in producer(batch_size):
+            start, end = np.searchsorted(indices, [offset, offset + batch.batch_size])
+            if start < end:
+                selected.append(batch.elements[list(indices[start:end] - offset)]._storage)
+            offset += batch.batch_size
+        return Batch(_storage=_concatenate_batches(selected)) if selected else None
 
     @staticmethod
-    def _build_result(batch: Batch,
-                      responses: np.ndarray,
-                      indices: t.Sequence[int]) -> "Duplicates.DuplicateSetCandidate":
-
-        samples = responses[indices]
-        centroid = samples.mean(axis=0)
-        distances = np.linalg.norm(samples - centroid, axis=1)
-
-        # order the batch results by a 1d projection -- this will group similar
-        # samples together in the results
-        if len(samples) > 2:
-            transformer = SKLearnPCA(n_components=1)
-            order = transformer.fit_transform(samples)
-            np_indexes = np.array(indices, "i")
-
-            # reorder the indexes and rebuild the samples array to match
-            # the new order
-            indices = list(np_indexes[np.argsort(np.ravel(order))])
-            samples = responses[indices]
-
-        # for larger groups produce a projection showing how the samples relate
-        if len(samples) > 5:
-            transformer = SKLearnPCA(n_components=2)
-            projection = transformer.fit_transform(samples)
-        else:
-            projection = None
+    def _introspect_streaming(producer: Producer, *,
+                              batch_size: int,
+                              strategy: DuplicatesStrategyType,
+                              threshold: DuplicatesThresholdStrategyType,
+                              column_norms: t.Optional[t.Mapping[str, np.ndarray]],
+                              index_path: t.Optional[str],
+                              hash_field: t.Optional[str],
+                              perceptual_hash: bool,
+                              ) -> "Duplicates":
+        if not isinstance(strategy, DuplicatesStreamingStrategyType):
+            raise ValueError(f"{type(strategy).__name__} does not support streaming")
+
+        # first pass: the column norms used to normalize the responses
+        if column_norms is None:
+            column_norms = Duplicates._column_norms(producer, batch_size,
+                                                    exclude={hash_field} if hash_field else frozenset())
+
+        combined_clusters: t.Dict[str, t.Sequence[t.Sequence[int]]] = {}
+        groups: t.Dict[str, t.List[int]] = {}
+        representatives = []
+        with tempfile.TemporaryDirectory(dir=index_path) as directory:
+            indexes: t.Dict[str, DuplicatesStreamingIndexType] = {}
+            count = 0
+            try:
+                # second pass: add the normalized responses to the on-disk indexes, skipping the
+                # samples with the same content hash as a previous one
+                for batch in producer(batch_size):
+                    mask = None
+                    hashes = Duplicates._batch_hashes(batch, hash_field, perceptual_hash)
+                    if hashes is not None:
+                        mask = Duplicates._group_hashes(hashes, groups, count)
+                        representatives.append(np.flatnonzero(mask) + count)
+                    for response_name, responses in batch.fields.items():
+                        if response_name == hash_field:
+                            continue
+                        if response_name not in indexes:
+                            path = os.path.join(directory, f"index-{len(indexes)}")
+                            indexes[response_name] = strategy.streaming_index(responses.shape[1], path)
+                        if mask is not None:
+                            responses = responses[mask]
+                        indexes[response_name].add(responses / column_norms[response_name])
+                    count += batch.batch_size
+
+                # the indexes are numbered in the order the samples were added
+                added = np.concatenate(representatives) if representatives else None
+                for response_name, index in indexes.items():
+                    clusters = index.clusters(threshold)
+                    if added is not None:
+                        clusters = [added[np.asarray(cluster)] for cluster in clusters]
+                    combined_clusters[response_name] = Duplicates._combine_clusters(clusters)
+            finally:
+                for index in indexes.values():
+                    index.close()
+
+        if count == 0:
+            raise DeepViewException("Producer did not produce any batches")
+
+        # third pass: collect the elements that are part of a cluster
+        hash_groups = [group for group in groups.values() if len(group) > 1]
+        indices = np.unique(np.concatenate([np.asarray(cluster, dtype=np.int64)
+                                            for clusters in [*combined_clusters.values(), hash_groups]
+                                            for cluster in clusters] or [np.zeros(0, np.int64)]))
+        elements = Duplicates._gather_elements(producer, batch_size, indices)
+
+        hash_results = []
+        if elements is not None:
+            hash_data = elements.fields[hash_field] if hash_field is not None else None
+            for group in hash_groups:
+                hash_results.append(Duplicates._build_hash_result(elements, hash_data,
+                                                                  list(np.searchsorted(indices, group)), group))
 
-        return Duplicates.DuplicateSetCandidate(
-            std=np.std(distances), mean=np.mean(distances),
-            projection=projection,
-            indices=indices,
-            batch=batch.elements[indices])
+        duplicate_data: t.Dict[str, t.List[Duplicates.DuplicateSetCandidate]] = {}
+        for response_name, clusters in combined_clusters.items():
+            duplicate_data[response_name] = []
+            if elements is None:
+                continue
+            # build the results on the gathered elements, reporting the producer indices
+            normalized_responses = elements.fields[response_name] / column_norms[response_name]
+            duplicate_data[response_name] = Duplicates._build_results(
+                elements, normalized_responses,
+                [np.searchsorted(indices, cluster).tolist() for cluster in clusters], indices)
+
+        return Duplicates(duplicate_data, count=count, hash_results=hash_results)
 
     @staticmethod
     def introspect(producer: Producer, *,
                    batch_size: int = 32,
                    strategy: t.Optional[DuplicatesStrategyType] = None,
                    threshold: t.Optional[DuplicatesThresholdStrategyType] = None,
+                   streaming: bool = False,
+                   column_norms: t.Optional[t.Mapping[str, np.ndarray]] = None,
+                   index_path: t.Optional[str] = None,
+                   hash_field: t.Optional[str] = None,
+                   perceptual_hash: bool = False,
                    ) -> "Duplicates":
         """
         Uses an approximate nearest neighbor to build a distance matrix for all samples
@@ -529,6 +1022,22 @@ class Duplicates(Introspector):
         <https://stats.stackexchange.com/questions/287425/why-do-you-need-to-scale-data-in-knn>`_
         about how any why this is done.
 
+        By default all responses are accumulated in memory.  With ``streaming=True`` the
+        ``producer`` is read several times instead: once to compute the column norms (unless
+        ``column_norms`` are given), once to add the normalized responses batch by batch to an
+        index built on disk, and once to collect the samples in the duplicate clusters.  The
+        ``producer`` must produce the same data in the same order every time it is called, and
+        memory still grows with the number of samples times the number of neighbors queried.
+
+        When a ``hash_field`` is given (which must be a field of the ``producer``'s batches),
+        samples with the same content hash in that field are grouped into :attr:`hash_results`
+        and only the first of each group goes through the nearest neighbor search.  The hash is
+        exact by default; a perceptual hash of the images also groups near-exact duplicates
+        (resized or re-encoded copies).  The ``hash_field`` itself is not searched for duplicates.
+        A :class:`Model <deepview.base.Model>` stage replaces the fields of the batches with its
+        responses, so to hash the model inputs instead, add a :class:`ContentHasher` stage
+        before the model; its hashes are used when no ``hash_field`` is given.
+
         .. code-block:: python
 
             producer = Producer...
@@ -552,6 +1061,16 @@ class Duplicates(Introspector):
             threshold: **[optional]** strategy to use for finding the distance between points that
                 are considered duplicates. Default is
                 :class:`Slope <deepview.introspectors.Duplicates.ThresholdStrategy.Slope>` threshold.
+            streaming: **[optional]** build the index without accumulating all responses in memory,
+                requires a ``strategy`` implementing :class:`DuplicatesStreamingStrategyType`
+            column_norms: **[optional]** precomputed L2 norm of each column, per response name, used
+                with ``streaming`` to skip the first pass over the ``producer``
+            index_path: **[optional]** directory in which the on-disk indexes are built when
+                ``streaming``, defaults to the system temporary directory
+            hash_field: **[optional]** field whose content is hashed to group exact duplicates before
+                the nearest neighbor search (see also :class:`ContentHasher`)
+            perceptual_hash: **[optional]** use a perceptual hash of the ``hash_field`` images instead
+                of an exact hash of their bytes
 
         Return:
             :class:`Duplicates`, which contains candidate duplicates for each response name
@@ -562,11 +1081,32 @@ class Duplicates(Introspector):
         if strategy is None:
             strategy = KNNAnnoy()
 
+        if streaming:
+            return Duplicates._introspect_streaming(producer, batch_size=batch_size, strategy=strategy,
+                                                    threshold=threshold, column_norms=column_norms,
+                                                    index_path=index_path, hash_field=hash_field,
+                                                    perceptual_hash=perceptual_hash)
+
         # instantiate data structure mapping response name to list of duplicate set candidates
         duplicate_data: t.Dict[str, t.List[Duplicates.DuplicateSetCandidate]] = {}
 
         accumulated_batches = _accumulate_batches(producer, batch_size=batch_size)
+
+        # group the samples with the same content, only the first of each group is searched
+        representatives = None
+        hash_results = []
+        hashes = Duplicates._batch_hashes(accumulated_batches, hash_field, perceptual_hash)
+        if hashes is not None:
+            hash_data = accumulated_batches.fields[hash_field] if hash_field is not None else None
+            groups: t.Dict[str, t.List[int]] = {}
+            representatives = np.flatnonzero(Duplicates._group_hashes(hashes, groups))
+            hash_results = [Duplicates._build_hash_result(accumulated_batches, hash_data, group)
+                            for group in groups.values() if len(group) > 1]
+            _logger.info("Found %d groups of samples with the same content hash", len(hash_results))
+
         for response_name, responses in accumulated_batches.fields.items():
+            if response_name == hash_field:
+                continue
 
             # normalize the data -- this will do l2 normalization per-column
             # in the response.  this prevents large values in a single column from
@@ -577,16 +1117,350 @@ class Duplicates(Introspector):
             normalized_responses = responses / l2
 
             # build the clusters (indexes in the responses of duplicate clusters)
-            clusters = strategy(
-                normalized_responses,
-                threshold=threshold,
-            )
+            if representatives is None:
+                clusters = strategy(
+                    normalized_responses,
+                    threshold=threshold,
+                )
+            else:
+                clusters = [
+                    representatives[np.asarray(cluster)]
+                    for cluster in strategy(normalized_responses[representatives], threshold=threshold)
+                ]
             combined_clusters = Duplicates._combine_clusters(clusters)
 
             # build the results
-            duplicate_data[response_name] = [
-                Duplicates._build_result(accumulated_batches, normalized_responses, indices)
-                for indices in combined_clusters
-            ]
+            duplicate_data[response_name] = Duplicates._build_results(
+                accumulated_batches, normalized_responses, combined_clusters)
+
+        return Duplicates(duplicate_data, count=accumulated_batches.batch_size, hash_results=hash_results)
+
+
+@t.final
+@dataclass(frozen=True)
+class DuplicatesIndex:
+    """
+    Nearest neighbor index of one response of a corpus, which can be saved, loaded (memory mapped)
+    and queried for the near-duplicates of new samples without indexing the corpus again.
+
+    .. code-block:: python
+
+        index = DuplicatesIndex.build(corpus_producer, response_name="embedding", path="corpus-index")
+
+        # later, possibly in another process
+        index = DuplicatesIndex.load("corpus-index")
+        for identifiers in index.query(new_producer):
+            ...
+
+    The index is an Annoy index, built with :class:`KNNAnnoy <Duplicates.KNNStrategy.KNNAnnoy>`.
+    Do not instantiate ``DuplicatesIndex`` directly, use :func:`build` or :func:`load`.
+    """
+
+    response_name: str
+    """Name of the indexed response."""
+
+    column_norms: np.ndarray
+    """L2 norm of each column of the corpus responses, used to normalize all responses."""
+
+    identifiers: t.Sequence[t.Hashable]
+    """
+    Identifier of each sample of the corpus -- its
+    :attr:`Batch.StdKeys.IDENTIFIER <deepview.base.Batch.StdKeys.IDENTIFIER>` if present,
+    otherwise its index in the producer.
+    """
+
+    distance: float
+    """Distance between normalized responses under which samples are near-duplicates."""
+
+    strategy: KNNAnnoy
+    """Strategy the index was built with."""
+
+    _index: t.Any = field(repr=False)
+    _index_file: t.Optional[str] = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.identifiers)
+
+    @staticmethod
+    def build(producer: Producer, *,
+              response_name: str,
+              batch_size: int = 32,
+              strategy: t.Optional[KNNAnnoy] = None,
+              threshold: t.Optional[DuplicatesThresholdStrategyType] = None,
+              column_norms: t.Optional[np.ndarray] = None,
+              path: t.Optional[str] = None,
+              distance: t.Optional[float] = None,
+              ) -> "DuplicatesIndex":
+        """
+        Index the ``response_name`` responses of the ``producer``.
+
+        The responses are L2 normalized per-column like in
+        :func:`Duplicates.introspect <Duplicates.introspect>` and added batch by batch, so they are
+        never all in memory.  The near-duplicate ``distance`` is computed from the distances
+        between the corpus samples and their nearest neighbors with the ``threshold`` strategy.
+
+        Args:
+            producer: producer of the corpus
+            response_name: name of the response to index
+            batch_size: **[optional]** size of batch to read from the ``producer``
+            strategy: **[optional]** Annoy parameters of the index, default is
+                :class:`KNNAnnoy <Duplicates.KNNStrategy.KNNAnnoy>`
+            threshold: **[optional]** strategy to use for finding the distance between points that
+                are considered duplicates, default is
+                :class:`Slope <Duplicates.ThresholdStrategy.Slope>`
+            column_norms: **[optional]** precomputed L2 norm of each column of the responses,
+                which skips a pass over the ``producer``
+            path: **[optional]** directory in which the index is built on disk and saved, otherwise
+                the index is built in memory and can be saved with :func:`save`
+            distance: **[optional]** near-duplicate distance, which skips querying the corpus
+                against itself
+
+        Return:
+            :class:`DuplicatesIndex` of the corpus
+        """
+        if strategy is None:
+            strategy = KNNAnnoy()
+        if threshold is None:
+            threshold = Slope()
+
+        if column_norms is None:
+            column_norms = Duplicates._column_norms(producer, batch_size, include={response_name})[response_name]
+
+        index_file = os.path.join(path, _INDEX_FILE) if path is not None else None
+        index = None
+        identifiers: t.List[t.Hashable] = []
+        for batch in producer(batch_size):
+            responses = batch.fields[response_name]
+            if index is None:
+                index = strategy._new_index(responses.shape[1])
+                if index_file is not None:
+                    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+                    index.on_disk_build(index_file)
+
+            start = len(identifiers)
+            for i, v in enumerate(responses / column_norms, start=start):
+                index.add_item(i, v)
+            if Batch.StdKeys.IDENTIFIER in batch.metadata:
+                identifiers.extend(batch.metadata[Batch.StdKeys.IDENTIFIER])
+            else:
+                identifiers.extend(range(start, start + batch.batch_size))
+
+        if index is None:
+            raise DeepViewException("Producer did not produce any batches")
+
+        strategy._build(index)
+        if distance is None:
+            distances, _ = strategy._query(index)
+            distance = _threshold_distance(distances, threshold)
+        result = DuplicatesIndex(response_name, column_norms, identifiers, distance=distance,
+                                 strategy=strategy, _index=index, _index_file=index_file)
+        if path is not None:
+            result.save(path)
+        return result
+
+    def save(self, path: str) -> None:
+        """
+        Save the index to the directory ``path``, see :func:`load`.
+
+        Args:
+            path: directory in which to save the index
+        """
+        os.makedirs(path, exist_ok=True)
+        index_file = os.path.join(path, _INDEX_FILE)
+        if self._index_file is None:
+            # Annoy memory maps the saved file from now on
+            self._index.save(index_file)
+            object.__setattr__(self, "_index_file", index_file)
+        elif os.path.abspath(self._index_file) != os.path.abspath(index_file):
+            shutil.copyfile(self._index_file, index_file)
+
+        metadata = {
+            "response_name": self.response_name,
+            "column_norms": self.column_norms,
+            "identifiers": self.identifiers,
+            "distance": self.distance,
+            "strategy": self.strategy,
+        }
+        with open(os.path.join(path, _METADATA_FILE), "wb") as f:
+            pickle.dump(metadata, f)
+
+    @staticmethod
+    def load(path: str) -> "DuplicatesIndex":
+        """
+        Load an index saved with :func:`save`.  The index file is memory mapped, so loading is
+        quick and the pages of the index are shared between processes.
+
+        Args:
+            path: directory in which the index was saved
+
+        Return:
+            the saved :class:`DuplicatesIndex`
+        """
+        with open(os.path.join(path, _METADATA_FILE), "rb") as f:
+            metadata = pickle.load(f)
+
+        index_file = os.path.join(path, _INDEX_FILE)
+        index = KNNAnnoy._new_index(len(metadata["column_norms"]))
+        index.load(index_file)
+        return DuplicatesIndex(**metadata, _index=index, _index_file=index_file)
+
+    def nearest(self, producer: Producer, *,
+                batch_size: int = 32,
+                n: t.Optional[int] = None,
+                ) -> t.Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the nearest samples in the corpus of each sample of ``producer``, which must produce
+        the ``response_name`` response.
+
+        Args:
+            producer: producer of the new samples
+            batch_size: **[optional]** size of batch to read from the ``producer``
+            n: **[optional]** number of neighbors to find, defaults to
+                :attr:`KNNAnnoy.n <Duplicates.KNNStrategy.KNNAnnoy.n>`
+
+        Return:
+            distances between normalized responses and positions in :attr:`identifiers` of the
+            nearest corpus samples, closest first -- both arrays have one row per sample of the
+            ``producer`` and ``n`` columns
+        """
+        n = min(n or self.strategy.n, len(self))
+
+        distances = []
+        indexes = []
+        for batch in producer(batch_size):
+            vectors = batch.fields[self.response_name] / self.column_norms
+            batch_distances = np.zeros((len(vectors), n))
+            batch_indexes = np.zeros((len(vectors), n), "i")
+
+            def query(rows: range) -> None:
+                # each thread writes its own rows of the preallocated matrices
+                for i in rows:
+                    batch_indexes[i], batch_distances[i] = self._index.get_nns_by_vector(
+                        vectors[i], n, include_distances=True)
+
+            _run_in_chunks(query, len(vectors), self.strategy._num_workers)
+            distances.append(batch_distances)
+            indexes.append(batch_indexes)
+
+        if len(distances) == 0:
+            return np.zeros((0, n)), np.zeros((0, n), "i")
+        return np.concatenate(distances), np.concatenate(indexes)
+
+    def query(self, producer: Producer, *,
+              batch_size: int = 32,
+              distance: t.Optional[float] = None,
+              ) -> t.List[t.List[t.Hashable]]:
+        """
+        Find the near-duplicates in the corpus of each sample of ``producer``, which must produce
+        the ``response_name`` response.
+
+        Args:
+            producer: producer of the new samples
+            batch_size: **[optional]** size of batch to read from the ``producer``
+            distance: **[optional]** distance between normalized responses under which samples
+                are near-duplicates, defaults to :attr:`distance`
+
+        Return:
+            for each sample of the ``producer``, the :attr:`identifiers` of its near-duplicates
+            in the corpus, closest first (at most :attr:`KNNAnnoy.n <Duplicates.KNNStrategy.KNNAnnoy.n>`)
+        """
+        if distance is None:
+            distance = self.distance
+
+        distances, indexes = self.nearest(producer, batch_size=batch_size)
+        return [
+            [self.identifiers[j] for j in row_indexes[row_distances <= distance]]
+            for row_distances, row_indexes in zip(distances, indexes)
+        ]
+
+
+@t.final
+@dataclass(frozen=True)
+class DuplicatesLeakage:
+    """
+    Nearest train samples of each test sample, see :func:`DuplicatesLeakage.introspect <introspect>`.
+
+    Args:
+        distances: do not instantiate ``DuplicatesLeakage`` directly, use
+            :func:`DuplicatesLeakage.introspect <introspect>`
+        indices: do not instantiate ``DuplicatesLeakage`` directly, use
+            :func:`DuplicatesLeakage.introspect <introspect>`
+        identifiers: do not instantiate ``DuplicatesLeakage`` directly, use
+            :func:`DuplicatesLeakage.introspect <introspect>`
+        distance: do not instantiate ``DuplicatesLeakage`` directly, use
+            :func:`DuplicatesLeakage.introspect <introspect>`
+    """
+
+    distances: np.ndarray
+    """Distances from each test sample (rows) to its nearest train samples, closest first."""
+
+    indices: np.ndarray
+    """Indices in the train producer of the nearest train samples of each test sample (rows)."""
+
+    identifiers: t.Sequence[t.Hashable]
+    """Identifier of each train sample, see :attr:`DuplicatesIndex.identifiers`."""
+
+    distance: float
+    """Distance under which a test sample is a near-duplicate of a train sample."""
+
+    @property
+    def leaked(self) -> np.ndarray:
+        """Indices of the test samples that are near-duplicates of at least one train sample."""
+        return np.flatnonzero(self.distances[:, 0] <= self.distance)
+
+    @staticmethod
+    def introspect(train: Producer, test: Producer, *,
+                   response_name: str,
+                   batch_size: int = 32,
+                   n: t.Optional[int] = None,
+                   strategy: t.Optional[KNNAnnoy] = None,
+                   threshold: t.Optional[DuplicatesThresholdStrategyType] = None,
+                   distance: t.Optional[float] = None,
+                   ) -> "DuplicatesLeakage":
+        """
+        Detect test samples that are near-duplicates of train samples (train/test leakage).
+
+        Only the ``train`` responses are indexed and only the ``test`` responses are queried, which
+        is much cheaper than running :class:`Duplicates` on the union of both sets.  Both sets are
+        normalized with the column norms of ``train``.
+
+        A test sample has leaked when its nearest train sample is within the near-duplicate
+        ``distance``.  Unless it is given, the ``distance`` is found with the ``threshold``
+        strategy on the distances between the train samples and their nearest neighbors, like
+        :func:`DuplicatesIndex.build`: test samples are flagged when they are as close to a
+        train sample as near-duplicates within the train set.  A clean split may then still have
+        a few leaked samples, like :class:`Duplicates` would find on the union of both sets, but
+        test samples far from all train samples are never flagged.
+
+        .. code-block:: python
+
+            leakage = DuplicatesLeakage.introspect(train_producer, test_producer, response_name="embedding")
+
+            for test_index in leakage.leaked:
+                print(test_index, leakage.indices[test_index][0], leakage.distances[test_index][0])
+
+        Args:
+            train: producer of the train samples, which are indexed
+            test: producer of the test samples, which are queried
+            response_name: name of the response to compare
+            batch_size: **[optional]** size of batch to read from the producers
+            n: **[optional]** number of nearest train samples to find for each test sample
+            strategy: **[optional]** Annoy parameters of the index, default is
+                :class:`KNNAnnoy <Duplicates.KNNStrategy.KNNAnnoy>`
+            threshold: **[optional]** strategy to use for finding the near-duplicate distance from
+                the train samples, default is :class:`Slope <Duplicates.ThresholdStrategy.Slope>`;
+                use :class:`Percentile <Duplicates.ThresholdStrategy.Percentile>` for a quantile
+            distance: **[optional]** absolute near-duplicate distance between normalized responses,
+                which skips querying the train samples against themselves
+
+        Return:
+            :class:`DuplicatesLeakage` with the nearest train samples of each test sample
+        """
+        index = DuplicatesIndex.build(train, response_name=response_name, batch_size=batch_size,
+                                      strategy=strategy, threshold=threshold, distance=distance)
+        distances, positions = index.nearest(test, batch_size=batch_size, n=n)
+
+        _logger.info("Found %d test samples within %f of a train sample",
+                     np.count_nonzero(distances[:, 0] <= index.distance), index.distance)
 
-        return Duplicates(duplicate_data, count=accumulated_batches.batch_size)
+        return DuplicatesLeakage(distances, positions, index.identifiers, index.distance)
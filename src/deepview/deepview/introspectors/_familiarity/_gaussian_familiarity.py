@@ -35,8 +35,6 @@
 from dataclasses import dataclass
 
 import numpy as np
-from scipy.stats import multivariate_normal
-from scipy.special import logsumexp
 
 from ._protocols import FamiliarityDistribution, FamiliarityResult
 import deepview.typing._types as t
@@ -82,6 +80,9 @@ class _MultivariateGaussianDistribution:
                 f"The expected shape of data matrix is (n_observations, {self.mean.shape[1]})"
             )
 
+        # Import scipy when it is needed, to keep importing deepview cheap
+        from scipy.stats import multivariate_normal
+
         log_pdfs = multivariate_normal.logpdf(x, mean=np.squeeze(self.mean), cov=self.covariance)
 
         return np.atleast_1d(log_pdfs)
@@ -134,6 +135,8 @@ class _MixtureOfMultivariateGaussianDistributions(FamiliarityDistribution):
         Compute and return the density of this mixture of distributions at :param:x.
         """
 
+        from scipy.special import logsumexp
+
         total_log_pdf = []
 
         for index, gaussian in enumerate(self.gaussians):
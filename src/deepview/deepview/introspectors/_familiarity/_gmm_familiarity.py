@@ -37,7 +37,6 @@ from dataclasses import dataclass
 import logging
 import numpy as np
 from numpy.random.mtrand import RandomState
-from sklearn.mixture import GaussianMixture as SKGMM
 
 from deepview.base import Batch, Producer
 # private function to gather all batches at once, see Caution below
@@ -153,6 +152,9 @@ class GMM(FamiliarityStrategyType):
 
     def __call__(self, producer: Producer,
                  batch_size: int = 1024) -> t.Mapping[str, FamiliarityDistribution]:
+        # Import sklearn when it is needed, to keep importing deepview cheap
+        from sklearn.mixture import GaussianMixture as SKGMM
+
         accumulated_responses = _accumulate_batches(producer, batch_size=batch_size)
         mixture_model_per_response = {}
 
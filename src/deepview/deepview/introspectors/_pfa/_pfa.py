@@ -58,6 +58,8 @@ except ImportError:
 
 try:
     import matplotlib as mpl
+    # mpl.pyplot is only available once pyplot is imported
+    import matplotlib.pyplot  # noqa: F401
     from matplotlib.axes import Axes as mplAxes
 except ImportError:
     mpl = None  # type: ignore
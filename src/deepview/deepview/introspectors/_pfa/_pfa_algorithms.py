@@ -36,7 +36,6 @@ from dataclasses import dataclass
 import logging
 
 import numpy as np
-from scipy.stats import entropy
 
 from ._recommendation import (
     PFAKLDiagnostics,
@@ -129,6 +128,9 @@ class KL(PFAStrategyType):
             The :class:`PFARecipe` for KL.
         """
 
+        # Import scipy when it is needed, to keep importing deepview cheap
+        from scipy.stats import entropy
+
         def sum_norm(x: np.ndarray) -> np.ndarray:
             norm = np.linalg.norm(x, ord=1)
             if norm == 0:
@@ -62,6 +62,8 @@ from ._image_processors import (
 # Cacher is declared with CachedProducer since it shares much of the same functionality
 # it's exposed via processors, since it behaves a lot more like a processor.
 from deepview.base._cached_producer import Cacher
+# ShuffleBuffer is declared with the other shuffling utilities, it's exposed via processors for the same reason.
+from deepview.base._shuffle import ShuffleBuffer
 
 __all__ = [
     "Processor",
@@ -78,6 +80,7 @@ __all__ = [
     "Pooler",
     "Concatenator",
     "Cacher",
+    "ShuffleBuffer",
     "Composer",
     "ImageGammaContrastProcessor",
     "ImageGaussianBlurProcessor",
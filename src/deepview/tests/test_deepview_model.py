@@ -32,9 +32,14 @@
 # limitations under the License.
 #
 
+import dataclasses
+import pathlib
+
+import numpy as np
 import pytest
 
-from deepview.base import Model
+from deepview.base import Batch, Model, ResponseCache, ResponseInfo, pipeline
+import deepview.typing._types as t
 
 
 def test_abstract_class_instantiation() -> None:
@@ -42,3 +47,108 @@ def test_abstract_class_instantiation() -> None:
         # This line fails in two potential ways: 1) it is abstract (which is being caught here)
         # and 2) it is missing required arguments, which will be ignored here.
         Model()  # type: ignore
+
+
+@dataclasses.dataclass
+class _DoublingModelDetails:
+    """Model stub with a single "input" layer and a "double" response, recording inference batch sizes."""
+    inference_batch_sizes: t.List[int] = dataclasses.field(default_factory=list)
+
+    def run_inference(self, inputs: t.Mapping[str, np.ndarray], outputs: t.AbstractSet[str]) -> t.Mapping[str, np.ndarray]:
+        self.inference_batch_sizes.append(len(inputs["input"]))
+        return {"double": inputs["input"] * 2}
+
+    def get_response_infos(self) -> t.Iterable[ResponseInfo]:
+        for name, kind in (("input", ResponseInfo.LayerKind.PLACEHOLDER), ("double", ResponseInfo.LayerKind.UNKNOWN)):
+            yield ResponseInfo(name=name, dtype=np.dtype(np.float64), shape=(None, 2),
+                               layer=ResponseInfo.Layer(name=name, kind=kind, typename=name))
+
+    def get_input_layer_responses(self) -> t.Sequence[ResponseInfo]:
+        return [info for info in self.get_response_infos() if info.name == "input"]
+
+
+def _input_producer(batch_size: int) -> t.Iterable[Batch]:
+    for start in range(0, 50, batch_size):
+        yield Batch({"input": np.arange(start, min(start + batch_size, 50), dtype=np.float64)[:, None].repeat(2, axis=1)})
+
+
+@pytest.mark.parametrize("batch_size", [3, 16, 40])
+def test_inference_batch_size(batch_size: int) -> None:
+    details = _DoublingModelDetails()
+    model = Model(details)
+    batches = list(pipeline(_input_producer, model("double", inference_batch_size=16))(batch_size))
+
+    # Inference always runs on batches of 16 (except for the last one)
+    assert details.inference_batch_sizes == [16, 16, 16, 2]
+    # Responses are regrouped into the requested batch size
+    assert all(batch.batch_size == batch_size for batch in batches[:-1])
+    responses = np.concatenate([batch.fields["double"] for batch in batches])
+    assert np.array_equal(responses[:, 0], np.arange(50) * 2)
+
+
+def test_inference_batch_size_splits_large_batches() -> None:
+    details = _DoublingModelDetails()
+    stage = Model(details)("double", inference_batch_size=4)
+    batch = stage._get_batch_processor()(Batch({"input": np.ones((10, 2))}))
+    assert details.inference_batch_sizes == [4, 4, 2]
+    assert np.array_equal(batch.fields["double"], np.full((10, 2), 2.0))
+
+    with pytest.raises(ValueError):
+        Model(details)("double", inference_batch_size=0)
+
+
+def test_responses_up_to() -> None:
+    model = Model(_DoublingModelDetails())
+    assert model.responses_up_to("double") == ["double"]
+    assert model.responses_up_to("double", include_inputs=True) == ["input", "double"]
+    assert model.responses_up_to("input") == []
+
+    with pytest.raises(ValueError):
+        model.responses_up_to("triple")
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_response_cache(on_disk: bool, tmp_path: pathlib.Path) -> None:
+    details = _DoublingModelDetails()
+    cache = ResponseCache(tmp_path / "cache" if on_disk else None)
+    model = Model(details)
+
+    def producer(batch_size: int) -> t.Iterable[Batch]:
+        # 10 distinct elements, each repeated twice
+        data = np.arange(20, dtype=np.float64)[:, None].repeat(2, axis=1) % 10
+        for start in range(0, len(data), batch_size):
+            yield Batch({"input": data[start:start + batch_size]})
+
+    first = list(pipeline(producer, model("double", response_cache=cache))(8))
+    # Duplicates are only inferred once
+    assert sum(details.inference_batch_sizes) == 10
+    assert len(cache) == 10
+
+    # Everything is cached the second time, even with another batch size
+    details.inference_batch_sizes.clear()
+    second = list(pipeline(producer, model("double", response_cache=cache))(5))
+    assert details.inference_batch_sizes == []
+    assert np.array_equal(
+        np.concatenate([batch.fields["double"] for batch in first]),
+        np.concatenate([batch.fields["double"] for batch in second])
+    )
+    assert np.array_equal(second[0].fields["double"][:, 0], np.arange(5) * 2)
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_response_cache_empty_batch() -> None:
+    details = _DoublingModelDetails()
+    stage = Model(details)("double", response_cache=ResponseCache())
+    batch = stage._get_batch_processor()(Batch({"input": np.empty((0, 2))}))
+    assert batch.fields["double"].shape == (0, 2)
+
+
+def test_response_cache_hashes_objects_by_value() -> None:
+    first = np.array(["cat", "dog"], dtype=object)
+    # Equal strings built separately are distinct objects, at other addresses
+    second = np.array(["".join(["c", "at"]), "bird"], dtype=object)
+    keys = ResponseCache._hash_elements({"label": first}) + ResponseCache._hash_elements({"label": second})
+    assert keys[0] == keys[2]
+    assert len(set(keys)) == 3
@@ -39,6 +39,9 @@ import numpy as np
 
 from deepview.introspectors import Duplicates
 from deepview.base import pipeline, Producer, PipelineStage, Batch
+from deepview.base._producer import _accumulate_batches
+from deepview.exceptions import DeepViewException
+from deepview.processors import FieldRemover
 from deepview.samples import StubProducer
 
 
@@ -154,3 +157,319 @@ def test_build_inverse_mapping_join_cluster() -> None:
     assert len(clusters) == len(ground_truth)
     for c in clusters:
         assert set(c) in ground_truth
+
+
+def test_knn_annoy_threaded_queries() -> None:
+    random_s = np.random.RandomState(seed=42)
+    responses = np.concatenate((
+        random_s.normal(10, .01, (200, 8)),
+        random_s.normal(100, 50, (800, 8))
+    ))
+    threshold = Duplicates.ThresholdStrategy.Percentile(98)
+
+    serial = Duplicates.KNNStrategy.KNNAnnoy(num_workers=1)(responses, threshold)
+    threaded = Duplicates.KNNStrategy.KNNAnnoy(num_workers=4)(responses, threshold)
+
+    assert len(serial) == len(threaded)
+    for a, b in zip(serial, threaded):
+        assert np.array_equal(a, b)
+
+
+def test_knn_annoy_parameters() -> None:
+    random_s = np.random.RandomState(seed=42)
+    responses = random_s.normal(10, .01, (20, 4))
+
+    clusters = Duplicates.KNNStrategy.KNNAnnoy(n_trees=5, n=3)(responses, Duplicates.ThresholdStrategy.Percentile(50))
+    assert all(len(c) <= 3 for c in clusters)
+
+    # more neighbors than samples is clamped to the number of samples
+    clusters = Duplicates.KNNStrategy.KNNAnnoy(n=50)(responses[:5], Duplicates.ThresholdStrategy.Percentile(50))
+    assert all(len(c) <= 5 for c in clusters)
+
+    with pytest.raises(ValueError):
+        Duplicates.KNNStrategy.KNNAnnoy(n=1)
+    with pytest.raises(ValueError):
+        Duplicates.KNNStrategy.KNNAnnoy(n_trees=0)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1024])
+def test_brute_force_nearest_neighbors(block_size: int) -> None:
+    random_s = np.random.RandomState(seed=42)
+    responses = random_s.normal(0, 1, (100, 6))
+
+    distances, indexes = Duplicates.KNNStrategy.BruteForce(block_size=block_size, n=5)._nearest_neighbors(responses)
+
+    full = np.linalg.norm(responses[:, np.newaxis, :] - responses[np.newaxis, :, :], axis=2)
+    expected = np.argsort(full, axis=1)[:, :5]
+    assert np.array_equal(indexes, expected)
+    assert np.allclose(distances, np.take_along_axis(full, expected, axis=1))
+    assert np.all(distances[:, 0] == 0)
+
+
+def test_duplicate_introspector_brute_force(duplicate_producer: Producer) -> None:
+    duplicates = Duplicates.introspect(
+        duplicate_producer,
+        threshold=Duplicates.ThresholdStrategy.Percentile(98),
+        strategy=Duplicates.KNNStrategy.BruteForce(block_size=512)
+    )
+
+    assert len(duplicates.results['a']) < len(duplicates.results['b'])
+    assert len(duplicates.results['b']) < len(duplicates.results['c'])
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("count, dimension", [(10000, 10), (20000, 40), (50000, 40)])
+def test_benchmark_knn_strategies(count: int, dimension: int) -> None:
+    import time
+
+    random_s = np.random.RandomState(seed=42)
+    responses = random_s.normal(0, 1, (count, dimension)).astype(np.float32)
+    threshold = Duplicates.ThresholdStrategy.Percentile(98)
+
+    strategies: t.Dict[str, t.Any] = {
+        "BruteForce": Duplicates.KNNStrategy.BruteForce(),
+        "KNNAnnoy": Duplicates.KNNStrategy.KNNAnnoy(),
+        "KNNFaiss": Duplicates.KNNStrategy.KNNFaiss(),
+    }
+    for name, strategy in strategies.items():
+        start = time.perf_counter()
+        strategy(responses, threshold)
+        print(f"{name}: {count} x {dimension} in {time.perf_counter() - start:.2f}s")
+
+
+def _cluster_sets(duplicates: Duplicates, response_name: str) -> t.Set[t.FrozenSet[int]]:
+    return {frozenset(c.indices) for c in duplicates.results[response_name]}
+
+
+@pytest.mark.parametrize("precomputed_norms", [False, True])
+def test_duplicate_introspector_streaming(duplicate_producer: Producer, tmp_path: t.Any,
+                                          precomputed_norms: bool) -> None:
+    threshold = Duplicates.ThresholdStrategy.Percentile(98)
+    in_memory = Duplicates.introspect(duplicate_producer, threshold=threshold)
+
+    column_norms = None
+    if precomputed_norms:
+        column_norms = Duplicates._column_norms(duplicate_producer, 100)
+    streamed = Duplicates.introspect(duplicate_producer, threshold=threshold, streaming=True,
+                                     column_norms=column_norms, index_path=str(tmp_path))
+
+    assert streamed.count == in_memory.count
+    for response_name in ['a', 'b', 'c']:
+        assert _cluster_sets(streamed, response_name) == _cluster_sets(in_memory, response_name)
+
+    # the results carry the producer indices and the matching elements
+    responses = _accumulate_batches(duplicate_producer).fields['c']
+    for cluster in streamed.results['c']:
+        assert np.array_equal(cluster.batch.fields['c'], responses[list(cluster.indices)])
+
+    # the on-disk indexes are removed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_duplicate_introspector_streaming_unsupported(duplicate_producer: Producer) -> None:
+    with pytest.raises(ValueError):
+        Duplicates.introspect(duplicate_producer, strategy=Duplicates.KNNStrategy.BruteForce(), streaming=True)
+
+
+def test_build_inverse_mapping_chain() -> None:
+    # every list overlaps the previous one, so everything is a single cluster
+    count = 100000
+    duplicate_list = [[i + 1, i] for i in range(count - 1)] + [[count + 5, count + 6], []]
+
+    clusters = Duplicates._combine_clusters(duplicate_list)
+
+    assert sorted(len(c) for c in clusters) == [2, count]
+    assert Duplicates._combine_clusters([]) == []
+
+
+@pytest.fixture
+def hashed_producer() -> Producer:
+    random_s = np.random.RandomState(seed=42)
+    images = random_s.randint(0, 256, (300, 16, 16, 3)).astype(np.uint8)
+    responses = random_s.normal(100, 50, (300, 10))
+
+    # exact copies of 0..9 and near-exact (slightly brighter) copies of 10..19
+    images[100:110] = images[0:10]
+    images[110:120] = np.clip(images[10:20].astype(int) + 1, 0, 255)
+    responses[100:120] = responses[0:20]
+
+    return StubProducer({"image": images, "a": responses})
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_duplicate_introspector_hash_prefilter(hashed_producer: Producer, streaming: bool) -> None:
+    duplicates = Duplicates.introspect(hashed_producer, hash_field="image", streaming=streaming,
+                                       threshold=Duplicates.ThresholdStrategy.Percentile(98))
+
+    assert {tuple(c.indices) for c in duplicates.hash_results} == {(i, 100 + i) for i in range(10)}
+    assert all(c.std == 0 and c.batch.batch_size == 2 for c in duplicates.hash_results)
+
+    # the hashed field is not searched, and only the representatives of the groups are
+    assert set(duplicates.results) == {"a"}
+    clustered = {i for c in duplicates.results["a"] for i in c.indices}
+    assert clustered.isdisjoint(range(100, 110))
+    # the near-exact copies are still found by the nearest neighbor search
+    for i in range(10, 20):
+        assert any({i, 100 + i} <= cluster for cluster in _cluster_sets(duplicates, "a"))
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_duplicate_introspector_content_hasher(hashed_producer: Producer, streaming: bool) -> None:
+    # the hashed field is removed by a later stage (like a model), but its hashes are kept
+    producer = pipeline(hashed_producer, Duplicates.ContentHasher("image"), FieldRemover(fields="image"))
+    duplicates = Duplicates.introspect(producer, streaming=streaming,
+                                       threshold=Duplicates.ThresholdStrategy.Percentile(98))
+
+    assert {tuple(c.indices) for c in duplicates.hash_results} == {(i, 100 + i) for i in range(10)}
+    assert all(c.std == 0 and c.batch.batch_size == 2 for c in duplicates.hash_results)
+    clustered = {i for c in duplicates.results["a"] for i in c.indices}
+    assert clustered.isdisjoint(range(100, 110))
+
+    with pytest.raises(DeepViewException, match="ContentHasher"):
+        Duplicates.introspect(producer, hash_field="image", streaming=streaming)
+
+
+def test_duplicate_introspector_perceptual_hash(hashed_producer: Producer) -> None:
+    duplicates = Duplicates.introspect(hashed_producer, hash_field="image", perceptual_hash=True,
+                                       threshold=Duplicates.ThresholdStrategy.Percentile(98))
+
+    assert {tuple(c.indices) for c in duplicates.hash_results} == {(i, 100 + i) for i in range(20)}
+
+
+def test_perceptual_hash() -> None:
+    random_s = np.random.RandomState(seed=42)
+    image = random_s.randint(0, 256, (32, 36)).astype(np.float64)
+
+    # the hash ignores the channels, the brightness and the resolution
+    assert Duplicates._perceptual_hash(image) == Duplicates._perceptual_hash(np.stack([image] * 3, axis=-1))
+    assert Duplicates._perceptual_hash(image) == Duplicates._perceptual_hash(image + 10)
+    assert Duplicates._perceptual_hash(image) == Duplicates._perceptual_hash(np.kron(image, np.ones((2, 2))))
+    assert len(Duplicates._perceptual_hash(image)) == 16
+
+    with pytest.raises(ValueError):
+        Duplicates._perceptual_hash(np.zeros((4, 4)))
+
+
+@pytest.mark.parametrize("build_on_disk", [False, True])
+def test_duplicates_index(tmp_path: t.Any, build_on_disk: bool) -> None:
+    from deepview.introspectors import DuplicatesIndex
+
+    random_s = np.random.RandomState(seed=42)
+    corpus = random_s.normal(100, 50, (500, 10))
+    # near copies of the first 5 corpus samples and 5 samples far from the corpus
+    new_samples = np.concatenate((corpus[:5] + 0.001, random_s.normal(1000, 1, (5, 10))))
+
+    index = DuplicatesIndex.build(StubProducer({"a": corpus}), response_name="a",
+                                  threshold=Duplicates.ThresholdStrategy.Percentile(98),
+                                  path=str(tmp_path / "built") if build_on_disk else None)
+    assert len(index) == 500
+    found = index.query(StubProducer({"a": new_samples}))
+    assert [f[0] for f in found[:5]] == list(range(5))
+    assert found[5:] == [[]] * 5
+
+    index.save(str(tmp_path / "saved"))
+    loaded = DuplicatesIndex.load(str(tmp_path / "saved"))
+    assert loaded.distance == index.distance
+    assert np.array_equal(loaded.column_norms, index.column_norms)
+    assert loaded.query(StubProducer({"a": new_samples}), batch_size=3) == found
+
+    # a larger distance finds more neighbors
+    assert sum(map(len, loaded.query(StubProducer({"a": new_samples}), distance=10.0))) > sum(map(len, found))
+
+
+def test_duplicates_index_identifiers(duplicate_producer: Producer) -> None:
+    from deepview.introspectors import DuplicatesIndex
+
+    # with precomputed norms the producer is read once, so the identifiers start at 0
+    column_norms = np.ones(10)
+    index = DuplicatesIndex.build(duplicate_producer, response_name="a", batch_size=100, column_norms=column_norms)
+    assert list(index.identifiers) == list(range(len(index)))
+    assert index.column_norms is column_norms
+
+
+def test_duplicates_leakage() -> None:
+    from deepview.introspectors import DuplicatesLeakage
+
+    random_s = np.random.RandomState(seed=42)
+    train = random_s.normal(100, 50, (1000, 10))
+    # the first 10 test samples are (near) copies of train samples
+    test = random_s.normal(100, 50, (200, 10))
+    test[:10] = train[100:110] + 0.001
+
+    leakage = DuplicatesLeakage.introspect(StubProducer({"a": train}), StubProducer({"a": test}),
+                                           response_name="a", n=3)
+
+    assert leakage.distances.shape == (200, 3)
+    assert leakage.indices.shape == (200, 3)
+    assert np.all(np.diff(leakage.distances, axis=1) >= 0)
+    assert set(range(10)) <= set(leakage.leaked)
+    # other test samples are only flagged if as close to a train sample as near-duplicates within train
+    assert len(leakage.leaked) < 40
+    assert list(leakage.indices[:10, 0]) == list(range(100, 110))
+    assert len(leakage.identifiers) == 1000
+
+    # an absolute distance only flags the copies
+    leakage = DuplicatesLeakage.introspect(StubProducer({"a": train}), StubProducer({"a": test}),
+                                           response_name="a", n=3, distance=1e-4)
+    assert list(leakage.leaked) == list(range(10))
+    assert leakage.distance == 1e-4
+
+
+def test_duplicates_leakage_clean_split() -> None:
+    from deepview.introspectors import DuplicatesLeakage
+
+    random_s = np.random.RandomState(seed=42)
+    train = random_s.normal(100, 50, (1000, 10))
+    # the test samples are far from all the train samples
+    test = random_s.normal(100, 50, (200, 10)) + 1000
+
+    for threshold in (None, Duplicates.ThresholdStrategy.Percentile(99)):
+        leakage = DuplicatesLeakage.introspect(StubProducer({"a": train}), StubProducer({"a": test}),
+                                               response_name="a", threshold=threshold)
+        assert len(leakage.leaked) == 0
+
+
+def test_duplicates_leakage_all_duplicates() -> None:
+    from deepview.introspectors import DuplicatesLeakage
+
+    # every train sample is the same, and so is every test sample: all the distances are 0
+    train = np.ones((50, 10))
+    leakage = DuplicatesLeakage.introspect(StubProducer({"a": train}), StubProducer({"a": np.ones((20, 10))}),
+                                           response_name="a", n=3)
+    assert leakage.distance == 0
+    assert list(leakage.leaked) == list(range(20))
+
+    # no test sample is a copy of the train samples
+    leakage = DuplicatesLeakage.introspect(StubProducer({"a": train}), StubProducer({"a": np.full((20, 10), 2.0)}),
+                                           response_name="a", n=3)
+    assert len(leakage.leaked) == 0
+
+
+def test_principal_components() -> None:
+    from sklearn.decomposition import PCA
+    from deepview.introspectors._duplicates import _principal_components
+
+    random_s = np.random.RandomState(seed=42)
+    samples = random_s.normal(0, 1, (4, 7, 5))
+
+    projections = _principal_components(samples, 2)
+
+    assert projections.shape == (4, 7, 2)
+    for batch_samples, projection in zip(samples, projections):
+        assert np.allclose(projection, PCA(n_components=2).fit_transform(batch_samples))
+
+
+def test_duplicate_set_candidate_lazy(duplicate_producer: Producer) -> None:
+    duplicates = Duplicates.introspect(duplicate_producer, threshold=Duplicates.ThresholdStrategy.Percentile(98))
+    responses = _accumulate_batches(duplicate_producer).fields['c']
+
+    for cluster in duplicates.results['c']:
+        assert cluster.size == len(cluster.indices)
+        # nothing is materialized until it is accessed
+        assert 'batch' not in cluster.__dict__ and 'projection' not in cluster.__dict__
+
+        assert np.array_equal(cluster.batch.fields['c'], responses[list(cluster.indices)])
+        if cluster.size > 5:
+            assert cluster.projection is not None and cluster.projection.shape == (cluster.size, 2)
+        else:
+            assert cluster.projection is None
@@ -0,0 +1,81 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2021 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import subprocess
+import sys
+
+import pytest
+
+import deepview.typing._types as t
+
+# Libraries only needed when introspecting, that must not be imported with deepview
+_HEAVY_MODULES = ["sklearn", "scipy", "annoy", "autofaiss", "faiss", "matplotlib", "pandas", "umap", "pacmap"]
+
+
+def _imported_modules(statement: str) -> t.Dict[str, int]:
+    """Run ``statement`` with ``-X importtime`` and return the cumulative import time (us) of each module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, check=True
+    )
+    modules: t.Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # e.g. "import time:       974 |      87329 | deepview.introspectors"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.mark.parametrize("statement", [
+    "import deepview",
+    "from deepview.base import pipeline, Model",
+    "import deepview.introspectors",
+    "from deepview.introspectors import DimensionReduction, Duplicates, Familiarity",
+])
+def test_no_heavy_imports(statement: str) -> None:
+    modules = _imported_modules(statement)
+    assert [name for name in modules if name.split(".")[0] in _HEAVY_MODULES] == []
+
+
+def test_lazy_attributes() -> None:
+    import deepview.introspectors as introspectors
+
+    assert set(introspectors.__all__) <= set(dir(introspectors))
+    for name in introspectors.__all__:
+        assert getattr(introspectors, name) is not None
+
+    with pytest.raises(AttributeError):
+        getattr(introspectors, "NotAnIntrospector")
@@ -0,0 +1,79 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import typing as t
+
+import numpy as np
+import pytest
+
+from deepview.base import Batch, TrainTestSplitProducer, pipeline
+from deepview.base._shuffle import _block_permutation
+from deepview.processors import ShuffleBuffer
+
+
+def _sequential_producer(batch_size: int) -> t.Iterable[Batch]:
+    for start in range(0, 100, batch_size):
+        indices = list(range(start, min(start + batch_size, 100)))
+        builder = Batch.Builder(fields={"x": np.array(indices, dtype=np.float32)[:, None]})
+        builder.metadata[Batch.StdKeys.IDENTIFIER] = indices
+        yield builder.make_batch()
+
+
+@pytest.mark.parametrize("buffer_size", [1, 7, 32, 1000])
+def test_shuffle_buffer(buffer_size: int) -> None:
+    producer = pipeline(_sequential_producer, ShuffleBuffer(buffer_size=buffer_size, seed=42))
+    batches = list(producer(batch_size=8))
+
+    assert [batch.batch_size for batch in batches] == [8] * 12 + [4]
+    identifiers = [t.cast(int, i) for batch in batches for i in batch.metadata[Batch.StdKeys.IDENTIFIER]]
+    assert sorted(identifiers) == list(range(100))
+    assert identifiers != list(range(100))
+    for batch in batches:
+        # Fields and metadata are shuffled together
+        assert batch.fields["x"][:, 0].tolist() == batch.metadata[Batch.StdKeys.IDENTIFIER]
+
+    # A seed makes every call produce the same order
+    assert [i for batch in producer(batch_size=8) for i in batch.metadata[Batch.StdKeys.IDENTIFIER]] == identifiers
+
+
+def test_shuffle_buffer_invalid_size() -> None:
+    with pytest.raises(ValueError):
+        ShuffleBuffer(buffer_size=0)
+
+
+def test_block_permutation() -> None:
+    permutation = _block_permutation(1000, block_size=10, buffer_size=40)
+    assert sorted(permutation.tolist()) == list(range(1000))
+    # Every window of buffer_size rows comes from exactly 4 blocks of contiguous rows
+    for start in range(0, 1000, 40):
+        assert len(set((permutation[start:start + 40] // 10).tolist())) == 4
+
+    with pytest.raises(ValueError):
+        _block_permutation(10, block_size=0, buffer_size=4)
+
+
+def test_traintest_block_shuffle() -> None:
+    x_train = np.arange(60).reshape(60, 1)
+    x_test = np.arange(60, 100).reshape(40, 1)
+    producer = TrainTestSplitProducer(((x_train, x_train % 3), (x_test, x_test % 3)))
+
+    producer.shuffle(block_size=5, buffer_size=20)
+    samples = np.concatenate([batch.fields["samples"] for batch in producer(batch_size=20)])
+    assert sorted(samples.tolist()) == list(range(100))
+    assert samples.tolist() != list(range(100))
+    for start in range(0, 100, 20):
+        assert len(set((samples[start:start + 20] // 5).tolist())) == 4
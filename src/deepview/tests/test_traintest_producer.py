@@ -1,10 +1,25 @@
+import dataclasses
 import os
+import pathlib
+import typing as t
+from unittest import mock
+
 import numpy as np
 import pytest
 from deepview.base import TrainTestSplitProducer, Batch
+from deepview import _image_io
 from deepview.exceptions import DeepViewException
 
 
+def _produced_split(producer: TrainTestSplitProducer) -> t.Tuple[t.Tuple[np.ndarray, np.ndarray], t.Tuple[np.ndarray, np.ndarray]]:
+    """Gather the samples and labels produced by ``producer``, as ``(x_train, y_train), (x_test, y_test)``."""
+    batch = next(iter(producer(batch_size=producer.max_samples)))
+    labels = batch.metadata[Batch.StdKeys.LABELS]
+    dataset = np.asarray(labels["dataset"])
+    x, y = batch.fields["samples"], np.asarray(labels["label"])
+    return (x[dataset == "train"], y[dataset == "train"]), (x[dataset == "test"], y[dataset == "test"])
+
+
 def test_subset_with_labels() -> None:
     """Test subset functionality with numeric labels."""
     x_train = np.array([[1], [2], [3], [4], [5]])
@@ -19,7 +34,7 @@ def test_subset_with_labels() -> None:
 
     # Test subsetting with single label
     subset_producer = producer.subset(labels=1)
-    subset_data = subset_producer.split_dataset
+    subset_data = _produced_split(subset_producer)
     train_data, test_data = subset_data
     x_train_subset, y_train_subset = train_data
     x_test_subset, y_test_subset = test_data
@@ -36,7 +51,7 @@ def test_subset_with_labels() -> None:
 
     # Test subsetting with multiple labels
     subset_producer = producer.subset(labels=[0, 2])
-    subset_data = subset_producer.split_dataset
+    subset_data = _produced_split(subset_producer)
     train_data, test_data = subset_data
     x_train_subset, y_train_subset = train_data
     x_test_subset, y_test_subset = test_data
@@ -53,7 +68,7 @@ def test_subset_with_labels() -> None:
 
     # Test with None labels (should include all samples)
     subset_producer = producer.subset(labels=None)
-    subset_data = subset_producer.split_dataset
+    subset_data = _produced_split(subset_producer)
     train_data, test_data = subset_data
     x_train_subset, y_train_subset = train_data
     x_test_subset, y_test_subset = test_data
@@ -90,7 +105,7 @@ def test_subset_with_text_labels_and_images() -> None:
 
     # Test subsetting with single label
     subset_producer = producer.subset(labels='cat')
-    subset_data = subset_producer.split_dataset
+    subset_data = _produced_split(subset_producer)
     train_data, test_data = subset_data
     x_train_subset, y_train_subset = train_data
     x_test_subset, y_test_subset = test_data
@@ -107,7 +122,7 @@ def test_subset_with_text_labels_and_images() -> None:
 
     # Test subsetting with multiple labels
     subset_producer = producer.subset(labels=['dog', 'bird'])
-    subset_data = subset_producer.split_dataset
+    subset_data = _produced_split(subset_producer)
     train_data, test_data = subset_data
     x_train_subset, y_train_subset = train_data
     x_test_subset, y_test_subset = test_data
@@ -136,7 +151,7 @@ def test_subset_with_text_labels_and_images() -> None:
 
     # Check properties of filtered data
     subset_producer = producer.subset(labels='cat')
-    subset_data = subset_producer.split_dataset
+    subset_data = _produced_split(subset_producer)
     train_data, test_data = subset_data
     x_train_subset, _ = train_data
     x_test_subset, _ = test_data
@@ -182,6 +197,42 @@ def test_file_names_and_write_to_disk() -> None:
     assert not os.path.exists(temp_dir), "Directory should be deleted after cleanup"
 
 
+def test_write_to_disk_is_idempotent() -> None:
+    """Test that repeated passes do not re-encode images already written to disk."""
+    x_train = (np.random.rand(6, 16, 16, 3) * 255).astype(np.uint8)
+    y_train = np.array(['cat', 'dog', 'bird', 'cat', 'dog', 'bird'])
+    producer = TrainTestSplitProducer(
+        split_dataset=((x_train, y_train), (np.empty((0,)), np.empty((0,)))),
+        write_to_folder=True,
+        write_format="jpg",
+        write_quality=90
+    )
+
+    with mock.patch.object(_image_io, "write_image", wraps=_image_io.write_image) as write:
+        first_pass = [str(path) for batch in producer(batch_size=4) for path in batch.metadata[Batch.StdKeys.IDENTIFIER]]
+        assert write.call_count == 6
+        second_pass = [str(path) for batch in producer(batch_size=4) for path in batch.metadata[Batch.StdKeys.IDENTIFIER]]
+        assert write.call_count == 6
+
+        # A file changed on disk since it was written is written again
+        pathlib.Path(first_pass[0]).write_bytes(b"not an image")
+        list(producer(batch_size=4))
+        assert write.call_count == 7
+
+    assert first_pass == second_pass
+    assert all(path.endswith(".jpg") and os.path.exists(path) for path in first_pass)
+    assert producer.cleanup()
+
+
+def test_write_to_disk_invalid_format() -> None:
+    with pytest.raises(ValueError):
+        TrainTestSplitProducer(
+            split_dataset=((np.zeros((2, 4, 4, 3), dtype=np.uint8), np.array([0, 1])), (np.empty((0,)), np.empty((0,)))),
+            write_to_folder=True,
+            write_format="gif"
+        )
+
+
 def test_cleanup_functionality() -> None:
     """Test the cleanup functionality of TrainTestSplitProducer."""
     image_shape = (32, 32, 3)
@@ -236,17 +287,13 @@ def test_dataset_filtering() -> None:
 
     # Test filtering only train data
     train_producer = producer.subset(datasets='train')
-    (x_train_subset, y_train_subset), (x_test_subset, y_test_subset) = (
-        train_producer.split_dataset
-    )
+    (x_train_subset, y_train_subset), (x_test_subset, y_test_subset) = _produced_split(train_producer)
     assert len(x_train_subset) == 3
     assert x_test_subset.size == 0
 
     # Test filtering only test data
     test_producer = producer.subset(datasets='test')
-    (x_train_subset, y_train_subset), (x_test_subset, y_test_subset) = (
-        test_producer.split_dataset
-    )
+    (x_train_subset, y_train_subset), (x_test_subset, y_test_subset) = _produced_split(test_producer)
     assert x_train_subset.size == 0
     assert len(x_test_subset) == 2
 
@@ -256,6 +303,41 @@ def test_dataset_filtering() -> None:
     assert str(exc_info.value) == "'datasets' field is of length 0. Maybe it should be None?"
 
 
+def test_chained_subsets_share_data() -> None:
+    """Test that subsets only store indices into the parent's arrays, and that chained subsets compose."""
+    x_train = np.arange(20).reshape(10, 2)
+    y_train = np.array([[i % 3] for i in range(10)])
+    x_test = np.arange(100, 112).reshape(6, 2)
+    y_test = np.array([[i % 3] for i in range(6)])
+    producer = TrainTestSplitProducer(split_dataset=((x_train, y_train), (x_test, y_test)))
+
+    subset = producer.subset(labels=[1, 2])
+    chained = subset.subset(labels=2, datasets="test")
+    assert type(chained) is TrainTestSplitProducer
+    assert chained._samples._arrays[0] is x_train and chained._samples._arrays[1] is x_test
+
+    assert chained.split_dataset is producer.split_dataset
+
+    (chained_x_train, _), (chained_x_test, chained_y_test) = _produced_split(chained)
+    assert len(chained_x_train) == 0
+    assert np.array_equal(chained_x_test, x_test[y_test[:, 0] == 2])
+    assert np.all(chained_y_test == 2)
+
+    samples = np.concatenate([batch.fields["samples"] for batch in chained(batch_size=1)])
+    assert np.array_equal(samples, x_test[y_test[:, 0] == 2])
+
+    # Copies made with dataclasses.replace keep the selected rows
+    replaced = dataclasses.replace(chained, max_samples=1)
+    assert replaced.max_samples == 1
+    assert np.array_equal(replaced._samples[:], x_test[y_test[:, 0] == 2])
+    assert [batch.batch_size for batch in replaced(batch_size=4)] == [1]
+
+    # Shuffling and max_samples are specific to each subset
+    subset.shuffle()
+    assert chained._permutation is None
+    assert producer.subset(max_samples=4).max_samples == 4 and producer.max_samples == 16
+
+
 def test_max_samples() -> None:
     """Test max_samples functionality."""
     x_train = np.array([[1], [2], [3], [4]])
@@ -290,3 +372,36 @@ def test_max_samples() -> None:
     total_samples = sum(len(batch.fields['samples'])
                         for batch in producer(batch_size=2))
     assert total_samples == 6  # Should use all available samples
+
+
+def test_memory_mapped_split(tmp_path: pathlib.Path) -> None:
+    """Test that memory-mapped arrays are not concatenated and produce the same batches as in-memory ones."""
+    x_train = np.arange(7 * 4 * 4 * 3, dtype=np.uint8).reshape((7, 4, 4, 3))
+    y_train = np.arange(7).reshape((7, 1))
+    x_test = np.arange(5 * 4 * 4 * 3, dtype=np.uint8).reshape((5, 4, 4, 3)) + 100
+    y_test = np.arange(7, 12).reshape((5, 1))
+    for name, array in (("x_train", x_train), ("y_train", y_train), ("x_test", x_test), ("y_test", y_test)):
+        np.save(tmp_path / f"{name}.npy", array)
+
+    producer = TrainTestSplitProducer.from_npy_files(
+        tmp_path / "x_train.npy", tmp_path / "y_train.npy",
+        tmp_path / "x_test.npy", tmp_path / "y_test.npy"
+    )
+    (mm_x_train, _), (mm_x_test, _) = producer.split_dataset
+    assert isinstance(mm_x_train, np.memmap) and isinstance(mm_x_test, np.memmap)
+    assert producer._samples.shape == (12, 4, 4, 3)
+    assert producer._labels.shape == (12,)
+
+    in_memory = TrainTestSplitProducer(((x_train, y_train), (x_test, y_test)))
+    for memmapped_batch, batch in zip(producer(batch_size=5), in_memory(batch_size=5)):
+        assert np.array_equal(memmapped_batch.fields["samples"], batch.fields["samples"])
+
+    # Shuffled batches gather the right rows across the train and test arrays
+    producer.shuffle()
+    expected = np.concatenate((x_train, x_test))
+    labels = np.concatenate((y_train, y_test))[:, 0]
+    for batch in producer(batch_size=5):
+        indices = t.cast(t.List[int], batch.metadata[Batch.StdKeys.IDENTIFIER])
+        assert np.array_equal(batch.fields["samples"], expected[indices])
+        assert list(batch.metadata[Batch.StdKeys.LABELS]["label"]) == list(labels[indices])
+        assert list(batch.metadata[Batch.StdKeys.LABELS]["dataset"]) == ["train" if i < 7 else "test" for i in indices]
@@ -16,20 +16,162 @@
 
 import os
 import cv2
+import concurrent.futures
 import dataclasses
+import hashlib
+import itertools
+import json
+import tempfile
 import numpy as np
 from tqdm import tqdm
-import glob
 from typing import List, Optional, Tuple, Dict
 from PIL import Image
 import shutil
 
 from pathlib import Path
 from deepview.base import Producer, Batch
+from deepview import _image_io
 from deepview.exceptions import DeepViewException
 from deepview._logging import _Logged
 import deepview.typing._types as t
 
+_CACHE_DONE_MARKER: t.Final = ".cache.done"
+_CACHE_CHUNK_SIZE: t.Final = 256
+
+# (size, st_mtime_ns) of an image file, used to detect files modified in place
+_FileSignature = Tuple[int, int]
+
+
+def _verify_image(img_path: str) -> bool:
+    """Return True if PIL can parse the header of the image at ``img_path``."""
+    try:
+        # verify() only reads the header, not the full image
+        with Image.open(img_path) as img:
+            img.verify()
+        return True
+    except Exception:
+        return False
+
+
+def _sample_cache_path(root_folder: str,
+                       cache_dir: Optional[str],
+                       class_files: Dict[str, Dict[str, _FileSignature]],
+                       image_size: Tuple[int, int],
+                       max_samples: int,
+                       train_split: float) -> str:
+    """
+    Path of the preprocessed sample cache for a dataset, keyed by the root folder, a fingerprint
+    of the image files found (names, sizes and modification times), and the parameters that
+    affect the cached samples.
+    """
+    fingerprint = hashlib.sha1()
+    fingerprint.update(os.path.abspath(root_folder).encode("utf-8"))
+    fingerprint.update(repr((tuple(image_size), max_samples, train_split)).encode("utf-8"))
+    for class_name in sorted(class_files):
+        for img_path, (size, mtime_ns) in sorted(class_files[class_name].items()):
+            fingerprint.update(os.path.relpath(img_path, root_folder).encode("utf-8"))
+            fingerprint.update(f"\0{size}\0{mtime_ns}\0".encode("utf-8"))
+    cache_dir = cache_dir if cache_dir is not None else tempfile.gettempdir()
+    return os.path.join(cache_dir, f"deepview-image-cache-{fingerprint.hexdigest()}")
+
+
+_SplitDataset = Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def _load_sample_cache(cache_path: str) -> Optional[Tuple[np.ndarray, _SplitDataset]]:
+    """
+    Load a sample cache written by :func:`ImageFolderDataset._build_sample_cache`.
+
+    Returns:
+        ``None`` if there is no complete cache at ``cache_path``, otherwise the memory-mapped
+        samples (in produced order: train first, then test) and the cached train/test split of paths and labels.
+    """
+    if not os.path.exists(os.path.join(cache_path, _CACHE_DONE_MARKER)):
+        return None
+    paths = np.load(os.path.join(cache_path, "paths.npy"))
+    labels = np.load(os.path.join(cache_path, "labels.npy"))
+    dataset_ids = np.load(os.path.join(cache_path, "datasets.npy"))
+    samples = np.load(os.path.join(cache_path, "samples.npy"), mmap_mode="r")[:len(paths)]
+    train = dataset_ids == 0
+    return samples, ((paths[train], labels[train]), (paths[~train], labels[~train]))
+
+
+def _decode_image_into(img_path: str, out: np.ndarray) -> bool:
+    """
+    Decode the image at ``img_path`` and write it, resized and in RGB order, into ``out``.
+
+    Returns:
+        False if the image could not be decoded, True otherwise.
+    """
+    img = cv2.imread(img_path)
+    if img is None:
+        return False
+    # Resize first (cheaper on the smaller image), then convert BGR to RGB in place
+    cv2.resize(img, (out.shape[1], out.shape[0]), dst=out)
+    cv2.cvtColor(out, cv2.COLOR_BGR2RGB, dst=out)
+    return True
+
+
+def _list_class_files(class_path: str, valid_extensions: t.Sequence[str]) -> List[str]:
+    """
+    List (in a single directory scan) all non-hidden files in ``class_path`` with a valid extension.
+
+    Returns:
+        The file paths, sorted
+    """
+    extensions = tuple(valid_extensions)
+    files = []
+    with os.scandir(class_path) as entries:
+        for entry in entries:
+            if not entry.name.startswith('.') and entry.name.endswith(extensions) and entry.is_file():
+                files.append(entry.path)
+    # Sort so that sampling only depends on the random state, not on the filesystem order
+    files.sort()
+    return files
+
+
+def _file_signatures(paths: t.Iterable[str]) -> Dict[str, _FileSignature]:
+    """
+    Get the (size, modification time in ns) of each file -- only needed by the validation manifest
+    and the sample cache, so the files are not stat'ed otherwise.
+    """
+    signatures = {}
+    for path in paths:
+        stat = os.stat(path)
+        signatures[path] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+
+def _manifest_path(root_folder: str, cache_dir: Optional[str]) -> str:
+    """Path of the validation manifest for ``root_folder``, stored under ``cache_dir``."""
+    cache_dir = cache_dir if cache_dir is not None else tempfile.gettempdir()
+    root_hash = hashlib.sha1(os.path.abspath(root_folder).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"deepview-image-manifest-{root_hash}.json")
+
+
+def _load_manifest(path: str) -> Dict[str, t.Any]:
+    """Load a validation manifest, returning an empty one if missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and isinstance(manifest.get("files"), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"files": {}}
+
+
+def _save_manifest(path: str, manifest: Dict[str, t.Any]) -> None:
+    """Atomically write a validation manifest (a failure to write is not fatal)."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
 
 @t.final
 class ImageFolderDataset(Producer, _Logged):
@@ -52,6 +194,20 @@ class ImageFolderDataset(Producer, _Logged):
         train_split: Fraction of data to use for training (default: 0.8)
         valid_extensions: List of valid file extensions to include (default: ['.jpg', '.jpeg', '.png'])
         max_samples: Maximum number of samples to load (-1 for all, default: -1)
+        write_to_folder: Write produced images to a local folder for visualization (default: False)
+        write_format: Format of the images written to folder: ``"png"`` (default), ``"jpg"`` (faster),
+            or ``"link"`` to symlink the original files instead of encoding the resized images
+        write_quality: PNG compression level (0-9, lower is faster) or JPEG quality (0-100)
+            used when writing to folder (default: ``None``, OpenCV defaults)
+        validate_images: Verify image headers when building the dataset (default: True).
+            If False, corrupt files are only detected (and skipped) when batches are produced.
+        num_workers: Number of threads used to validate, decode and write images (default: ``None``, let
+            :class:`concurrent.futures.ThreadPoolExecutor` decide)
+        cache_samples: Store the resized samples in a memory-mapped cache under ``cache_dir`` and
+            reuse it on later runs over the same folder, file list and ``image_size`` (default: False).
+            The first run decodes every image once to build the cache.
+        cache_dir: Directory where the manifest of verified images and the sample cache are stored
+            (default: the system's temporary directory)
     """
 
     root_folder: str
@@ -73,11 +229,32 @@ class ImageFolderDataset(Producer, _Logged):
     write_to_folder: bool = False
     """bool to write data to folder for visualization. If False, does not write anything."""
 
+    write_format: str = "png"
+    """Format of the images written to folder: ``"png"``, ``"jpg"`` or ``"link"`` (symlink the original files)."""
+
+    write_quality: Optional[int] = None
+    """PNG compression level (0-9) or JPEG quality (0-100) of written images. ``None`` uses OpenCV defaults."""
+
+    validate_images: bool = True
+    """Verify image headers on construction. If False, corrupt images are skipped when decoded."""
+
+    num_workers: Optional[int] = None
+    """Number of threads used to validate, decode and write images. ``None`` lets the thread pool decide."""
+
+    cache_samples: bool = False
+    """Cache resized samples in a memory-mapped array that is reused across runs."""
+
+    cache_dir: Optional[str] = None
+    """Directory holding the manifest of verified images and the sample cache. ``None`` uses the system temp dir."""
+
     _samples: np.ndarray = dataclasses.field(init=False)
     _labels: np.ndarray = dataclasses.field(init=False)
     _dataset_ids: np.ndarray = dataclasses.field(init=False)
     _dataset_labels: np.ndarray = dataclasses.field(init=False)
     _permutation: t.Optional[np.ndarray] = dataclasses.field(init=False)
+    _sample_cache: t.Optional[np.ndarray] = dataclasses.field(init=False)
+    _sample_cache_path: t.Optional[str] = dataclasses.field(init=False)
+    _written_files: t.Dict[str, t.Tuple[int, int]] = dataclasses.field(init=False)
 
     def __init__(self,
                  root_folder: str,
@@ -85,18 +262,38 @@ class ImageFolderDataset(Producer, _Logged):
                  train_split: float = 0.8,
                  valid_extensions: Optional[List[str]] = None,
                  max_samples: int = -1,
-                 write_to_folder: bool = False):
+                 write_to_folder: bool = False,
+                 write_format: str = "png",
+                 write_quality: Optional[int] = None,
+                 validate_images: bool = True,
+                 num_workers: Optional[int] = None,
+                 cache_samples: bool = False,
+                 cache_dir: Optional[str] = None):
 
         if not 0 <= train_split <= 1:
             raise ValueError("train_split must be between 0 and 1")
+        if write_format != "link":
+            # Fail early on unsupported formats
+            _image_io.image_write_params(write_format, write_quality)
         self.root_folder = root_folder
         self.image_size = image_size
         self.train_split = train_split
         self.valid_extensions = valid_extensions or ['.jpg', '.jpeg', '.JPEG', '.png']
         self.max_samples = max_samples
+        self.validate_images = validate_images
+        self.num_workers = num_workers
+        self.cache_samples = cache_samples
+        self.cache_dir = cache_dir
+        self._sample_cache = None
+        self._sample_cache_path = None
         self.raw_dataset = self._load_data_from_folder()
         self.write_to_folder = write_to_folder
+        self.write_format = write_format
+        self.write_quality = write_quality
+        self._written_files = {}
         self._post_initialization()
+        if self.cache_samples and self._sample_cache is None:
+            self._build_sample_cache()
         # Initialize parent class with loaded dataset
         super().__init__()
 
@@ -125,54 +322,48 @@ class ImageFolderDataset(Producer, _Logged):
         if not class_folders:
             raise ValueError("No valid class folders found in the root directory")
 
-        # First, collect all available images per class
-        class_files = {}
+        # First, collect all available images per class (a single directory scan per class)
+        class_files: Dict[str, List[str]] = {}
         for class_name in class_folders:
-            class_path = os.path.join(self.root_folder, class_name)
-            files = []
-            for ext in self.valid_extensions:
-                files.extend(
-                    glob.glob(os.path.join(class_path, f'*{ext}'))
-                )
+            files = _list_class_files(os.path.join(self.root_folder, class_name), self.valid_extensions)
             if files:  # Only add classes that have valid images
                 class_files[class_name] = files
 
         if not class_files:
             raise ValueError("No valid image files found")
 
+        if self.cache_samples:
+            self._sample_cache_path = _sample_cache_path(
+                self.root_folder, self.cache_dir,
+                {class_name: _file_signatures(files) for class_name, files in class_files.items()},
+                self.image_size, self.max_samples, self.train_split)
+            cached = _load_sample_cache(self._sample_cache_path)
+            if cached is not None:
+                self.logger.info(f"Using cached samples from {self._sample_cache_path}")
+                self._sample_cache, split = cached
+                return split
+
         # Calculate samples per class
         if self.max_samples > 0:
             samples_per_class = self.max_samples // len(class_files)
             if samples_per_class == 0:
                 samples_per_class = 1  # Ensure at least one sample per class
 
-        # Load and process images for each class
         image_datum_by_class: Dict[str, List[str]] = {}
-        total_files = sum(len(files) for files in class_files.values())
-
-        with tqdm(total=total_files, desc="Loading images", unit="img") as pbar:
-            for class_name, files in class_files.items():
-                # Randomly shuffle files to ensure random sampling
-                np.random.shuffle(files)
-
-                # Determine how many samples to take from this class
-                if self.max_samples > 0:
-                    n_samples = min(len(files), samples_per_class)
-                    files = files[:n_samples]
-
-                image_datum_by_class[class_name] = []
-                for img_path in files:
-                    try:
-                        # Verify image by reading only the header
-                        with Image.open(img_path) as img:
-                            # verify() only reads the header, not the full image
-                            img.verify()
-                        image_datum_by_class[class_name].append(img_path)
-                    except Exception:
-                        # Skip invalid images
-                        pass
-                    finally:
-                        pbar.update(1)
+        for class_name, files in class_files.items():
+            files = list(files)
+            # Randomly shuffle files to ensure random sampling
+            np.random.shuffle(files)
+
+            # Determine how many samples to take from this class
+            if self.max_samples > 0:
+                n_samples = min(len(files), samples_per_class)
+                files = files[:n_samples]
+
+            image_datum_by_class[class_name] = files
+
+        if self.validate_images:
+            image_datum_by_class = self._validate_images(image_datum_by_class)
 
         # Convert to arrays
         all_images = []
@@ -206,6 +397,57 @@ class ImageFolderDataset(Producer, _Logged):
 
         return ((X[train_indices], y[train_indices]), (X[test_indices], y[test_indices]))
 
+    def _validate_images(self, image_datum_by_class: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """
+        Verify image headers in a thread pool, dropping images that cannot be parsed.
+
+        Results are cached in a manifest keyed by each file's size and modification time,
+        so that only new (or modified) images are verified on subsequent runs.
+
+        Args:
+            image_datum_by_class: mapping of class name to candidate image paths
+
+        Returns:
+            A mapping of class name to the image paths that passed verification
+        """
+        manifest_path = _manifest_path(self.root_folder, self.cache_dir)
+        manifest = _load_manifest(manifest_path)
+        entries = manifest["files"]
+        signatures = _file_signatures(f for files in image_datum_by_class.values() for f in files)
+
+        # Reuse verdicts of images whose size and modification time did not change
+        verdicts: Dict[str, bool] = {}
+        to_verify: List[str] = []
+        for class_name, files in image_datum_by_class.items():
+            for f in files:
+                size, mtime_ns = signatures[f]
+                entry = entries.get(os.path.relpath(f, self.root_folder))
+                if isinstance(entry, list) and entry[:2] == [size, mtime_ns]:
+                    verdicts[f] = bool(entry[2])
+                else:
+                    to_verify.append(f)
+
+        if to_verify:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers,
+                                                       thread_name_prefix="image_validation_") as executor:
+                with tqdm(total=len(to_verify), desc="Verifying images", unit="img") as pbar:
+                    for img_path, is_valid in zip(to_verify, executor.map(_verify_image, to_verify)):
+                        verdicts[img_path] = is_valid
+                        pbar.update(1)
+
+            for class_name, files in image_datum_by_class.items():
+                for f in files:
+                    size, mtime_ns = signatures[f]
+                    entries[os.path.relpath(f, self.root_folder)] = [size, mtime_ns, verdicts[f]]
+            _save_manifest(manifest_path, manifest)
+        else:
+            self.logger.info(f"Using cached image verification results from {manifest_path}")
+
+        return {
+            class_name: [f for f in files if verdicts[f]]
+            for class_name, files in image_datum_by_class.items()
+        }
+
     def _post_initialization(self) -> None:
         # Verify type of data matches expectation
         if not (isinstance(self.raw_dataset, tuple) and
@@ -256,6 +498,54 @@ class ImageFolderDataset(Producer, _Logged):
 
         self._permutation = None
 
+    def shuffle(self) -> None:
+        """
+        Shuffle the dataset, to produce randomized samples in batches.
+        """
+        self._permutation = np.random.permutation(len(self._samples))
+
+    def _build_sample_cache(self) -> None:
+        """
+        Decode and resize every sample once, storing them in a memory-mapped ``.npy`` array
+        (in produced order) next to the paths, labels and dataset ids of the samples,
+        then switch this instance to read from the cache.
+        """
+        assert self._sample_cache_path is not None
+        cache_parent = os.path.dirname(self._sample_cache_path)
+        os.makedirs(cache_parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=".deepview-image-cache-", dir=cache_parent)
+
+        try:
+            samples = np.lib.format.open_memmap(
+                os.path.join(tmp_path, "samples.npy"), mode="w+", dtype=np.uint8,
+                shape=(len(self._samples), self.image_size[0], self.image_size[1], 3))
+            offset = 0
+            kept_indices: t.List[int] = []
+            with tqdm(total=len(self._samples), desc="Caching images", unit="img") as pbar:
+                for indices, samples_array in self._iter_decoded_batches(_CACHE_CHUNK_SIZE):
+                    samples[offset:offset + len(indices)] = samples_array
+                    offset += len(indices)
+                    kept_indices.extend(indices)
+                    pbar.update(len(indices))
+            samples.flush()
+            del samples
+
+            np.save(os.path.join(tmp_path, "paths.npy"), self._samples[kept_indices])
+            np.save(os.path.join(tmp_path, "labels.npy"), self._labels[kept_indices])
+            np.save(os.path.join(tmp_path, "datasets.npy"), self._dataset_ids[kept_indices])
+            Path(os.path.join(tmp_path, _CACHE_DONE_MARKER)).touch()
+            os.replace(tmp_path, self._sample_cache_path)
+        except OSError:
+            # Another process may have completed the same cache concurrently
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.exists(os.path.join(self._sample_cache_path, _CACHE_DONE_MARKER)):
+                raise
+
+        cached = _load_sample_cache(self._sample_cache_path)
+        assert cached is not None
+        self._sample_cache, self.raw_dataset = cached
+        self._post_initialization()
+
     def _class_path(self, index: int) -> str:
         return f"{self._dataset_labels[index]}/{self._labels[index]}"
 
@@ -269,7 +559,11 @@ class ImageFolderDataset(Producer, _Logged):
 
     def _write_images_to_disk(self, indices: t.Sequence[int], samples_array: np.ndarray, data_path: str) -> t.List[str]:
         """
-        Write images to disk and return the file paths.
+        Write images to disk (in parallel) and return the file paths.
+
+        Files written by an earlier call of this dataset are not written again, as long as their
+        size and modification time are unchanged. Files left on disk by other instances or
+        earlier runs are always overwritten.
 
         Args:
             indices: Sequence of indices
@@ -279,19 +573,121 @@ class ImageFolderDataset(Producer, _Logged):
         Returns:
             List of file paths
         """
-        file_paths = []
+        link = self.write_format == "link"
+        extension, params = ("", []) if link else _image_io.image_write_params(self.write_format, self.write_quality)
 
+        file_paths = []
+        to_write = []
         for i, idx in enumerate(indices):
-            # Extract individual image from the batch
-            sample = samples_array[i]
-            base_path = os.path.join(data_path, self._class_path(idx))
-            Path(base_path).mkdir(exist_ok=True, parents=True)
-            filename = os.path.join(base_path, f"image{idx}.png")
-            cv2.imwrite(filename, cv2.cvtColor(sample, cv2.COLOR_RGB2BGR))
+            if link:
+                extension = os.path.splitext(self._samples[idx])[1]
+            filename = os.path.join(data_path, self._class_path(idx), f"image{idx}{extension}")
             file_paths.append(filename)
+            signature = self._written_files.get(filename)
+            if signature is None or signature != _image_io.file_signature(filename):
+                to_write.append((i, idx, filename))
+
+        if to_write:
+            for base_path in {os.path.dirname(filename) for _, _, filename in to_write}:
+                Path(base_path).mkdir(exist_ok=True, parents=True)
+            if link:
+                for _, idx, filename in to_write:
+                    if os.path.lexists(filename):
+                        os.remove(filename)
+                    os.symlink(os.path.abspath(self._samples[idx]), filename)
+            else:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers,
+                                                           thread_name_prefix="image_export_") as executor:
+                    # list() to propagate any exception raised while writing
+                    list(executor.map(_image_io.write_image,
+                                      [filename for _, _, filename in to_write],
+                                      [samples_array[i] for i, _, _ in to_write],
+                                      itertools.repeat(params)))
+            for _, _, filename in to_write:
+                signature = _image_io.file_signature(filename)
+                if signature is not None:
+                    self._written_files[filename] = signature
 
         return file_paths
 
+    def _batch_indices(self, start: int, batch_size: int) -> t.List[int]:
+        end = min(start + batch_size, self.max_samples)
+        if self._permutation is None:
+            return list(range(start, end))
+        return self._permutation[start:end].tolist()
+
+    def _submit_batch(self,
+                      executor: concurrent.futures.Executor,
+                      start: int,
+                      batch_size: int) -> Tuple[t.List[int], np.ndarray, t.List["concurrent.futures.Future[bool]"]]:
+        """
+        Schedule decoding of the batch starting at ``start`` directly into a preallocated buffer.
+
+        Returns:
+            The sample indices of the batch, the (batch, height, width, 3) uint8 buffer the images
+            are decoded into, and one future per image that resolves to whether decoding succeeded.
+        """
+        indices = self._batch_indices(start, batch_size)
+        samples_array = np.empty((len(indices), self.image_size[0], self.image_size[1], 3), dtype=np.uint8)
+        futures = [
+            executor.submit(_decode_image_into, img_path, samples_array[i])
+            for i, img_path in enumerate(self._samples[indices, ...])
+        ]
+        return indices, samples_array, futures
+
+    def _iter_decoded_batches(self, batch_size: int) -> t.Iterator[Tuple[t.List[int], np.ndarray]]:
+        """
+        Decode batches from disk on a thread pool, prefetching the next batch while the
+        current one is consumed.
+
+        Yields:
+            The sample indices of each batch and the corresponding decoded images.
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers,
+                                                         thread_name_prefix="image_decoding_")
+        try:
+            starts = range(0, self.max_samples, batch_size)
+            # Start decoding the first batch
+            pending = self._submit_batch(executor, starts[0], batch_size) if starts else None
+            for ii in starts:
+                assert pending is not None
+                indices, samples_array, decoded_futures = pending
+
+                # Prefetch the next batch while the current one is being consumed
+                next_start = ii + batch_size
+                pending = (self._submit_batch(executor, next_start, batch_size)
+                           if next_start < self.max_samples else None)
+
+                decoded = np.array([future.result() for future in decoded_futures], dtype=bool)
+                if not decoded.all():
+                    # Corrupt images are skipped lazily when validation was disabled
+                    for idx in np.array(indices)[~decoded]:
+                        self.logger.warning(f"Skipping image that could not be decoded: {self._samples[idx]}")
+                    indices = [idx for idx, is_decoded in zip(indices, decoded) if is_decoded]
+                    samples_array = samples_array[decoded]
+                    if not indices:
+                        continue
+
+                yield indices, samples_array
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _iter_cached_batches(self, batch_size: int) -> t.Iterator[Tuple[t.List[int], np.ndarray]]:
+        """
+        Read batches from the memory-mapped sample cache (sequential reads unless shuffled).
+
+        Yields:
+            The sample indices of each batch and the corresponding cached images.
+        """
+        assert self._sample_cache is not None
+        for ii in range(0, self.max_samples, batch_size):
+            indices = self._batch_indices(ii, batch_size)
+            if self._permutation is None:
+                samples_array = np.array(self._sample_cache[ii:ii + len(indices)])
+            else:
+                samples_array = self._sample_cache[indices]
+            yield indices, samples_array
+
     def __call__(self, batch_size: int) -> t.Iterable[Batch]:
         """
         Produce generic :class:`Batch` es from the loaded data,
@@ -309,29 +705,14 @@ class ImageFolderDataset(Producer, _Logged):
                 - "label": a NumPy array of label features (format specific to each dataset)
                 - "dataset": a NumPy array of ints either 0 (for "train") or 1 (for "test")
 
+            Images are decoded on a thread pool and the next batch is prefetched while the current
+            one is consumed (or read from the sample cache if ``cache_samples`` is True).
+            Images that cannot be decoded are skipped, so batches containing corrupt images
+            (only possible when ``validate_images`` is False) will be smaller than ``batch_size``.
         """
-        for ii in range(0, self.max_samples, batch_size):
-            jj = min(ii + batch_size, self.max_samples)
-
-            if self._permutation is None:
-                indices = list(range(ii, jj))
-            else:
-                indices = self._permutation[ii:jj].tolist()
-
-            # Create batch from data by reading from disk
-            sample_list = []
-            for img_path in self._samples[indices, ...]:
-                # Read image
-                img = cv2.imread(img_path)
-                # Convert BGR to RGB
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                # Resize
-                img = cv2.resize(img, (self.image_size[1], self.image_size[0]))
-                sample_list.append(img)
-
-            # Convert list of images to numpy array
-            samples_array: np.ndarray = np.array(sample_list)
-
+        batches = (self._iter_cached_batches(batch_size) if self._sample_cache is not None
+                   else self._iter_decoded_batches(batch_size))
+        for indices, samples_array in batches:
             builder = Batch.Builder(
                 fields={"samples": samples_array}
             )
@@ -18,13 +18,16 @@ import os
 import shutil
 import tempfile
 import unittest
-from typing import List, Tuple
+from unittest import mock
+from typing import Dict, Iterable, List, Tuple, cast
 import numpy as np
 from PIL import Image
 from pathlib import Path
 
 from deepview.base import Batch
 from deepview_data import CustomDatasets
+from deepview_data import _custom_datasets
+from deepview import _image_io
 from deepview._logging import _Logged
 
 
@@ -231,6 +234,27 @@ class TestImageFolderDataset(unittest.TestCase, _Logged):
             self.assertTrue(np.all(v >= 0))
             self.assertTrue(np.all(v <= 255))
 
+    def test_decoded_images(self) -> None:
+        """Test that images are decoded in RGB order, resized, and that every sample is produced once."""
+        image_size = (32, 48)
+        dataset = CustomDatasets.ImageFolderDataset(
+            root_folder=self.test_dir,
+            image_size=image_size,
+            num_workers=2
+        )
+        batches = list(dataset(batch_size=5))
+        self.assertEqual([batch.batch_size for batch in batches], [5, 5, 2])
+
+        identifiers: List[int] = []
+        for batch in batches:
+            samples = batch.fields["samples"]
+            self.assertEqual(samples.shape[1:], (32, 48, 3))
+            for sample, label in zip(samples, batch.metadata[Batch.StdKeys.LABELS]["label"]):
+                # Each class was written as a pure red, green or blue image
+                self.assertEqual(int(np.argmax(sample.mean(axis=(0, 1)))), self.classes.index(str(label)))
+            identifiers.extend(cast(List[int], batch.metadata[Batch.StdKeys.IDENTIFIER]))
+        self.assertEqual(sorted(identifiers), list(range(self.num_images)))
+
     def test_get_producer(self) -> None:
         """Test that get_producer returns a correctly configured TrainTestSplitProducer."""
         max_samples = 6
@@ -267,6 +291,40 @@ class TestImageFolderDataset(unittest.TestCase, _Logged):
         written_images = list(Path(expected_folder).rglob('*.png'))
         self.assertEqual(len(written_images), 3)  # Should have written 3 images for the batch
 
+    def test_write_to_folder_formats(self) -> None:
+        """Test writing images to folder as JPEG and as links to the original files."""
+        jpg_dataset = CustomDatasets.ImageFolderDataset(
+            root_folder=self.test_dir,
+            image_size=self.image_size,
+            write_to_folder=True,
+            write_format="jpg"
+        )
+        with mock.patch.object(_image_io, "write_image", wraps=_image_io.write_image) as write:
+            paths = [str(p) for batch in jpg_dataset(batch_size=5) for p in batch.metadata[Batch.StdKeys.IDENTIFIER]]
+            self.assertEqual(write.call_count, self.num_images)
+            # A second pass does not write anything
+            list(jpg_dataset(batch_size=5))
+            self.assertEqual(write.call_count, self.num_images)
+        self.assertTrue(all(p.endswith(".jpg") and os.path.isfile(p) for p in paths))
+        self.assertTrue(jpg_dataset.cleanup())
+
+        link_dataset = CustomDatasets.ImageFolderDataset(
+            root_folder=self.test_dir,
+            image_size=self.image_size,
+            write_to_folder=True,
+            write_format="link"
+        )
+        paths = [str(p) for batch in link_dataset(batch_size=5) for p in batch.metadata[Batch.StdKeys.IDENTIFIER]]
+        self.assertEqual(len(paths), self.num_images)
+        for p in paths:
+            self.assertTrue(os.path.islink(p))
+            self.assertTrue(os.path.realpath(p).startswith(os.path.realpath(self.test_dir)))
+        self.assertTrue(link_dataset.cleanup())
+
+        with self.assertRaises(ValueError):
+            CustomDatasets.ImageFolderDataset(root_folder=self.test_dir, image_size=self.image_size,
+                                              write_to_folder=True, write_format="gif")
+
     def test_metadata(self) -> None:
         """Test that metadata is set correctly after initialization."""
         dataset = CustomDatasets.ImageFolderDataset(
@@ -324,6 +382,138 @@ class TestImageFolderDataset(unittest.TestCase, _Logged):
         # Verify the corrupted file is handled gracefully
         self.assertEqual(len(dataset.raw_dataset[0][0]) + len(dataset.raw_dataset[1][0]), 12)  # Only valid images should be loaded
 
+    def test_skip_validation(self) -> None:
+        """Test that corrupt images are skipped at decode time when validation is disabled."""
+        corrupted_file = os.path.join(self.test_dir, "class1", "corrupted.png")
+        with open(corrupted_file, "wb") as f:
+            f.write(b"corrupted data")
+
+        dataset = CustomDatasets.ImageFolderDataset(
+            root_folder=self.test_dir,
+            image_size=self.image_size,
+            validate_images=False
+        )
+
+        # The corrupted file is not detected on construction...
+        self.assertEqual(len(dataset.raw_dataset[0][0]) + len(dataset.raw_dataset[1][0]), self.num_images + 1)
+
+        # ...but it is skipped when producing batches
+        batches = list(dataset(batch_size=5))
+        self.assertEqual(sum(batch.batch_size for batch in batches), self.num_images)
+        for batch in batches:
+            self.assertEqual(len(batch.metadata[Batch.StdKeys.LABELS]["label"]), batch.batch_size)
+
+    def test_no_file_signatures_without_manifest_or_cache(self) -> None:
+        """Test that files are only stat'ed when the manifest or the sample cache needs it."""
+        stat_counts: List[int] = []
+        file_signatures = _custom_datasets._file_signatures
+
+        def counting_file_signatures(paths: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+            signatures = file_signatures(paths)
+            stat_counts.append(len(signatures))
+            return signatures
+
+        with mock.patch.object(_custom_datasets, "_file_signatures", counting_file_signatures):
+            CustomDatasets.ImageFolderDataset(
+                root_folder=self.test_dir,
+                image_size=self.image_size,
+                validate_images=False
+            )
+            self.assertEqual(stat_counts, [])
+
+            # only the sampled files are stat'ed for the validation manifest
+            CustomDatasets.ImageFolderDataset(
+                root_folder=self.test_dir,
+                image_size=self.image_size,
+                max_samples=3,
+                cache_dir=self.test_dir
+            )
+            self.assertEqual(stat_counts, [3])
+
+    def test_validation_manifest_reused(self) -> None:
+        """Test that image verification results are cached across runs."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with mock.patch.object(_custom_datasets, "_verify_image",
+                                   wraps=_custom_datasets._verify_image) as verify:
+                CustomDatasets.ImageFolderDataset(root_folder=self.test_dir, image_size=self.image_size,
+                                                  cache_dir=cache_dir)
+                self.assertEqual(verify.call_count, self.num_images)
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+                # Nothing changed, so nothing has to be verified again
+                verify.reset_mock()
+                dataset = CustomDatasets.ImageFolderDataset(root_folder=self.test_dir,
+                                                            image_size=self.image_size,
+                                                            cache_dir=cache_dir)
+                self.assertEqual(verify.call_count, 0)
+                self.assertEqual(len(dataset.raw_dataset[0][0]) + len(dataset.raw_dataset[1][0]), self.num_images)
+
+                # Adding a corrupt file only verifies that file
+                verify.reset_mock()
+                with open(os.path.join(self.test_dir, "class1", "corrupted.png"), "wb") as f:
+                    f.write(b"corrupted data")
+                dataset = CustomDatasets.ImageFolderDataset(root_folder=self.test_dir,
+                                                            image_size=self.image_size,
+                                                            cache_dir=cache_dir)
+                self.assertEqual(verify.call_count, 1)
+                self.assertEqual(len(dataset.raw_dataset[0][0]) + len(dataset.raw_dataset[1][0]), self.num_images)
+
+                # An image corrupted in place under the same name is verified again, and dropped
+                verify.reset_mock()
+                with open(os.path.join(self.test_dir, "class2", self.test_images[0]), "wb") as f:
+                    f.write(b"corrupted data")
+                dataset = CustomDatasets.ImageFolderDataset(root_folder=self.test_dir,
+                                                            image_size=self.image_size,
+                                                            cache_dir=cache_dir)
+                self.assertEqual(verify.call_count, 1)
+                self.assertEqual(len(dataset.raw_dataset[0][0]) + len(dataset.raw_dataset[1][0]), self.num_images - 1)
+
+    def test_sample_cache(self) -> None:
+        """Test that resized samples are cached on disk and reused across runs."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dataset = CustomDatasets.ImageFolderDataset(root_folder=self.test_dir, image_size=(16, 16),
+                                                        cache_samples=True, cache_dir=cache_dir)
+            first_run = list(dataset(batch_size=5))
+
+            with mock.patch.object(_custom_datasets, "_decode_image_into") as decode:
+                cached_dataset = CustomDatasets.ImageFolderDataset(root_folder=self.test_dir, image_size=(16, 16),
+                                                                   cache_samples=True, cache_dir=cache_dir)
+                second_run = list(cached_dataset(batch_size=5))
+                cached_dataset.shuffle()
+                shuffled_run = list(cached_dataset(batch_size=5))
+                decode.assert_not_called()
+
+            # The same split and the same samples are produced
+            self.assertEqual(cached_dataset.raw_dataset[0][0].tolist(), dataset.raw_dataset[0][0].tolist())
+            for first, second in zip(first_run, second_run):
+                np.testing.assert_array_equal(first.fields["samples"], second.fields["samples"])
+                np.testing.assert_array_equal(first.metadata[Batch.StdKeys.LABELS]["label"],
+                                              second.metadata[Batch.StdKeys.LABELS]["label"])
+
+            # Shuffled batches gather the same samples from the cache
+            samples_by_id = {
+                identifier: sample
+                for batch in first_run
+                for identifier, sample in zip(batch.metadata[Batch.StdKeys.IDENTIFIER], batch.fields["samples"])
+            }
+            for batch in shuffled_run:
+                for identifier, sample in zip(batch.metadata[Batch.StdKeys.IDENTIFIER], batch.fields["samples"]):
+                    np.testing.assert_array_equal(sample, samples_by_id[identifier])
+
+            # A different image size does not reuse the cache
+            CustomDatasets.ImageFolderDataset(root_folder=self.test_dir, image_size=(8, 8),
+                                              cache_samples=True, cache_dir=cache_dir)
+            self.assertEqual(len([f for f in os.listdir(cache_dir) if f.startswith("deepview-image-cache-")]), 2)
+
+            # Nor does an image replaced in place under the same name
+            img_path = os.path.join(self.test_dir, self.classes[0], self.test_images[0])
+            Image.fromarray(np.full((64, 64, 3), 128, dtype=np.uint8)).save(img_path, format="JPEG")  # type: ignore
+            stat = os.stat(img_path)
+            os.utime(img_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            CustomDatasets.ImageFolderDataset(root_folder=self.test_dir, image_size=(16, 16),
+                                              cache_samples=True, cache_dir=cache_dir)
+            self.assertEqual(len([f for f in os.listdir(cache_dir) if f.startswith("deepview-image-cache-")]), 3)
+
     def test_train_split_with_invalid_ratio(self) -> None:
         """Test train split with invalid ratio."""
         # Test with train_split > 1
@@ -0,0 +1,90 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2021 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import onnx
+
+import deepview.typing as dt
+import deepview.typing._types as t
+from deepview.base import Model
+from ._onnx_model import _OnnxModelDetails
+
+
+def load_onnx_model_from_memory(model: t.Union[onnx.ModelProto, bytes], *,
+                                intra_op_num_threads: t.Optional[int] = None,
+                                inter_op_num_threads: t.Optional[int] = None) -> Model:
+    """
+    Initialize an ONNX :class:`Model <deepview.base.Model>` from a model loaded in ``memory``.
+
+    Inference runs on CPU with ONNX Runtime, and every node output of the graph is available
+    as a response.
+
+    Args:
+        model: The ONNX model, either as an ``onnx.ModelProto`` or serialized to bytes.
+        intra_op_num_threads: **[optional]** number of threads used to parallelize the execution
+            within nodes. If ``None`` (the default), ONNX Runtime picks it.
+        inter_op_num_threads: **[optional]** number of threads used to parallelize the execution
+            of the graph. If ``None`` (the default), ONNX Runtime picks it.
+
+    Returns:
+        An ONNX :class:`Model <deepview.base.Model>`.
+    """
+    if isinstance(model, bytes):
+        model = onnx.load_model_from_string(model)
+    return Model(_OnnxModelDetails(
+        model=model,
+        intra_op_num_threads=intra_op_num_threads,
+        inter_op_num_threads=inter_op_num_threads
+    ))
+
+
+def load_onnx_model_from_path(path: dt.PathOrStr, *,
+                              intra_op_num_threads: t.Optional[int] = None,
+                              inter_op_num_threads: t.Optional[int] = None) -> Model:
+    """
+    Initialize an ONNX :class:`Model <deepview.base.Model>` from a model serialized in ``path``.
+
+    Args:
+        path: Path of the ``.onnx`` model file (external data files are loaded from the same directory).
+        intra_op_num_threads: **[optional]** see :func:`load_onnx_model_from_memory`
+        inter_op_num_threads: **[optional]** see :func:`load_onnx_model_from_memory`
+
+    Returns:
+        An ONNX :class:`Model <deepview.base.Model>`.
+    """
+    path = dt.resolve_path_or_str(path)
+    return load_onnx_model_from_memory(
+        onnx.load(str(path)),
+        intra_op_num_threads=intra_op_num_threads,
+        inter_op_num_threads=inter_op_num_threads
+    )
@@ -0,0 +1,300 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2021 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from dataclasses import dataclass, field
+import logging
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+
+import deepview.typing._types as t
+from deepview.base import ResponseInfo
+from deepview.base._model import _ModelDetails
+
+
+_logger = logging.getLogger("deepview_onnx")
+
+
+_KNOWN_OPS: t.Final[t.Mapping[str, ResponseInfo.LayerKind]] = {
+    "Gemm": ResponseInfo.LayerKind.DENSE,
+    "MatMul": ResponseInfo.LayerKind.DENSE,
+    "BatchNormalization": ResponseInfo.LayerKind.BATCH_NORM,
+    "LayerNormalization": ResponseInfo.LayerKind.LAYER_NORM,
+    "Dropout": ResponseInfo.LayerKind.DROPOUT,
+    "RNN": ResponseInfo.LayerKind.RNN,
+    "LSTM": ResponseInfo.LayerKind.LSTM,
+    "GRU": ResponseInfo.LayerKind.GRU,
+    "Sigmoid": ResponseInfo.LayerKind.SIGMOID,
+    "Tanh": ResponseInfo.LayerKind.TANH,
+    "Relu": ResponseInfo.LayerKind.RELU,
+    "LeakyRelu": ResponseInfo.LayerKind.LEAKY_RELU,
+    "PRelu": ResponseInfo.LayerKind.PRELU,
+    "Elu": ResponseInfo.LayerKind.ELU,
+    "Softmax": ResponseInfo.LayerKind.SOFTMAX,
+    "Attention": ResponseInfo.LayerKind.ATTENTION,
+}
+
+# Operations whose kind depends on the number of spatial dimensions of their output (1D, 2D, 3D)
+_SPATIAL_OPS: t.Final[t.Mapping[str, t.Tuple[ResponseInfo.LayerKind, ...]]] = {
+    "Conv": (
+        ResponseInfo.LayerKind.CONV_1D,
+        ResponseInfo.LayerKind.CONV_2D,
+        ResponseInfo.LayerKind.CONV_3D,
+    ),
+    "ConvTranspose": (
+        ResponseInfo.LayerKind.CONV_TRANSPOSE_1D,
+        ResponseInfo.LayerKind.CONV_TRANSPOSE_2D,
+        ResponseInfo.LayerKind.CONV_TRANSPOSE_3D,
+    ),
+    "MaxPool": (
+        ResponseInfo.LayerKind.MAX_POOLING_1D,
+        ResponseInfo.LayerKind.MAX_POOLING_2D,
+        ResponseInfo.LayerKind.MAX_POOLING_3D,
+    ),
+    "GlobalMaxPool": (
+        ResponseInfo.LayerKind.MAX_POOLING_1D,
+        ResponseInfo.LayerKind.MAX_POOLING_2D,
+        ResponseInfo.LayerKind.MAX_POOLING_3D,
+    ),
+    "AveragePool": (
+        ResponseInfo.LayerKind.AVERAGE_POOLING_1D,
+        ResponseInfo.LayerKind.AVERAGE_POOLING_2D,
+        ResponseInfo.LayerKind.AVERAGE_POOLING_3D,
+    ),
+    "GlobalAveragePool": (
+        ResponseInfo.LayerKind.AVERAGE_POOLING_1D,
+        ResponseInfo.LayerKind.AVERAGE_POOLING_2D,
+        ResponseInfo.LayerKind.AVERAGE_POOLING_3D,
+    ),
+}
+
+
+def _convert_onnx_shape(type_proto: onnx.TypeProto) -> t.Tuple[t.Optional[int], ...]:
+    if not type_proto.tensor_type.HasField("shape"):
+        return tuple()
+    return tuple(
+        dim.dim_value if dim.HasField("dim_value") else None
+        for dim in type_proto.tensor_type.shape.dim
+    )
+
+
+def _convert_onnx_dtype(type_proto: onnx.TypeProto) -> np.dtype:
+    elem_type = type_proto.tensor_type.elem_type
+    if elem_type == onnx.TensorProto.UNDEFINED:
+        return np.dtype(object)
+    return np.dtype(onnx.helper.tensor_dtype_to_np_dtype(elem_type))
+
+
+def _convert_onnx_operation(op_type: str, shape: t.Tuple[t.Optional[int], ...]) -> ResponseInfo.LayerKind:
+    if op_type in _KNOWN_OPS:
+        return _KNOWN_OPS[op_type]
+
+    # spatial operations have (batch, channels, *spatial) outputs
+    spatial_dims = len(shape) - 2
+    if op_type in _SPATIAL_OPS and 1 <= spatial_dims <= 3:
+        return _SPATIAL_OPS[op_type][spatial_dims - 1]
+
+    # Otherwise, layer is unknown
+    return ResponseInfo.LayerKind.UNKNOWN
+
+
+@t.final
+@dataclass
+class _OnnxModelDetails(_ModelDetails):
+    """
+    Class wrapping an ONNX model so that it can be seamlessly used in DeepView.
+
+    Inference runs with ONNX Runtime on CPU. Every node output of the graph is exposed as a
+    response. For each set of requested responses, an ``InferenceSession`` is created (only once)
+    for a copy of the model whose graph outputs are exactly the requested responses, so ONNX Runtime
+    only runs the nodes needed to compute them. Inputs and outputs are bound to NumPy buffers with
+    IO binding, to avoid copying them in and out of the session.
+    """
+
+    model: onnx.ModelProto = field(repr=False)
+
+    intra_op_num_threads: t.Optional[int] = None
+    """Number of threads used to parallelize the execution within nodes (ONNX Runtime default if ``None``)."""
+
+    inter_op_num_threads: t.Optional[int] = None
+    """Number of threads used to parallelize the execution of the graph (ONNX Runtime default if ``None``)."""
+
+    _response_infos: t.Dict[str, ResponseInfo] = field(init=False, repr=False, default_factory=dict)
+    _input_names: t.List[str] = field(init=False, repr=False, default_factory=list)
+    _value_infos: t.Dict[str, onnx.ValueInfoProto] = field(init=False, repr=False, default_factory=dict)
+
+    _batched_shapes: t.Dict[str, t.Tuple[int, ...]] = field(init=False, repr=False, default_factory=dict)
+    """Shape (without the batch dimension) of the responses whose output buffers can be preallocated."""
+
+    _sessions: t.Dict[t.FrozenSet[str], ort.InferenceSession] = field(init=False, repr=False, default_factory=dict)
+    """Inference sessions, by set of requested responses (excluding model inputs)."""
+
+    def __post_init__(self) -> None:
+        _logger.info("Instantiating ONNX Model")
+        # Shapes and types of the intermediate tensors are only known after shape inference
+        graph = onnx.shape_inference.infer_shapes(self.model).graph
+
+        self._value_infos = {
+            value_info.name: value_info
+            for value_info in [*graph.input, *graph.value_info, *graph.output]
+        }
+
+        initializers = {initializer.name for initializer in graph.initializer}
+        for graph_input in graph.input:
+            if graph_input.name in initializers:
+                continue
+            self._input_names.append(graph_input.name)
+            self._response_infos[graph_input.name] = ResponseInfo(
+                name=graph_input.name,
+                dtype=_convert_onnx_dtype(graph_input.type),
+                shape=_convert_onnx_shape(graph_input.type),
+                layer=ResponseInfo.Layer(
+                    name=graph_input.name,
+                    kind=ResponseInfo.LayerKind.PLACEHOLDER,
+                    typename="Input"
+                )
+            )
+
+        # The symbolic leading dimensions of the inputs, i.e. the batch dimension
+        batch_dims = {
+            graph_input.type.tensor_type.shape.dim[0].dim_param
+            for graph_input in graph.input
+            if graph_input.name in self._input_names and graph_input.type.tensor_type.shape.dim
+        } - {""}
+
+        for node in graph.node:
+            for output_name in node.output:
+                # optional outputs that are not produced have an empty name
+                if not output_name:
+                    continue
+                type_proto = (
+                    self._value_infos[output_name].type
+                    if output_name in self._value_infos
+                    else onnx.TypeProto()
+                )
+                shape = _convert_onnx_shape(type_proto)
+                dims = type_proto.tensor_type.shape.dim
+                if dims and dims[0].dim_param in batch_dims and all(dim is not None for dim in shape[1:]):
+                    self._batched_shapes[output_name] = t.cast(t.Tuple[int, ...], shape[1:])
+                self._response_infos[output_name] = ResponseInfo(
+                    name=output_name,
+                    dtype=_convert_onnx_dtype(type_proto),
+                    shape=shape,
+                    layer=ResponseInfo.Layer(
+                        name=node.name or output_name,
+                        kind=_convert_onnx_operation(node.op_type, shape),
+                        typename=node.op_type
+                    )
+                )
+
+    def get_response_infos(self) -> t.Iterable[ResponseInfo]:
+        return self._response_infos.values()
+
+    def get_input_layer_responses(self) -> t.Sequence[ResponseInfo]:
+        """
+        Get the graph inputs of the ONNX model (excluding initializers).
+        """
+        return [self._response_infos[name] for name in self._input_names]
+
+    def _get_session(self, outputs: t.FrozenSet[str]) -> ort.InferenceSession:
+        """
+        Get an inference session for a copy of the model whose graph outputs are ``outputs``.
+
+        Creating a session is expensive, so it is only done once per set of ``outputs``.
+        """
+        if outputs not in self._sessions:
+            inference_model = onnx.ModelProto()
+            inference_model.CopyFrom(self.model)
+            del inference_model.graph.output[:]
+            inference_model.graph.output.extend(
+                self._value_infos[name] if name in self._value_infos
+                else onnx.helper.make_empty_tensor_value_info(name)
+                for name in sorted(outputs)
+            )
+
+            options = ort.SessionOptions()
+            if self.intra_op_num_threads is not None:
+                options.intra_op_num_threads = self.intra_op_num_threads
+            if self.inter_op_num_threads is not None:
+                options.inter_op_num_threads = self.inter_op_num_threads
+
+            self._sessions[outputs] = ort.InferenceSession(
+                inference_model.SerializeToString(),
+                sess_options=options,
+                providers=["CPUExecutionProvider"]
+            )
+        return self._sessions[outputs]
+
+    def run_inference(self,
+                      inputs: t.Mapping[str, np.ndarray],
+                      outputs: t.AbstractSet[str]) -> t.Mapping[str, np.ndarray]:
+        for input_name in inputs.keys():
+            if input_name not in self._input_names:
+                raise TypeError(
+                    f'Invalid input "{input_name}". Valid inputs are {self._input_names}.')
+        for output_name in outputs:
+            if output_name not in self._response_infos:
+                raise TypeError(
+                    f'Invalid response "{output_name}". Valid responses are {list(self._response_infos)}.')
+
+        # Model inputs are not computed by the graph, they are returned as they are
+        results = {name: inputs[name] for name in outputs if name in inputs}
+        session_outputs = frozenset(outputs) - frozenset(self._input_names)
+        if not session_outputs:
+            return results
+
+        session = self._get_session(session_outputs)
+        binding = session.io_binding()
+        batch_size = len(next(iter(inputs.values())))
+        for name, array in inputs.items():
+            # no-op if the array is already contiguous and of the expected type
+            binding.bind_cpu_input(name, np.ascontiguousarray(array, dtype=self._response_infos[name].dtype))
+
+        # ONNX Runtime writes responses of known shape directly into NumPy arrays,
+        #    the others are allocated by ONNX Runtime and copied out after inference
+        preallocated = {}
+        for name in sorted(session_outputs):
+            if name in self._batched_shapes:
+                buffer = np.empty((batch_size,) + self._batched_shapes[name], self._response_infos[name].dtype)
+                binding.bind_output(name, "cpu", 0, buffer.dtype, buffer.shape, buffer.ctypes.data)
+                preallocated[name] = buffer
+            else:
+                binding.bind_output(name, "cpu")
+        session.run_with_iobinding(binding)
+
+        # outputs are returned in the order they were bound
+        for name, value in zip(sorted(session_outputs), binding.get_outputs()):
+            results[name] = preallocated[name] if name in preallocated else value.numpy()
+        return results
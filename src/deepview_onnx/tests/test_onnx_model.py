@@ -0,0 +1,155 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2021 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pathlib
+
+import numpy as np
+import onnx
+import onnx.helper as oh
+import pytest
+
+import deepview.typing._types as t
+import deepview_onnx
+from deepview.base import Batch, Model, ResponseInfo, pipeline
+from deepview_onnx._onnx_model import _OnnxModelDetails
+
+_INPUT_SHAPE = (3, 8, 8)
+
+
+@pytest.fixture(scope="module")
+def onnx_model() -> onnx.ModelProto:
+    """A small CNN: conv -> relu -> global average pooling -> flatten -> dense -> softmax."""
+    rng = np.random.default_rng(42)
+    initializers = [
+        onnx.numpy_helper.from_array(rng.normal(size=(4, 3, 3, 3)).astype(np.float32), "conv_w"),
+        onnx.numpy_helper.from_array(rng.normal(size=(4,)).astype(np.float32), "conv_b"),
+        onnx.numpy_helper.from_array(rng.normal(size=(4, 2)).astype(np.float32), "dense_w"),
+        onnx.numpy_helper.from_array(rng.normal(size=(2,)).astype(np.float32), "dense_b"),
+    ]
+    nodes = [
+        oh.make_node("Conv", ["images", "conv_w", "conv_b"], ["conv"], name="conv2d", pads=[1, 1, 1, 1]),
+        oh.make_node("Relu", ["conv"], ["relu"], name="relu"),
+        oh.make_node("GlobalAveragePool", ["relu"], ["pool"], name="pool"),
+        oh.make_node("Flatten", ["pool"], ["flat"], name="flatten"),
+        oh.make_node("Gemm", ["flat", "dense_w", "dense_b"], ["logits"], name="dense"),
+        oh.make_node("Softmax", ["logits"], ["probs"], name="softmax"),
+    ]
+    graph = oh.make_graph(
+        nodes, "small_cnn",
+        inputs=[oh.make_tensor_value_info("images", onnx.TensorProto.FLOAT, ["N", *_INPUT_SHAPE])],
+        outputs=[oh.make_tensor_value_info("probs", onnx.TensorProto.FLOAT, ["N", 2])],
+        initializer=initializers,
+    )
+    model = oh.make_model(graph, opset_imports=[oh.make_opsetid("", 13)], ir_version=8)
+    onnx.checker.check_model(model)
+    return model
+
+
+def _images(n: int) -> np.ndarray:
+    return np.random.default_rng(0).random((n, *_INPUT_SHAPE), dtype=np.float32)
+
+
+def test_response_infos(onnx_model: onnx.ModelProto) -> None:
+    model = deepview_onnx.load_onnx_model_from_memory(onnx_model)
+    assert list(model.input_layers) == ["images"]
+    assert list(model.response_infos) == ["images", "conv", "relu", "pool", "flat", "logits", "probs"]
+
+    kinds = {name: info.layer.kind for name, info in model.response_infos.items()}
+    assert kinds["images"] is ResponseInfo.LayerKind.PLACEHOLDER
+    assert kinds["conv"] is ResponseInfo.LayerKind.CONV_2D
+    assert kinds["relu"] is ResponseInfo.LayerKind.RELU
+    assert kinds["pool"] is ResponseInfo.LayerKind.AVERAGE_POOLING_2D
+    assert kinds["flat"] is ResponseInfo.LayerKind.UNKNOWN
+    assert kinds["logits"] is ResponseInfo.LayerKind.DENSE
+    assert kinds["probs"] is ResponseInfo.LayerKind.SOFTMAX
+
+    assert model.response_infos["conv"].layer.name == "conv2d"
+    assert model.response_infos["conv"].layer.typename == "Conv"
+    assert model.response_infos["conv"].shape == (None, 4, 8, 8)
+    assert model.response_infos["logits"].shape == (None, 2)
+    assert model.response_infos["logits"].dtype == np.float32
+
+
+def test_intermediate_responses(onnx_model: onnx.ModelProto) -> None:
+    model = deepview_onnx.load_onnx_model_from_memory(onnx_model.SerializeToString(), intra_op_num_threads=1)
+    images = _images(5)
+    results = model._details.run_inference({"images": images}, {"conv", "relu", "pool", "logits", "probs"})
+
+    assert results["conv"].shape == (5, 4, 8, 8)
+    np.testing.assert_allclose(results["relu"], np.maximum(results["conv"], 0))
+    np.testing.assert_allclose(results["pool"][:, :, 0, 0], results["relu"].mean(axis=(2, 3)), rtol=1e-5)
+    exp = np.exp(results["logits"] - results["logits"].max(axis=1, keepdims=True))
+    np.testing.assert_allclose(results["probs"], exp / exp.sum(axis=1, keepdims=True), rtol=1e-5)
+
+    # Model inputs can be requested as responses too
+    only_input = model._details.run_inference({"images": images}, {"images"})
+    assert only_input["images"] is images
+
+    with pytest.raises(TypeError):
+        model._details.run_inference({"pixels": images}, {"conv"})
+
+
+def test_session_is_reused(onnx_model: onnx.ModelProto) -> None:
+    model = deepview_onnx.load_onnx_model_from_memory(onnx_model)
+    details = t.cast(_OnnxModelDetails, model._details)
+    images = _images(4)
+
+    first = details.run_inference({"images": images}, {"conv", "logits"})
+    second = details.run_inference({"images": images[:3]}, {"logits", "conv"})
+    assert len(details._sessions) == 1
+    np.testing.assert_allclose(second["logits"], first["logits"][:3], rtol=1e-5)
+
+    # Another set of responses creates another session, which only computes what it needs
+    details.run_inference({"images": images}, {"conv"})
+    assert len(details._sessions) == 2
+    assert [output.name for output in details._sessions[frozenset({"conv"})].get_outputs()] == ["conv"]
+
+
+def test_pipeline(onnx_model: onnx.ModelProto, tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "model.onnx"
+    onnx.save(onnx_model, str(path))
+    model = deepview_onnx.load_onnx_model_from_path(path, intra_op_num_threads=1, inter_op_num_threads=1)
+    assert isinstance(model, Model)
+    images = _images(23)
+
+    def producer(batch_size: int) -> t.Iterable[Batch]:
+        for start in range(0, len(images), batch_size):
+            # The input field is renamed automatically, and float64 data is cast to float32
+            yield Batch({"data": images[start:start + batch_size].astype(np.float64)})
+
+    batches = list(pipeline(producer, model(["pool", "probs"]))(batch_size=10))
+    assert [batch.batch_size for batch in batches] == [10, 10, 3]
+    assert all(set(batch.fields) == {"pool", "probs"} for batch in batches)
+    expected = model._details.run_inference({"images": images}, {"probs"})["probs"]
+    np.testing.assert_allclose(np.concatenate([batch.fields["probs"] for batch in batches]), expected, rtol=1e-5)
@@ -49,7 +49,11 @@ class _KerasDatasetLoader(TrainTestSplitProducer):
                  split_dataset: t.Optional[dt.TrainTestSplitType] = None,
                  attach_metadata: bool = True,
                  max_samples: int = -1,
-                 write_to_folder: bool = False) -> None:
+                 write_to_folder: bool = False,
+                 write_format: str = "png",
+                 write_quality: t.Optional[int] = None,
+                 num_workers: t.Optional[int] = None,
+                 **kwargs: t.Any) -> None:
         # Load the dataset:
         if split_dataset is None:
             split_dataset = self.load_dataset()
@@ -57,7 +61,11 @@ class _KerasDatasetLoader(TrainTestSplitProducer):
             split_dataset=split_dataset,
             attach_metadata=attach_metadata,
             max_samples=max_samples,
-            write_to_folder=write_to_folder
+            write_to_folder=write_to_folder,
+            write_format=write_format,
+            write_quality=write_quality,
+            num_workers=num_workers,
+            **kwargs
         )
 
     @staticmethod
@@ -195,7 +203,12 @@ class CIFAR100(_KerasDatasetWithStrLabels):
         split_dataset: t.Optional[dt.TrainTestSplitType] = None,
         attach_metadata: bool = True,
         max_samples: int = -1,
-        label_mode: str = "fine"
+        label_mode: str = "fine",
+        write_to_folder: bool = False,
+        write_format: str = "png",
+        write_quality: t.Optional[int] = None,
+        num_workers: t.Optional[int] = None,
+        **kwargs: t.Any
     ) -> None:
         self.label_mode = label_mode
         if split_dataset is None:
@@ -203,7 +216,12 @@ class CIFAR100(_KerasDatasetWithStrLabels):
         super().__init__(
             split_dataset=split_dataset,
             attach_metadata=attach_metadata,
-            max_samples=max_samples
+            max_samples=max_samples,
+            write_to_folder=write_to_folder,
+            write_format=write_format,
+            write_quality=write_quality,
+            num_workers=num_workers,
+            **kwargs
         )
 
     @staticmethod
@@ -44,7 +44,9 @@ from ._tf2_loading import load_tf_2_model_from_memory as tf_memory_load  # type:
 from ._tf2_loading import load_tf_2_model_from_path as tf_path_load  # type: ignore
 
 
-def load_tf_model_from_memory(*, model: t.Optional[tf.keras.models.Model] = None) -> Model:
+def load_tf_model_from_memory(*, model: t.Optional[tf.keras.models.Model] = None,
+                              compiled_inference: bool = False,
+                              jit_compile: bool = False) -> Model:
     """
     Initialize a TensorFlow :class:`Model <deepview.base.Model>` from a model loaded in ``memory``.
     This function is supported for TF2, but different parameters are required.
@@ -52,16 +54,23 @@ def load_tf_model_from_memory(*, model: t.Optional[tf.keras.models.Model] = None
 
     Args:
         model: Pass only this parameter when running TensorFlow 2. This is the TF Keras model.
+        compiled_inference: **[optional]** run inference in a :func:`tf.function` with a fixed input
+            signature, instead of eagerly. The first batch sets the batch size of the signature and
+            smaller batches are padded, so the function is only traced once.
+        jit_compile: **[optional]** also compile inference with XLA (implies ``compiled_inference``).
+            This is usually much faster for convolutional networks on CPU.
 
     Returns:
         A TensorFlow :class:`Model <deepview.base.Model>`.
     """
     if model is None:
         raise ValueError('For TF2 (currently installed), please pass param `model`')
-    return tf_memory_load(model)
+    return tf_memory_load(model, compiled_inference=compiled_inference, jit_compile=jit_compile)
 
 
-def load_tf_model_from_path(path: dt.PathOrStr) -> Model:
+def load_tf_model_from_path(path: dt.PathOrStr, *,
+                            compiled_inference: bool = False,
+                            jit_compile: bool = False) -> Model:
     """
     Initialize a TensorFlow :class:`Model <deepview.base.Model>` from a model serialized in ``path``
 
@@ -80,8 +89,10 @@ def load_tf_model_from_path(path: dt.PathOrStr) -> Model:
 
     Args:
         path: Model path (for single model file) or directory that contains all the model files.
+        compiled_inference: **[optional]** see :func:`load_tf_model_from_memory`
+        jit_compile: **[optional]** see :func:`load_tf_model_from_memory`
 
     Returns:
         A DeepView TensorFlow :class:`Model <deepview.base.Model>`.
     """
-    return tf_path_load(path)
+    return tf_path_load(path, compiled_inference=compiled_inference, jit_compile=jit_compile)
@@ -32,6 +32,8 @@
 # limitations under the License.
 #
 
+import dataclasses
+
 import tensorflow as tf
 
 from deepview.base import Model
@@ -54,20 +56,26 @@ TF2LoadingChain = LoadingChain(
 )
 
 
-def load_tf_2_model_from_memory(model: tf.keras.models.Model) -> Model:
+def load_tf_2_model_from_memory(model: tf.keras.models.Model,
+                                compiled_inference: bool = False,
+                                jit_compile: bool = False) -> Model:
     """
     Initialize a TensorFlow :class:`Model` from a model loaded in ``memory``
 
     Args:
         model: The TensorFlow Keras model
+        compiled_inference: **[optional]** run inference in a :func:`tf.function` with a fixed input signature
+        jit_compile: **[optional]** compile inference with XLA (implies ``compiled_inference``)
 
     Returns:
         A TensorFlow :class:`Model`.
     """
-    return Model(_Tensorflow2ModelDetails(model=model))
+    return Model(_Tensorflow2ModelDetails(model=model, compiled_inference=compiled_inference, jit_compile=jit_compile))
 
 
-def load_tf_2_model_from_path(path: dt.PathOrStr) -> Model:
+def load_tf_2_model_from_path(path: dt.PathOrStr,
+                              compiled_inference: bool = False,
+                              jit_compile: bool = False) -> Model:
     """
     Initialize a TensorFlow :class:`Model` from a model serialized in ``path``
 
@@ -79,6 +87,8 @@ def load_tf_2_model_from_path(path: dt.PathOrStr) -> Model:
 
     Args:
         path: Model path (for single model file) or directory that contains all the model files.
+        compiled_inference: **[optional]** run inference in a :func:`tf.function` with a fixed input signature
+        jit_compile: **[optional]** compile inference with XLA (implies ``compiled_inference``)
 
     Returns:
         A DeepView TensorFlow :class:`Model`.
@@ -89,4 +99,6 @@ def load_tf_2_model_from_path(path: dt.PathOrStr) -> Model:
     tf.keras.backend.clear_session()
 
     loader = TF2LoadingChain.get_loader(path)
-    return Model(loader.load(pathname=path))
+    details = loader.load(pathname=path)
+    assert isinstance(details, _Tensorflow2ModelDetails)
+    return Model(dataclasses.replace(details, compiled_inference=compiled_inference, jit_compile=jit_compile))
@@ -32,7 +32,7 @@
 # limitations under the License.
 #
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 
 import tensorflow as tf
@@ -105,10 +105,34 @@ def _convert_tf_operation(layer_name: str) -> ResponseInfo.LayerKind:
 @t.final
 @dataclass
 class _Tensorflow2ModelDetails(_ModelDetails):
-    """Class wrapping a Tensorflow 2 model so that it can be seamlessly used in DeepView."""
+    """
+    Class wrapping a Tensorflow 2 model so that it can be seamlessly used in DeepView.
+
+    If ``compiled_inference`` is True, inference runs in a :func:`tf.function` with a fixed
+    input signature. Its batch size is the size of the largest batch seen so far for a set of
+    requested responses: smaller batches (e.g. the last one) are zero-padded, and the function is
+    only traced again when a larger batch comes in. ``jit_compile`` additionally compiles the
+    function with XLA (and implies ``compiled_inference``).
+    """
 
     model: tf.keras.models.Model
 
+    compiled_inference: bool = False
+    """Run inference in a :func:`tf.function` with a fixed input signature."""
+
+    jit_compile: bool = False
+    """Compile the inference function with XLA. Implies :attr:`compiled_inference`."""
+
+    _inference_models: t.Dict[t.FrozenSet[str], t.Tuple[t.Tuple[str, ...], tf.keras.Model]] = field(
+        init=False, repr=False, default_factory=dict)
+    """Inference sub-models (and the order of their outputs), by set of requested responses."""
+
+    _compiled_functions: t.Dict[t.FrozenSet[str], t.Tuple[t.List[tf.TensorSpec], t.Callable[..., t.List[tf.Tensor]]]] = field(
+        init=False, repr=False, default_factory=dict)
+    """Compiled inference functions (and their input signature), by set of requested responses."""
+
+    _input_layer_names: t.Optional[t.List[str]] = field(init=False, repr=False, default=None)
+
     def __post_init__(self) -> None:
         _logger.info("Instantiating TF2 Model")
         _logger.info(f"GPUs Available: {len(tf.config.list_physical_devices('GPU'))}")
@@ -138,26 +162,80 @@ class _Tensorflow2ModelDetails(_ModelDetails):
             and 'input' in info.name
         ]
 
+    def _get_inference_model(self, outputs: t.AbstractSet[str]) -> t.Tuple[t.Tuple[str, ...], tf.keras.Model]:
+        """
+        Get a model object that takes in the same input as the original model, but reads the
+        output of specific layers only (not just model output), along with the order of its outputs.
+        The sub-model only contains the layers the requested outputs depend on, so layers after
+        them are never evaluated.
+
+        Building the sub-model is expensive, so it is only done once per set of ``outputs``.
+        """
+        key = frozenset(outputs)
+        if key not in self._inference_models:
+            self.model.trainable = False
+            output_names = tuple(outputs)
+            inference_model = tf.keras.Model(
+                inputs=[self.model.input],
+                outputs=[
+                    self.model.get_layer(layer_name).output
+                    for layer_name in output_names
+                ]
+            )
+            self._inference_models[key] = (output_names, inference_model)
+        return self._inference_models[key]
+
+    def _run_compiled_inference(self,
+                                inputs: t.Sequence[np.ndarray],
+                                outputs: t.AbstractSet[str]) -> t.Mapping[str, np.ndarray]:
+        output_names, inference_model = self._get_inference_model(outputs)
+        key = frozenset(outputs)
+        n_samples = len(inputs[0])
+        if key not in self._compiled_functions or n_samples > self._compiled_functions[key][0][0].shape[0]:
+            # The signature has the size of the largest batch so far, so no batch is ever split
+            signature = [
+                tf.TensorSpec((n_samples,) + tuple(tensor.shape[1:]), tensor.dtype)
+                for tensor in self.model.inputs
+            ]
+
+            def inference_function(*tensors: tf.Tensor) -> t.List[tf.Tensor]:
+                return tf.nest.flatten(inference_model(list(tensors), training=False))
+
+            self._compiled_functions[key] = (
+                signature,
+                tf.function(inference_function, input_signature=signature, jit_compile=self.jit_compile)
+            )
+        signature, compiled_function = self._compiled_functions[key]
+
+        signature_batch_size = signature[0].shape[0]
+        batch = [np.asarray(array, dtype=spec.dtype.as_numpy_dtype) for array, spec in zip(inputs, signature)]
+        if n_samples < signature_batch_size:
+            # Pad smaller batches so the function is not traced again for a new shape
+            batch = [
+                np.concatenate([array, np.zeros((signature_batch_size - n_samples,) + array.shape[1:], array.dtype)])
+                for array in batch
+            ]
+        return {
+            response_name: tensor.numpy()[:n_samples]
+            for response_name, tensor in zip(output_names, compiled_function(*batch))
+        }
+
     def run_inference(self,
                       inputs: t.Mapping[str, np.ndarray],
                       outputs: t.AbstractSet[str]) -> t.Mapping[str, np.ndarray]:
-        self.model.trainable = False
-
-        # Create a model object that takes in the same input as the original model, but
-        #    reads the output of specific layers only (not just model output)
-        inference_model = tf.keras.Model(
-            inputs=[self.model.input],
-            outputs=[
-                self.model.get_layer(layer_name).output
-                for layer_name in outputs
-            ]
-        )
-        possible_inputs = [input_layer.name for input_layer in self.get_input_layer_responses()]
+        output_names, inference_model = self._get_inference_model(outputs)
+
+        if self._input_layer_names is None:
+            self._input_layer_names = [input_layer.name for input_layer in self.get_input_layer_responses()]
+        possible_inputs = self._input_layer_names
         for input_name in inputs.keys():
             if input_name not in possible_inputs:
                 raise TypeError(
                     f'Invalid input "{input_name}". Valid inputs are {possible_inputs}.')
 
+        if self.compiled_inference or self.jit_compile:
+            return self._run_compiled_inference(list(inputs.values()), outputs)
+
         results = inference_model(list(inputs.values()))
 
         # Inference on a single data sample collapses the batch dimension in the result, but
@@ -165,16 +243,16 @@ class _Tensorflow2ModelDetails(_ModelDetails):
         if inputs[possible_inputs[0]].shape[0] == 1:
             r_val = {
                 response_name: np.expand_dims(tensor.numpy(), axis=0)
-                for response_name, tensor in zip(outputs, results)
+                for response_name, tensor in zip(output_names, results)
             }
             return r_val
 
         # Otherwise, if only one response is needed, then there is only one result
-        if len(outputs) == 1:
-            return {list(outputs)[0]: results.numpy()}
+        if len(output_names) == 1:
+            return {output_names[0]: results.numpy()}
 
         # Otherwise, there are multiple data samples, so just return tensors as-is (has batch dim)
         return {
             response_name: tensor.numpy()
-            for response_name, tensor in zip(outputs, results)
+            for response_name, tensor in zip(output_names, results)
         }
@@ -33,6 +33,7 @@
 #
 
 import pathlib
+import time
 
 import pytest
 import tensorflow as tf
@@ -43,6 +44,7 @@ from deepview.base._model import _ModelPipelineStage, _ModelDetails
 from deepview.processors import FieldRenamer
 from deepview.samples import StubImageDataset
 from deepview_tensorflow import load_tf_model_from_path
+from deepview_tensorflow._tensorflow._tf2_model import _Tensorflow2ModelDetails
 from deepview_tensorflow.samples import get_simple_cnn_model
 import deepview.typing as dt
 import deepview.typing._types as t
@@ -217,3 +219,145 @@ def test_auto_field_renamer(model_path: pathlib.Path) -> None:
         for response_batch in response_producer(batch_size=10):
             break
     assert "Field names must match expected input names to perform inference" in str(excinfo2.value)
+
+
+def _conv_responses(model: Model) -> t.List[str]:
+    return [info.name for info in model.response_infos.values() if info.layer.kind is ResponseInfo.LayerKind.CONV_2D]
+
+
+def test_inference_model_is_reused(model_path: pathlib.Path) -> None:
+    model = load_tf_model_from_path(model_path)
+    details = t.cast(_Tensorflow2ModelDetails, model._details)
+    input_layer_name = list(model.input_layers.keys())[0]
+    images = np.random.rand(4, 32, 32, 3).astype(np.float32)
+    requested_responses = _conv_responses(model)
+
+    first = details.run_inference({input_layer_name: images}, set(requested_responses))
+    second = details.run_inference({input_layer_name: images}, set(reversed(requested_responses)))
+    assert len(details._inference_models) == 1
+    for name in requested_responses:
+        np.testing.assert_allclose(first[name], second[name], rtol=1e-5)
+
+    # Another set of responses builds another sub-model
+    only_first = details.run_inference({input_layer_name: images}, {requested_responses[0]})
+    assert len(details._inference_models) == 2
+    np.testing.assert_allclose(only_first[requested_responses[0]], first[requested_responses[0]], rtol=1e-5)
+
+
+def test_inference_model_is_pruned(model_path: pathlib.Path) -> None:
+    model = load_tf_model_from_path(model_path)
+    details = t.cast(_Tensorflow2ModelDetails, model._details)
+    input_layer_name = list(model.input_layers.keys())[0]
+    second_conv = _conv_responses(model)[1]
+
+    requested_responses = model.responses_up_to(second_conv)
+    assert requested_responses[-1] == second_conv
+    assert input_layer_name not in requested_responses
+    assert len(requested_responses) < len(model.response_infos) - 1
+
+    # Only the layers up to the last requested response are part of the inference model
+    _, inference_model = details._get_inference_model(set(requested_responses))
+    assert {layer.name for layer in inference_model.layers} == {input_layer_name, *requested_responses}
+
+    images = np.random.rand(2, 32, 32, 3).astype(np.float32)
+    results = details.run_inference({input_layer_name: images}, set(requested_responses))
+    assert set(results) == set(requested_responses)
+
+
+@pytest.mark.slow
+def test_inference_overhead_benchmark(model_path: pathlib.Path) -> None:
+    """Compare the per-batch inference time with and without reusing the inference sub-model."""
+    model = load_tf_model_from_path(model_path)
+    details = t.cast(_Tensorflow2ModelDetails, model._details)
+    input_layer_name = list(model.input_layers.keys())[0]
+    inputs = {input_layer_name: np.random.rand(2, 32, 32, 3).astype(np.float32)}
+    outputs = set(_conv_responses(model))
+    n_batches = 20
+
+    def time_per_batch(rebuild: bool) -> float:
+        details.run_inference(inputs, outputs)  # warm-up
+        start = time.perf_counter()
+        for _ in range(n_batches):
+            if rebuild:
+                # Previous behavior: a new sub-model for every batch
+                details._inference_models.clear()
+                details._input_layer_names = None
+            details.run_inference(inputs, outputs)
+        return (time.perf_counter() - start) / n_batches
+
+    rebuilt = time_per_batch(rebuild=True)
+    reused = time_per_batch(rebuild=False)
+    print(f"\nTF2 inference per batch of 2: {rebuilt * 1000:.1f} ms rebuilding the sub-model, "
+          f"{reused * 1000:.1f} ms reusing it")
+    assert reused < rebuilt
+
+
+@pytest.mark.parametrize("jit_compile", [False, True])
+def test_compiled_inference(model_path: pathlib.Path, jit_compile: bool) -> None:
+    eager_model = load_tf_model_from_path(model_path)
+    compiled_model = load_tf_model_from_path(model_path, compiled_inference=True, jit_compile=jit_compile)
+    details = t.cast(_Tensorflow2ModelDetails, compiled_model._details)
+    images = np.random.rand(23, 32, 32, 3).astype(np.float32)
+    requested_responses = _conv_responses(compiled_model)
+
+    def producer(batch_size: int) -> t.Iterable[Batch]:
+        for start in range(0, len(images), batch_size):
+            yield Batch({"images": images[start:start + batch_size]})
+
+    eager_batches = list(pipeline(producer, eager_model(requested_responses))(batch_size=10))
+    compiled_batches = list(pipeline(producer, compiled_model(requested_responses))(batch_size=10))
+
+    assert [batch.batch_size for batch in compiled_batches] == [10, 10, 3]
+    for eager, compiled in zip(eager_batches, compiled_batches):
+        for name in requested_responses:
+            np.testing.assert_allclose(compiled.fields[name], eager.fields[name], rtol=1e-4, atol=1e-4)
+
+    # The last, partial, batch was padded instead of tracing the function again
+    _, compiled_function = details._compiled_functions[frozenset(requested_responses)]
+    assert t.cast(t.Any, compiled_function).experimental_get_tracing_count() == 1
+
+
+def test_compiled_inference_grows_batch_size(model_path: pathlib.Path) -> None:
+    eager_model = load_tf_model_from_path(model_path)
+    compiled_model = load_tf_model_from_path(model_path, compiled_inference=True)
+    details = t.cast(_Tensorflow2ModelDetails, compiled_model._details)
+    input_layer_name = list(compiled_model.input_layers.keys())[0]
+    outputs = set(_conv_responses(compiled_model))
+    key = frozenset(outputs)
+
+    # A first batch of one sample (e.g. from peeking at a producer) does not fix the batch size
+    for batch_size in (1, 8, 5, 8):
+        images = np.random.rand(batch_size, 32, 32, 3).astype(np.float32)
+        compiled = details.run_inference({input_layer_name: images}, outputs)
+        eager = eager_model._details.run_inference({input_layer_name: images}, outputs)
+        for name in outputs:
+            assert compiled[name].shape[0] == batch_size
+            # (eager inference adds an extra axis to the responses of single samples)
+            np.testing.assert_allclose(compiled[name], np.reshape(eager[name], compiled[name].shape), rtol=1e-4, atol=1e-4)
+
+    signature, compiled_function = details._compiled_functions[key]
+    assert signature[0].shape[0] == 8
+    assert t.cast(t.Any, compiled_function).experimental_get_tracing_count() == 1
+
+
+@pytest.mark.slow
+def test_compiled_inference_benchmark(model_path: pathlib.Path) -> None:
+    """Compare the inference throughput of eager, tf.function and XLA execution."""
+    inputs = np.random.rand(64, 32, 32, 3).astype(np.float32)
+    n_batches = 10
+    timings = {}
+    for mode, kwargs in (("eager", {}),
+                         ("tf.function", {"compiled_inference": True}),
+                         ("XLA", {"jit_compile": True})):
+        model = load_tf_model_from_path(model_path, **kwargs)
+        details = model._details
+        input_layer_name = list(model.input_layers.keys())[0]
+        outputs = set(_conv_responses(model))
+        details.run_inference({input_layer_name: inputs}, outputs)  # warm-up, tracing and compilation
+        start = time.perf_counter()
+        for _ in range(n_batches):
+            details.run_inference({input_layer_name: inputs}, outputs)
+        timings[mode] = n_batches * len(inputs) / (time.perf_counter() - start)
+
+    # Gains depend a lot on the host (XLA is most useful for conv nets on CPU), so only report them
+    print("\nTF2 inference throughput (images/s): " + ", ".join(f"{mode}: {rate:.0f}" for mode, rate in timings.items()))
@@ -85,12 +85,9 @@ def test_load_example_dataset() -> None:
     # Test subset creation
     subset = cifar10.subset(labels=["frog", "bird", "deer"], datasets=["test"], max_samples=300)
 
-    # Assert num of items in x_train, test etc in subset is correct
-    (x_train, y_train), (x_test, y_test) = subset.split_dataset
-    assert x_train.shape == (0,)
-    assert y_train.shape == (0,)
-    assert x_test.shape == (3000, 32, 32, 3)
-    assert y_test.shape == (3000, 1)
+    # Assert num of items in subset is correct; the subset shares the arrays of its parent
+    assert subset.split_dataset is cifar10.split_dataset
+    assert np.all(np.asarray(subset._dataset_labels) == "test")
     assert subset._samples.shape == (3000, 32, 32, 3)
     assert subset._labels.shape == (3000,)
     assert subset._dataset_ids.shape == (3000,)
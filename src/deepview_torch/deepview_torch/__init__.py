@@ -41,10 +41,12 @@ from ._torch_producer import (
     ProducerTorchDataset,
     TorchProducer,
 )
+from ._torch_loading import load_torch_model
 
 __all__ = [
     ProducerTorchDataset.__name__,
     TorchProducer.__name__,
+    "load_torch_model",
 ]
 
 # Raise error if deepview and deepview_torch versions are out of sync
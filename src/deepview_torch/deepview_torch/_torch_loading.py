@@ -0,0 +1,76 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2021 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+import torch
+
+import deepview.typing._types as t
+from deepview.base import Model
+from ._torch_model import _TorchModelDetails
+
+
+def load_torch_model(model: torch.nn.Module, *,
+                     input_shape: t.Union[t.Tuple[int, ...], t.Mapping[str, t.Tuple[int, ...]]],
+                     input_dtype: t.Union[np.dtype, t.Type[np.generic]] = np.float32,
+                     clone_responses: t.Optional[bool] = None) -> Model:
+    """
+    Initialize a PyTorch :class:`Model <deepview.base.Model>` from a :class:`torch.nn.Module`.
+
+    The responses of the model are the outputs of its named sub-modules (e.g. ``"features.0"``),
+    and inference only runs the model until all the requested responses are computed.
+
+    Note:
+        The module is put in evaluation mode, and it is run once on a zero sample to
+        get the shape and type of its responses.
+
+    Args:
+        model: The PyTorch module.
+        input_shape: The shape of a single input sample (without the batch dimension), for a model with
+            a single input named ``"input"``. For models with several inputs, a mapping of
+            input names to shapes, in the order of the ``forward`` arguments.
+        input_dtype: **[optional]** type that input data is converted to before inference.
+        clone_responses: **[optional]** clone the captured responses, which is necessary if
+            later layers modify them in place. If ``None`` (the default), responses are only
+            cloned if the model has modules running in place (e.g. ``ReLU(inplace=True)``).
+
+    Returns:
+        A PyTorch :class:`Model <deepview.base.Model>`.
+    """
+    input_shapes = input_shape if isinstance(input_shape, t.Mapping) else {"input": input_shape}
+    return Model(_TorchModelDetails(
+        model=model,
+        input_shapes={name: tuple(shape) for name, shape in input_shapes.items()},
+        input_dtype=np.dtype(input_dtype),
+        clone_responses=clone_responses
+    ))
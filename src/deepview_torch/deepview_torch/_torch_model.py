@@ -0,0 +1,252 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2021 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from dataclasses import dataclass, field
+import logging
+
+import numpy as np
+import torch
+
+import deepview.typing._types as t
+from deepview.base import ResponseInfo
+from deepview.base._model import _ModelDetails
+from ._torch_producer import _to_numpy
+
+
+_logger = logging.getLogger("deepview_torch")
+
+
+_KNOWN_MODULES: t.Final[t.Mapping[str, ResponseInfo.LayerKind]] = {
+    "Linear": ResponseInfo.LayerKind.DENSE,
+    "Conv1d": ResponseInfo.LayerKind.CONV_1D,
+    "Conv2d": ResponseInfo.LayerKind.CONV_2D,
+    "Conv3d": ResponseInfo.LayerKind.CONV_3D,
+    "ConvTranspose1d": ResponseInfo.LayerKind.CONV_TRANSPOSE_1D,
+    "ConvTranspose2d": ResponseInfo.LayerKind.CONV_TRANSPOSE_2D,
+    "ConvTranspose3d": ResponseInfo.LayerKind.CONV_TRANSPOSE_3D,
+    "MaxPool1d": ResponseInfo.LayerKind.MAX_POOLING_1D,
+    "MaxPool2d": ResponseInfo.LayerKind.MAX_POOLING_2D,
+    "MaxPool3d": ResponseInfo.LayerKind.MAX_POOLING_3D,
+    "AdaptiveMaxPool1d": ResponseInfo.LayerKind.MAX_POOLING_1D,
+    "AdaptiveMaxPool2d": ResponseInfo.LayerKind.MAX_POOLING_2D,
+    "AdaptiveMaxPool3d": ResponseInfo.LayerKind.MAX_POOLING_3D,
+    "AvgPool1d": ResponseInfo.LayerKind.AVERAGE_POOLING_1D,
+    "AvgPool2d": ResponseInfo.LayerKind.AVERAGE_POOLING_2D,
+    "AvgPool3d": ResponseInfo.LayerKind.AVERAGE_POOLING_3D,
+    "AdaptiveAvgPool1d": ResponseInfo.LayerKind.AVERAGE_POOLING_1D,
+    "AdaptiveAvgPool2d": ResponseInfo.LayerKind.AVERAGE_POOLING_2D,
+    "AdaptiveAvgPool3d": ResponseInfo.LayerKind.AVERAGE_POOLING_3D,
+    "RNN": ResponseInfo.LayerKind.RNN,
+    "LSTM": ResponseInfo.LayerKind.LSTM,
+    "GRU": ResponseInfo.LayerKind.GRU,
+    "BatchNorm1d": ResponseInfo.LayerKind.BATCH_NORM,
+    "BatchNorm2d": ResponseInfo.LayerKind.BATCH_NORM_2D,
+    "BatchNorm3d": ResponseInfo.LayerKind.BATCH_NORM_3D,
+    "LayerNorm": ResponseInfo.LayerKind.LAYER_NORM,
+    "Dropout": ResponseInfo.LayerKind.DROPOUT,
+    "Dropout1d": ResponseInfo.LayerKind.DROPOUT,
+    "Dropout2d": ResponseInfo.LayerKind.DROPOUT_2D,
+    "Dropout3d": ResponseInfo.LayerKind.DROPOUT_3D,
+    "Sigmoid": ResponseInfo.LayerKind.SIGMOID,
+    "Tanh": ResponseInfo.LayerKind.TANH,
+    "ReLU": ResponseInfo.LayerKind.RELU,
+    "ReLU6": ResponseInfo.LayerKind.RELU6,
+    "LeakyReLU": ResponseInfo.LayerKind.LEAKY_RELU,
+    "PReLU": ResponseInfo.LayerKind.PRELU,
+    "ELU": ResponseInfo.LayerKind.ELU,
+    "Softmax": ResponseInfo.LayerKind.SOFTMAX,
+    "MultiheadAttention": ResponseInfo.LayerKind.ATTENTION,
+}
+
+
+class _ResponsesCaptured(Exception):
+    """Raised by forward hooks to stop the forward pass once all requested responses are captured."""
+
+
+def _convert_torch_dtype(dtype: torch.dtype) -> np.dtype:
+    try:
+        return torch.empty((), dtype=dtype).numpy().dtype
+    except TypeError:
+        # e.g. bfloat16 has no NumPy equivalent
+        return np.dtype(object)
+
+
+@t.final
+@dataclass
+class _TorchModelDetails(_ModelDetails):
+    """
+    Class wrapping a PyTorch :class:`torch.nn.Module` so that it can be seamlessly used in DeepView.
+
+    The responses of the model are the outputs of its named sub-modules (as given by
+    :meth:`torch.nn.Module.named_modules`) that return a single tensor. During inference, forward
+    hooks are only registered on the requested modules, and the forward pass is stopped as soon as
+    all of them have produced their output, so layers after the last requested one never run.
+    If a module is called more than once in a forward pass, its response is the output of the first call.
+
+    The module is put in evaluation mode, and inference runs under :func:`torch.inference_mode`.
+    Responses are returned as NumPy arrays sharing memory with the output tensors (for CPU models).
+    Since modules running in place (e.g. ``ReLU(inplace=True)``) would overwrite responses captured
+    earlier in the forward pass, those are cloned if the model has such modules, which can be
+    forced with ``clone_responses``.
+    """
+
+    model: torch.nn.Module = field(repr=False)
+
+    input_shapes: t.Mapping[str, t.Tuple[int, ...]]
+    """Name and shape (without the batch dimension) of the inputs, in the order of the ``forward`` arguments."""
+
+    input_dtype: np.dtype = field(default_factory=lambda: np.dtype(np.float32))
+    """Type that inputs are converted to before inference."""
+
+    clone_responses: t.Optional[bool] = None
+    """Clone captured responses. If ``None``, only clone them when the model has in-place modules."""
+
+    _response_infos: t.Dict[str, ResponseInfo] = field(init=False, repr=False, default_factory=dict)
+    _device: torch.device = field(init=False, repr=False, default=torch.device("cpu"))
+
+    def __post_init__(self) -> None:
+        _logger.info("Instantiating PyTorch Model")
+        self.model.eval()
+        parameter = next(self.model.parameters(), None)
+        if parameter is not None:
+            self._device = parameter.device
+
+        if self.clone_responses is None:
+            self.clone_responses = any(getattr(module, "inplace", False) for module in self.model.modules())
+
+        for input_name, input_shape in self.input_shapes.items():
+            self._response_infos[input_name] = ResponseInfo(
+                name=input_name,
+                dtype=self.input_dtype,
+                shape=(None, *input_shape),
+                layer=ResponseInfo.Layer(
+                    name=input_name,
+                    kind=ResponseInfo.LayerKind.PLACEHOLDER,
+                    typename="Input"
+                )
+            )
+
+        # Shapes and types of responses are only known after running the model: use a single, zero, sample
+        modules = dict(self.model.named_modules())
+        del modules[""]
+        example_inputs = {
+            name: np.zeros((1, *shape), dtype=self.input_dtype)
+            for name, shape in self.input_shapes.items()
+        }
+        for name, response in self._forward(example_inputs, modules, stop_early=False).items():
+            module = modules[name]
+            typename = type(module).__name__
+            self._response_infos[name] = ResponseInfo(
+                name=name,
+                dtype=_convert_torch_dtype(response.dtype),
+                shape=(None, *response.shape[1:]),
+                layer=ResponseInfo.Layer(
+                    name=name,
+                    kind=_KNOWN_MODULES.get(typename, ResponseInfo.LayerKind.UNKNOWN),
+                    typename=typename
+                )
+            )
+
+    def get_response_infos(self) -> t.Iterable[ResponseInfo]:
+        return self._response_infos.values()
+
+    def get_input_layer_responses(self) -> t.Sequence[ResponseInfo]:
+        """
+        Get the inputs of the PyTorch module, in the order of the ``forward`` arguments.
+        """
+        return [self._response_infos[name] for name in self.input_shapes]
+
+    def _forward(self,
+                 inputs: t.Mapping[str, np.ndarray],
+                 modules: t.Mapping[str, torch.nn.Module],
+                 stop_early: bool = True) -> t.Dict[str, torch.Tensor]:
+        """
+        Run the model on ``inputs`` and return the (single tensor) outputs of ``modules``.
+
+        Hooks are only registered on ``modules``, and are always removed afterwards.
+        """
+        captured: t.Dict[str, torch.Tensor] = {}
+
+        def make_hook(name: str) -> t.Callable[[torch.nn.Module, t.Any, t.Any], None]:
+            def hook(module: torch.nn.Module, args: t.Any, output: t.Any) -> None:
+                if name in captured or not isinstance(output, torch.Tensor):
+                    return
+                last = len(captured) == len(modules) - 1
+                # The last response cannot be overwritten by in-place modules: the forward pass stops
+                captured[name] = output.clone() if self.clone_responses and not (stop_early and last) else output
+                if stop_early and last:
+                    raise _ResponsesCaptured()
+            return hook
+
+        handles = [module.register_forward_hook(make_hook(name)) for name, module in modules.items()]
+        try:
+            with torch.inference_mode():
+                tensors = [
+                    # no copy if the array is already contiguous, of the expected type and on the CPU
+                    torch.from_numpy(np.ascontiguousarray(inputs[name], dtype=self.input_dtype)).to(self._device)
+                    for name in self.input_shapes
+                ]
+                self.model(*tensors)
+        except _ResponsesCaptured:
+            pass
+        finally:
+            for handle in handles:
+                handle.remove()
+        return captured
+
+    def run_inference(self,
+                      inputs: t.Mapping[str, np.ndarray],
+                      outputs: t.AbstractSet[str]) -> t.Mapping[str, np.ndarray]:
+        for input_name in inputs.keys():
+            if input_name not in self.input_shapes:
+                raise TypeError(
+                    f'Invalid input "{input_name}". Valid inputs are {list(self.input_shapes)}.')
+        for output_name in outputs:
+            if output_name not in self._response_infos:
+                raise TypeError(
+                    f'Invalid response "{output_name}". Valid responses are {list(self._response_infos)}.')
+
+        # Model inputs are not computed by the model, they are returned as they are
+        results = {name: inputs[name] for name in outputs if name in inputs}
+        modules = {
+            name: module
+            for name, module in self.model.named_modules()
+            if name in outputs and name not in self.input_shapes
+        }
+        if modules:
+            results.update({
+                name: _to_numpy(tensor)
+                for name, tensor in self._forward(inputs, modules).items()
+            })
+        return results
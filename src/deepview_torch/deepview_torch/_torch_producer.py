@@ -33,13 +33,15 @@
 #
 
 import dataclasses
+import warnings
 import deepview.typing._types as t
 
 import numpy as np
 import torch
-from torch.utils.data import IterableDataset, DataLoader
+from torch.utils.data import IterableDataset, DataLoader, get_worker_info
 
 from deepview.base import Producer, Batch
+from deepview.base._producer import _resize_batches
 
 # see ProducerTorchDataset class doc and mapping below
 PRODUCER_TORCH_MAPPING = t.Union[str, Batch.DictMetaKey, Batch.MetaKey,
@@ -50,6 +52,17 @@ TORCH_PRODUCER_MAPPING = t.Union[str, Batch.DictMetaKey, Batch.MetaKey,
                                  t.Callable[[t.Any, Batch.Builder], None]]
 
 
+def _to_numpy(tensor: torch.Tensor) -> np.ndarray:
+    # A view of the tensor data (no copy) for CPU tensors
+    return tensor.detach().cpu().numpy()
+
+
+def _metadata_rows(array: np.ndarray) -> t.Sequence[t.Any]:
+    # Metadata is typed as sequences, but arrays are stored as they are: they are indexed and
+    # sliced by row like sequences, and converting them to lists would copy every value
+    return t.cast(t.Sequence[t.Any], array)
+
+
 @dataclasses.dataclass(frozen=True)
 class ProducerTorchDataset(IterableDataset):
     """
@@ -77,6 +90,8 @@ class ProducerTorchDataset(IterableDataset):
         mapping: see :attr:`mapping`
         batch_size: **[optional]** see :attr:`batch_size`
         transforms: **[optional]** see :attr:`transforms`
+        batched: **[optional]** see :attr:`batched`
+        worker_producer: **[optional]** see :attr:`worker_producer`
     """
 
     producer: Producer
@@ -123,6 +138,9 @@ class ProducerTorchDataset(IterableDataset):
         ds = ProducerTorchDataset(producer, ["image", "image2", key1, transform])
 
     In this example the Dataset will produce two ndarrays, a dictionary and a reshaped ndarray.
+
+    If :attr:`batched` is True, the same mapping produces batched values instead: tensors
+    with all the field data of a batch, lists of metadata and lists of the custom results of each element.
     """
 
     batch_size: int = 100
@@ -155,16 +173,103 @@ class ProducerTorchDataset(IterableDataset):
             })
     """
 
+    batched: bool = False
+    """
+    If True, yield one tuple per :class:`Batch <deepview.base.Batch>` read from the producer, rather than
+    one tuple per element. Fields are converted to tensors with :func:`torch.from_numpy`, sharing memory
+    with the batch data, and :attr:`transforms` are applied to the whole batch tensor.
+    This avoids splitting batches into elements only for the DataLoader to collate them again.
+    Since batch data is read-only, these tensors must not be modified in place.
+
+    Use with automatic batching disabled in the DataLoader, so that it yields the batches as they are:
+
+    .. code-block:: python
+
+        dataset = ProducerTorchDataset(producer, ["image", "label"], batch_size=64, batched=True)
+        loader = DataLoader(dataset, batch_size=None, num_workers=4)
+    """
+
+    worker_producer: t.Optional[t.Callable[[int, int], Producer]] = None
+    """
+    Optional factory for the producer of each DataLoader worker, called with the worker id and the number
+    of workers. Each worker producer must produce a distinct share of the data (e.g. every ``num_workers``-th
+    file starting at the worker id), so that data is read and processed only once across workers.
+
+    It is required when the DataLoader has more than one worker, since every worker would otherwise run
+    the whole :attr:`producer`:
+
+    .. code-block:: python
+
+        dataset = ProducerTorchDataset(
+            producer, ["image", "label"],
+            worker_producer=lambda worker_id, num_workers: MyProducer(files[worker_id::num_workers]))
+        loader = DataLoader(dataset, batch_size=32, num_workers=4)
+    """
+
     def __post_init__(self) -> None:
         # since str is-a Sequence, double check to make sure the caller
         # didn't pass in a bare str by accident
         assert not isinstance(self.mapping, str), (
             "mapping should be a list of strings, callables and DictMetaKeys, not a single str.")
 
+    def _worker_batches(self) -> t.Iterator[Batch]:
+        """Read the batches of the producer of the current DataLoader worker (see :attr:`worker_producer`)."""
+        worker_info = get_worker_info()
+        if worker_info is None or worker_info.num_workers == 1:
+            yield from self.producer(self.batch_size)
+        elif self.worker_producer is None:
+            raise ValueError(f"ProducerTorchDataset needs a worker_producer to shard the data between "
+                             f"{worker_info.num_workers} DataLoader workers; without it, every worker "
+                             f"would produce the whole dataset.")
+        else:
+            yield from self.worker_producer(worker_info.id, worker_info.num_workers)(self.batch_size)
+
+    def _iter_batched(self) -> t.Iterator:
+        transforms = self.transforms or {}
+
+        for batch in self._worker_batches():
+            result: t.List[t.Any] = []  # this is a t.Any to allow for custom mappings
+
+            for mapping in self.mapping:
+                if isinstance(mapping, str):
+                    with warnings.catch_warnings():
+                        # Batch data is read-only: torch warns that the tensor shares read-only memory
+                        warnings.simplefilter("ignore", UserWarning)
+                        tensor = torch.from_numpy(batch.fields[mapping])
+                    if mapping in transforms:
+                        tensor = transforms[mapping](tensor)
+                    result.append(tensor)
+
+                elif isinstance(mapping, Batch.MetaKey):
+                    result.append(list(batch.metadata[mapping]))
+
+                elif isinstance(mapping, Batch.DictMetaKey):
+                    meta_data = batch.metadata[mapping]
+
+                    # dictionary with single field -> list
+                    if len(meta_data) == 1:
+                        result.append(list(meta_data[next(iter(meta_data))]))
+                    else:
+                        result.append({key: list(value) for key, value in meta_data.items()})
+
+                elif callable(mapping):
+                    # custom mapping, for each element
+                    result.append([mapping(element) for element in batch.elements])
+
+                else:
+                    raise ValueError(f'mapping "{mapping}" is an '
+                                     f'unhandled type: {type(mapping)}')
+
+            yield tuple(result)
+
     def __iter__(self) -> t.Iterator:
+        if self.batched:
+            yield from self._iter_batched()
+            return
+
         transforms = self.transforms or {}
 
-        for batch in self.producer(self.batch_size):
+        for batch in self._worker_batches():
             for element in batch.elements:
                 result: t.List[t.Any] = []  # this is a t.Any to allow for custom mappings
 
@@ -222,6 +327,10 @@ class TorchProducer(Producer):
     This same mapping can be used to match a :class:`Batch <deepview.base.Batch>` into a
     Dataset in :class:`ProducerTorchDataset`.
 
+    Batches of any size can be requested: if it differs from the batch size of the DataLoader, the
+    DataLoader batches are split or concatenated to the requested size. CPU tensors are converted to
+    NumPy arrays without copying their data, for fields as well as numeric metadata.
+
     See Also
         - :class:`ProducerTorchDataset` -- :class:`Producer <deepview.base.Producer>` into a
           PyTorch Dataset
@@ -323,7 +432,7 @@ class TorchProducer(Producer):
         if isinstance(mapping, str):
             # field data
             if isinstance(value, torch.Tensor):
-                value = value.detach().cpu().numpy()
+                value = _to_numpy(value)
             elif isinstance(value, list):
                 value = np.array(value)
             elif isinstance(value, np.ndarray):
@@ -337,7 +446,7 @@ class TorchProducer(Producer):
             # simple metadata, use the value directly (unwrapping tensors as needed)
 
             if isinstance(value, torch.Tensor):
-                batch.metadata[mapping] = value.tolist()
+                batch.metadata[mapping] = _metadata_rows(_to_numpy(value))
             elif isinstance(value, t.Sequence):
                 batch.metadata[mapping] = value
             else:
@@ -355,17 +464,23 @@ class TorchProducer(Producer):
             # <str> -> [...]
             # [a, b, ...] -> [ Tensor([a, ..]), Tensor([b, ...]), ...] or [["a", ...], ["b", ...]]
             # {k1: v1, k2: v2} -> {k1: Tensor[v1, ...], k2: Tensor[v2, ...]}
+            #
+            # tensors are kept as NumPy arrays (one row per element)
 
             if isinstance(value, torch.Tensor):
                 # map to an array of values
-                batch.metadata[mapping] = {self.anonymous_field_name: value.tolist()}
+                batch.metadata[mapping] = {self.anonymous_field_name: _metadata_rows(_to_numpy(value))}
             elif isinstance(value, t.Sequence):
                 value_is_list_tensor_or_tuple = (
                     isinstance(value[0], list) or
                     isinstance(value[0], torch.Tensor) or
                     isinstance(value[0], tuple)
                 )
-                if value_is_list_tensor_or_tuple:
+                if all(isinstance(column, torch.Tensor) for column in value):
+                    # transpose the tensors -- element i is [a[i], b[i], c[i], ...]
+                    batch.metadata[mapping] = {
+                        self.anonymous_field_name: _metadata_rows(np.stack([_to_numpy(column) for column in value], axis=1))}
+                elif value_is_list_tensor_or_tuple:
                     # transpose the lists
                     #     -- lists of [a, b, c, ...] are expected, not [a, a, a, ...]
                     batch.metadata[mapping] = {
@@ -377,7 +492,7 @@ class TorchProducer(Producer):
                 # turn the keys into fields in the metadata -- the dicts at the element
                 # level will match what the Dataset returned
                 batch.metadata[mapping] = {
-                    k: v.tolist() if isinstance(v, torch.Tensor) else v
+                    k: _metadata_rows(_to_numpy(v)) if isinstance(v, torch.Tensor) else v
                     for k, v in value.items()
                 }
             else:
@@ -394,12 +509,7 @@ class TorchProducer(Producer):
         else:
             raise ValueError(f'cannot handle mapping of type: {type(mapping)}')
 
-    def __call__(self, batch_size: int) -> t.Iterable[Batch]:
-        if batch_size != self.batch_size:
-            raise ValueError('The Torch DataLoader used in this instance produces batches '
-                             f'of size {self.batch_size}, '
-                             f'requested batch size: {batch_size}')
-
+    def _loader_batches(self) -> t.Iterable[Batch]:
         for data in self.data_loader:
             batch = Batch.Builder()
 
@@ -413,3 +523,10 @@ class TorchProducer(Producer):
                 self._transform(data, self.mapping[0], batch)
 
             yield batch.make_batch()
+
+    def __call__(self, batch_size: int) -> t.Iterable[Batch]:
+        if batch_size == self.batch_size:
+            yield from self._loader_batches()
+        else:
+            # Regroup the batches of the DataLoader into the requested size
+            yield from _resize_batches(self._loader_batches())(batch_size)
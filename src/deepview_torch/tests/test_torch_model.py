@@ -0,0 +1,142 @@
+#
+#
+# Copyright 2024 BetterWithData
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This file contains code that is part of Apple's DNIKit project, licensed
+# under the Apache License, Version 2.0:
+#
+# Copyright 2021 Apple Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+import pytest
+import torch
+
+import deepview.typing._types as t
+import deepview_torch
+from deepview.base import Batch, ResponseInfo, pipeline
+from deepview_torch._torch_model import _TorchModelDetails
+
+
+class _CallCounter(torch.nn.Module):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        self.calls += 1
+        return x
+
+
+def _make_cnn(inplace: bool = False) -> torch.nn.Sequential:
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 4, kernel_size=3, padding=1),
+        torch.nn.ReLU(inplace=inplace),
+        torch.nn.AdaptiveAvgPool2d(1),
+        torch.nn.Flatten(),
+        torch.nn.Linear(4, 2),
+        _CallCounter(),
+        torch.nn.Softmax(dim=1),
+    )
+
+
+def _images(n: int) -> np.ndarray:
+    return np.random.default_rng(0).random((n, 3, 8, 8), dtype=np.float32)
+
+
+def test_response_infos() -> None:
+    model = deepview_torch.load_torch_model(_make_cnn(), input_shape=(3, 8, 8))
+    assert list(model.input_layers) == ["input"]
+    assert set(model.response_infos) == {"input", "0", "1", "2", "3", "4", "5", "6"}
+
+    infos = model.response_infos
+    assert infos["input"].layer.kind is ResponseInfo.LayerKind.PLACEHOLDER
+    assert infos["0"].layer.kind is ResponseInfo.LayerKind.CONV_2D
+    assert infos["0"].layer.typename == "Conv2d"
+    assert infos["0"].shape == (None, 4, 8, 8)
+    assert infos["0"].dtype == np.float32
+    assert infos["1"].layer.kind is ResponseInfo.LayerKind.RELU
+    assert infos["2"].layer.kind is ResponseInfo.LayerKind.AVERAGE_POOLING_2D
+    assert infos["3"].layer.kind is ResponseInfo.LayerKind.UNKNOWN
+    assert infos["4"].layer.kind is ResponseInfo.LayerKind.DENSE
+    assert infos["4"].shape == (None, 2)
+    assert infos["6"].layer.kind is ResponseInfo.LayerKind.SOFTMAX
+
+
+@pytest.mark.parametrize("inplace", [False, True])
+def test_intermediate_responses(inplace: bool) -> None:
+    cnn = _make_cnn(inplace)
+    model = deepview_torch.load_torch_model(cnn, input_shape=(3, 8, 8))
+    images = _images(5)
+    results = model._details.run_inference({"input": images}, {"0", "1", "4", "6"})
+
+    with torch.no_grad():
+        conv = cnn[0](torch.from_numpy(images))
+        expected_conv = conv.numpy().copy()
+        expected_probs = cnn(torch.from_numpy(images)).numpy()
+
+    # In-place ReLU does not overwrite the captured convolution output
+    np.testing.assert_allclose(results["0"], expected_conv, rtol=1e-5)
+    np.testing.assert_allclose(results["1"], np.maximum(expected_conv, 0), rtol=1e-5)
+    np.testing.assert_allclose(results["6"], expected_probs, rtol=1e-5)
+    assert results["4"].shape == (5, 2)
+
+    # Hooks are removed after inference
+    assert all(not module._forward_hooks for module in cnn.modules())
+
+    with pytest.raises(TypeError):
+        model._details.run_inference({"pixels": images}, {"0"})
+
+
+def test_forward_pass_stops_early() -> None:
+    cnn = _make_cnn()
+    counter = t.cast(_CallCounter, cnn[5])
+    details = t.cast(_TorchModelDetails, deepview_torch.load_torch_model(cnn, input_shape=(3, 8, 8))._details)
+    counter.calls = 0
+
+    details.run_inference({"input": _images(2)}, {"0", "4"})
+    assert counter.calls == 0
+
+    details.run_inference({"input": _images(2)}, {"6"})
+    assert counter.calls == 1
+
+
+def test_pipeline() -> None:
+    model = deepview_torch.load_torch_model(_make_cnn(), input_shape=(3, 8, 8))
+    images = _images(23)
+
+    def producer(batch_size: int) -> t.Iterable[Batch]:
+        for start in range(0, len(images), batch_size):
+            # The input field is renamed automatically, and float64 data is cast to float32
+            yield Batch({"images": images[start:start + batch_size].astype(np.float64)})
+
+    batches = list(pipeline(producer, model(["2", "6"]))(batch_size=10))
+    assert [batch.batch_size for batch in batches] == [10, 10, 3]
+    assert all(set(batch.fields) == {"2", "6"} for batch in batches)
+    expected = model._details.run_inference({"input": images}, {"6"})["6"]
+    np.testing.assert_allclose(np.concatenate([batch.fields["6"] for batch in batches]), expected, rtol=1e-5)
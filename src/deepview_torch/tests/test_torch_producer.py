@@ -101,6 +101,30 @@ def test_producer_skip_metadata() -> None:
     assert batch.metadata[key2] == {"_": [8, 8]}
 
 
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 7, 20])
+def test_producer_batch_size(batch_size: int) -> None:
+    key1 = Batch.MetaKey[int]("KEY1")
+    loader = torch_data.DataLoader(MetaDataset([7]), batch_size=2, shuffle=False)
+    producer = deepview_torch.TorchProducer(loader, ["image", key1])
+
+    # The DataLoader batches of 2 are regrouped into the requested batch size
+    batches = list(producer(batch_size))
+    assert [batch.batch_size for batch in batches[:-1]] == [batch_size] * (len(batches) - 1)
+    assert sum(batch.batch_size for batch in batches) == 10
+    assert all(list(batch.metadata[key1]) == [7] * batch.batch_size for batch in batches)
+
+
+def test_producer_zero_copy() -> None:
+    dataset = torch_data.TensorDataset(torch.arange(40, dtype=torch.float32).reshape((10, 4)), torch.arange(10))
+    loader = torch_data.DataLoader(dataset, batch_size=5, shuffle=False)
+    key1 = Batch.MetaKey[int]("KEY1")
+    batch = next(iter(deepview_torch.TorchProducer(loader, ["image", key1])(5)))
+
+    # field data is a view of the collated tensor
+    assert isinstance(batch.fields["image"].base, torch.Tensor)
+    assert list(batch.metadata[key1]) == [0, 1, 2, 3, 4]
+
+
 def test_producer_string() -> None:
     # single string metadata
     key1 = Batch.DictMetaKey[int]("KEY1")
@@ -112,7 +136,9 @@ def test_producer_array_int() -> None:
     # array of ints
     key1 = Batch.DictMetaKey[int]("KEY1")
     batch = _run_producer([[7, 8]], ["image", key1])
-    assert batch.metadata[key1] == {"_": [[7, 8], [7, 8]]}
+    # tensors are kept as arrays, with a row per element
+    assert list(batch.metadata[key1]) == ["_"]
+    assert np.array_equal(batch.metadata[key1]["_"], [[7, 8], [7, 8]])
 
 
 def test_producer_array_str() -> None:
@@ -273,6 +299,87 @@ def test_transforms() -> None:
     assert v[1].shape == (2, 16, 16)
 
 
+@dataclasses.dataclass(frozen=True)
+class RangeProducer(Producer):
+    """
+    Produces elements with an ``image`` field and a ``KEY`` metadata, both from their index,
+    for every ``step``-th index from ``start`` up to ``count``.
+    """
+    count: int = 10
+    start: int = 0
+    step: int = 1
+
+    def __call__(self, batch_size: int) -> t.Iterable[Batch]:
+        all_indices = np.arange(self.start, self.count, self.step)
+        for start in range(0, len(all_indices), batch_size):
+            indices = all_indices[start:start + batch_size]
+            builder = Batch.Builder()
+            builder.fields["image"] = indices[:, None, None] * np.ones((len(indices), 4, 4), dtype=np.float32)
+            builder.metadata[RANGE_KEY] = {"index": list(indices), "name": [f"n{i}" for i in indices]}
+            yield builder.make_batch()
+
+
+RANGE_KEY = Batch.DictMetaKey[t.Any]("KEY")
+
+
+def test_dataset_batched() -> None:
+    producer = RangeProducer()
+    batch = next(iter(producer(4)))
+
+    def mean(element: Batch.ElementType) -> float:
+        return float(element.fields["image"].mean())
+
+    ds = deepview_torch.ProducerTorchDataset(producer, ["image", RANGE_KEY, mean], batch_size=4, batched=True)
+    loader = torch_data.DataLoader(ds, batch_size=None, shuffle=False)
+    results = list(loader)
+
+    assert len(results) == 3
+    images, metadata, means = results[0]
+    assert isinstance(images, torch.Tensor)
+    assert images.shape == (4, 4, 4)
+    assert np.array_equal(images.numpy(), batch.fields["image"])
+    assert metadata == {"index": [0, 1, 2, 3], "name": ["n0", "n1", "n2", "n3"]}
+    assert means == [0.0, 1.0, 2.0, 3.0]
+    assert results[-1][0].shape == (2, 4, 4)
+
+    # Field data is not copied
+    def single_batch(batch_size: int) -> t.Iterable[Batch]:
+        yield batch
+
+    images, = next(iter(deepview_torch.ProducerTorchDataset(single_batch, ["image"], batched=True)))
+    assert np.shares_memory(images.numpy(), batch.fields["image"])
+
+
+def test_dataset_batched_transforms() -> None:
+    ds = deepview_torch.ProducerTorchDataset(
+        RangeProducer(), ["image"], batch_size=5, batched=True,
+        transforms={"image": transforms.CenterCrop(2)})
+    images, = next(iter(ds))
+    assert images.shape == (5, 2, 2)
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_dataset_worker_sharding(batched: bool) -> None:
+    def worker_producer(worker_id: int, num_workers: int) -> Producer:
+        return RangeProducer(count=23, start=worker_id, step=num_workers)
+
+    ds = deepview_torch.ProducerTorchDataset(RangeProducer(count=23), ["image"], batch_size=4, batched=batched,
+                                             worker_producer=worker_producer)
+    for num_workers in (0, 1, 2):
+        loader = torch_data.DataLoader(ds, batch_size=None if batched else 4, num_workers=num_workers, shuffle=False)
+
+        # every element is produced exactly once, whatever the number of workers
+        indices = np.concatenate([images[:, 0, 0].numpy() for images, in loader])
+        assert sorted(indices.tolist()) == list(range(23))
+
+
+def test_dataset_workers_need_worker_producer() -> None:
+    ds = deepview_torch.ProducerTorchDataset(RangeProducer(count=23), ["image"], batch_size=4, batched=True)
+    loader = torch_data.DataLoader(ds, batch_size=None, num_workers=2, shuffle=False)
+    with pytest.raises(ValueError, match="worker_producer"):
+        list(loader)
+
+
 def test_producer_torch_callable() -> None:
     """
     Example of using a callable to do custom transformations.